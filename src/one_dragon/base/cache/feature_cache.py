@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.utils import cv2_utils, os_utils
+from one_dragon.utils.log_utils import log
+
+FEATURE_CACHE_VERSION: int = 1  # 缓存格式版本 特征提取方式有变化时需要增加 旧缓存会自动失效
+
+Features = Tuple[Tuple[cv2.KeyPoint, ...], Optional[MatLike]]  # 关键点、描述子
+
+_save_lock = threading.Lock()
+
+
+def get_feature_cache_dir(*sub_paths: str) -> str:
+    """
+    特征缓存的目录 与大地图缓存一样放在工作目录的 .cache 下
+    :param sub_paths: 子目录
+    :return:
+    """
+    return os_utils.get_path_under_work_dir('.cache', 'features', *sub_paths)
+
+
+def cal_source_hash(image: Optional[MatLike], mask: Optional[MatLike] = None) -> str:
+    """
+    计算提取特征使用的图片和掩码的哈希 用于判断缓存是否有效
+    :param image: 图片
+    :param mask: 掩码
+    :return:
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(str(FEATURE_CACHE_VERSION).encode())
+    for arr in [image, mask]:
+        if arr is None:
+            hasher.update(b'none')
+            continue
+        arr = np.ascontiguousarray(arr)
+        hasher.update(str((arr.shape, arr.dtype.str)).encode())
+        hasher.update(memoryview(arr).cast('B'))
+    return hasher.hexdigest()
+
+
+def save_features(file_path: str, source_hash: str, features: Features) -> None:
+    """
+    保存特征到 npz 文件
+    先写入临时文件再替换 避免多个线程同时写入或中途退出时留下损坏的文件
+    :param file_path: 文件路径
+    :param source_hash: 图片的哈希
+    :param features: 特征
+    :return:
+    """
+    kps, desc = features
+    kps_arr = cv2_utils.feature_keypoints_to_np(kps).astype(np.float32).reshape((-1, 7))
+    desc_arr = np.zeros((0, 128), dtype=np.float32) if desc is None else desc
+
+    temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+    try:
+        with _save_lock:
+            with open(temp_path, 'wb') as file:
+                np.savez(file, source_hash=np.array(source_hash), kps=kps_arr, desc=desc_arr)
+            os.replace(temp_path, file_path)
+    except Exception:
+        log.error('保存特征缓存失败 %s', file_path, exc_info=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_features(file_path: str, source_hash: str) -> Optional[Features]:
+    """
+    从 npz 文件读取特征
+    :param file_path: 文件路径
+    :param source_hash: 当前图片的哈希 与文件中的不一致时 缓存无效
+    :return: 特征 缓存不存在或无效时返回空
+    """
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with np.load(file_path) as data:
+            if str(data['source_hash']) != source_hash:
+                return None
+            kps_arr = data['kps']
+            desc = data['desc']
+    except Exception:
+        log.error('读取特征缓存失败 %s', file_path, exc_info=True)
+        return None
+
+    kps = tuple(cv2_utils.feature_keypoints_from_np(kps_arr))
+    return kps, (desc if len(kps) > 0 else None)
+
+
+def get_features(file_path: str, image: MatLike, mask: Optional[MatLike] = None) -> Features:
+    """
+    获取图片的特征 有有效缓存时直接读取 否则计算后保存
+    :param file_path: 缓存文件路径
+    :param image: 图片
+    :param mask: 掩码
+    :return:
+    """
+    source_hash = cal_source_hash(image, mask)
+    features = load_features(file_path, source_hash)
+    if features is not None:
+        return features
+
+    kps, desc = cv2_utils.feature_detect_and_compute(image, mask)
+    features = tuple(kps), desc
+    save_features(file_path, source_hash, features)
+    return features
@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Iterable, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+@dataclass(frozen=True)
+class LruCacheStats:
+    """LRU缓存的统计信息"""
+    hits: int  # 命中次数
+    misses: int  # 未命中次数 包括过期
+    evictions: int  # 因超出容量被淘汰的次数
+    expirations: int  # 因过期被移除的次数
+    size: int  # 当前条目数
+    nbytes: int  # 当前占用字节数 只有传入 size_of 时有意义
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return 0 if total == 0 else self.hits / total
+
+
+class _LruCacheEntry(Generic[V]):
+
+    def __init__(self, value: V, nbytes: int, create_time: float):
+        self.value: V = value
+        self.nbytes: int = nbytes
+        self.create_time: float = create_time
+
+
+class LruCache(Generic[K, V]):
+
+    def __init__(self,
+                 max_size: int = 0,
+                 max_bytes: int = 0,
+                 ttl: float = 0,
+                 size_of: Optional[Callable[[V], int]] = None,
+                 on_evict: Optional[Callable[[K, V], None]] = None):
+        """
+        线程安全的LRU缓存
+        - 可以按条目数和字节数限制容量 超出时淘汰最久未使用的条目
+        - 可以设置过期时间
+        - 可以固定部分条目 固定的条目不会被淘汰 此时允许超出容量
+
+        :param max_size: 最大条目数 0为不限制
+        :param max_bytes: 最大字节数 0为不限制 需要配合 size_of 使用
+        :param ttl: 过期秒数 0为不过期
+        :param size_of: 计算条目字节数的方法 条目大小可能变化 每次访问时会重新计算
+        :param on_evict: 条目被淘汰或过期时的回调
+        """
+        self.max_size: int = max_size
+        self.max_bytes: int = max_bytes
+        self.ttl: float = ttl
+        self.size_of: Optional[Callable[[V], int]] = size_of
+        self.on_evict: Optional[Callable[[K, V], None]] = on_evict
+
+        self._data: OrderedDict[K, _LruCacheEntry[V]] = OrderedDict()  # 最近使用的在最后
+        self._pinned: set[K] = set()
+        self._nbytes: int = 0
+        self._lock = threading.RLock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+        self._expirations: int = 0
+
+    def _cal_size(self, value: V) -> int:
+        if self.size_of is None:
+            return 0
+        return self.size_of(value)
+
+    def _is_expired(self, entry: _LruCacheEntry[V], now: float) -> bool:
+        return self.ttl > 0 and now - entry.create_time > self.ttl
+
+    def _remove(self, key: K) -> Optional[_LruCacheEntry[V]]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry.nbytes
+        return entry
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        获取缓存 会刷新最近使用时间和条目大小
+        :param key: 键
+        :param default: 不存在时的默认值
+        :return:
+        """
+        evicted: list[tuple[K, V]] = []
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+
+            if self._is_expired(entry, time.time()):
+                self._remove(key)
+                self._misses += 1
+                self._expirations += 1
+                evicted.append((key, entry.value))
+                result = default
+            else:
+                self._hits += 1
+                self._data.move_to_end(key)
+                new_nbytes = self._cal_size(entry.value)
+                self._nbytes += new_nbytes - entry.nbytes
+                entry.nbytes = new_nbytes
+                evicted.extend(self._evict_if_needed())
+                result = entry.value
+
+        self._notify_evicted(evicted)
+        return result
+
+    def put(self, key: K, value: V) -> None:
+        """
+        放入缓存 超出容量时淘汰最久未使用的条目
+        :param key: 键
+        :param value: 值
+        :return:
+        """
+        with self._lock:
+            self._remove(key)
+            entry = _LruCacheEntry(value, self._cal_size(value), time.time())
+            self._data[key] = entry
+            self._nbytes += entry.nbytes
+            evicted = self._evict_if_needed()
+
+        self._notify_evicted(evicted)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """
+        移除缓存 不计入淘汰次数
+        :param key: 键
+        :param default: 不存在时的默认值
+        :return: 被移除的值
+        """
+        with self._lock:
+            entry = self._remove(key)
+            return default if entry is None else entry.value
+
+    def clear(self) -> None:
+        """
+        清空缓存 固定的键和统计信息会保留
+        :return:
+        """
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+
+    def _evict_if_needed(self) -> list[tuple[K, V]]:
+        """
+        超出容量时 按最久未使用的顺序淘汰未固定的条目
+        需要在持有锁时调用
+        :return: 被淘汰的条目
+        """
+        evicted: list[tuple[K, V]] = []
+        if not self._is_over_limit():
+            return evicted
+
+        for key in list(self._data.keys()):
+            if not self._is_over_limit():
+                break
+            if key in self._pinned:
+                continue
+            entry = self._remove(key)
+            self._evictions += 1
+            evicted.append((key, entry.value))
+
+        return evicted
+
+    def _is_over_limit(self) -> bool:
+        if 0 < self.max_size < len(self._data):
+            return True
+        if 0 < self.max_bytes < self._nbytes:
+            return True
+        return False
+
+    def _notify_evicted(self, evicted: list[tuple[K, V]]) -> None:
+        """
+        在锁外回调 避免回调中再访问缓存时死锁
+        """
+        if self.on_evict is None:
+            return
+        for key, value in evicted:
+            self.on_evict(key, value)
+
+    def pin(self, key: K) -> None:
+        """
+        固定某个键 固定后不会被淘汰 键可以还不在缓存中
+        :param key: 键
+        :return:
+        """
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: K) -> None:
+        """
+        取消固定某个键 如果超出容量 会马上进行淘汰
+        :param key: 键
+        :return:
+        """
+        with self._lock:
+            self._pinned.discard(key)
+            evicted = self._evict_if_needed()
+        self._notify_evicted(evicted)
+
+    def set_pinned(self, keys: Iterable[K]) -> None:
+        """
+        替换所有固定的键
+        :param keys: 新的固定键
+        :return:
+        """
+        with self._lock:
+            self._pinned = set(keys)
+            evicted = self._evict_if_needed()
+        self._notify_evicted(evicted)
+
+    @property
+    def pinned_keys(self) -> set[K]:
+        with self._lock:
+            return set(self._pinned)
+
+    def entry_nbytes(self) -> dict[K, int]:
+        """
+        :return: 每个条目最近一次计算的字节数 按最久未使用到最近使用排序
+        """
+        with self._lock:
+            return {key: entry.nbytes for key, entry in self._data.items()}
+
+    @property
+    def stats(self) -> LruCacheStats:
+        with self._lock:
+            return LruCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                size=len(self._data),
+                nbytes=self._nbytes,
+            )
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+            self._expirations = 0
+
+    def __contains__(self, key: K) -> bool:
+        """
+        是否存在 不影响最近使用顺序和统计信息
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._is_expired(entry, time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def keys(self) -> list[K]:
+        with self._lock:
+            return list(self._data.keys())
@@ -4,9 +4,11 @@ from typing import Optional
 
 import yaml
 
+from one_dragon.base.config import yaml_snapshot
 from one_dragon.utils.log_utils import log
 
 cached_yaml_data: dict[str, tuple[float, dict]] = {}
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)  # 有 libyaml 时使用C实现 解析快很多
 
 
 def get_temp_config_path(file_path: str) -> str:
@@ -22,15 +24,22 @@ def get_temp_config_path(file_path: str) -> str:
 
 def read_cache_or_load(file_path: str):
     cached = cached_yaml_data.get(file_path)
-    last_modify = os.path.getmtime(file_path)
+    stat = os.stat(file_path)
+    last_modify = stat.st_mtime
     if cached is not None and cached[0] == last_modify:
         return cached[1]
 
-    with open(file_path, 'r', encoding='utf-8') as file:
-        log.debug(f"加载yaml: {file_path}")
-        data = yaml.safe_load(file)
-        cached_yaml_data[file_path] = (last_modify, data)
-        return data
+    # 优先使用持久化的快照 文件有变化时再解析
+    snapshot = yaml_snapshot.get_snapshot()
+    found, data = snapshot.get(file_path, last_modify, stat.st_size)
+    if not found:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            log.debug(f"加载yaml: {file_path}")
+            data = yaml.load(file, Loader=_YamlLoader)
+        snapshot.put(file_path, last_modify, stat.st_size, data)
+
+    cached_yaml_data[file_path] = (last_modify, data)
+    return data
 
 
 class YamlOperator:
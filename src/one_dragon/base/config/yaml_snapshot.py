@@ -0,0 +1,155 @@
+import atexit
+import os
+import pickle
+import threading
+from typing import Any, List, Optional, Tuple
+
+from one_dragon.utils import os_utils
+from one_dragon.utils.log_utils import log
+
+SNAPSHOT_VERSION: int = 1  # 快照格式版本 格式有变化时需要增加 旧快照会自动失效
+
+SnapshotEntry = Tuple[float, int, bytes]  # 文件修改时间、文件大小、解析结果的pickle
+
+
+class YamlSnapshot:
+
+    def __init__(self, snapshot_path: str, scope_dir_list: List[str]):
+        """
+        yml解析结果的持久化快照
+        PyYAML解析较慢 启动时需要读取大量游戏数据和配置 将解析结果用pickle保存到一个文件中
+        每个文件按 修改时间+文件大小 判断快照是否有效 无效时重新解析
+
+        快照中保存的是刚解析完时的pickle 不会受到之后内存中修改的影响
+        :param snapshot_path: 快照文件路径
+        :param scope_dir_list: 需要保存快照的目录 只有这些目录下的文件会保存
+        """
+        self.snapshot_path: str = snapshot_path
+        self.scope_dir_list: List[str] = [os.path.normcase(os.path.abspath(i)) + os.sep for i in scope_dir_list]
+
+        self._entry_map: Optional[dict[str, SnapshotEntry]] = None  # 延迟到第一次使用时读取
+        self._dirty: bool = False  # 是否有新的解析结果需要保存
+        self._lock = threading.Lock()
+
+    def _key(self, file_path: str) -> Optional[str]:
+        """
+        :param file_path: 文件路径
+        :return: 快照中使用的key 不在范围内时返回空
+        """
+        key = os.path.normcase(os.path.abspath(file_path))
+        for scope_dir in self.scope_dir_list:
+            if key.startswith(scope_dir):
+                return key
+        return None
+
+    def _ensure_loaded(self) -> dict[str, SnapshotEntry]:
+        """
+        读取快照文件 只读取一次
+        :return:
+        """
+        if self._entry_map is not None:
+            return self._entry_map
+        with self._lock:
+            if self._entry_map is not None:
+                return self._entry_map
+
+            entry_map = {}
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, 'rb') as file:
+                        data = pickle.load(file)
+                    if data.get('version') == SNAPSHOT_VERSION:
+                        entry_map = data.get('entries', {})
+                except Exception:
+                    log.error('读取yml快照失败 %s', self.snapshot_path, exc_info=True)
+            self._entry_map = entry_map
+            return self._entry_map
+
+    def get(self, file_path: str, mtime: float, size: int) -> Tuple[bool, Any]:
+        """
+        获取快照中的解析结果
+        :param file_path: 文件路径
+        :param mtime: 当前的文件修改时间
+        :param size: 当前的文件大小
+        :return: 是否有有效的快照, 解析结果
+        """
+        key = self._key(file_path)
+        if key is None:
+            return False, None
+        entry = self._ensure_loaded().get(key)
+        if entry is None or entry[0] != mtime or entry[1] != size:
+            return False, None
+        try:
+            return True, pickle.loads(entry[2])
+        except Exception:
+            log.error('读取yml快照失败 %s', file_path, exc_info=True)
+            return False, None
+
+    def put(self, file_path: str, mtime: float, size: int, data: Any) -> None:
+        """
+        保存新的解析结果 需要在解析后马上调用 避免保存了内存中的修改
+        :param file_path: 文件路径
+        :param mtime: 解析时的文件修改时间
+        :param size: 解析时的文件大小
+        :param data: 解析结果
+        :return:
+        """
+        key = self._key(file_path)
+        if key is None:
+            return
+        try:
+            entry = (mtime, size, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            log.error('yml解析结果无法保存快照 %s', file_path, exc_info=True)
+            return
+        entry_map = self._ensure_loaded()
+        with self._lock:
+            entry_map[key] = entry
+            self._dirty = True
+
+    def save(self) -> None:
+        """
+        有新的解析结果时 保存快照文件
+        先写入临时文件再替换 避免中途退出时留下损坏的文件
+        :return:
+        """
+        with self._lock:
+            if not self._dirty or self._entry_map is None:
+                return
+            # 删除已经不存在的文件
+            entries = {k: v for k, v in self._entry_map.items() if os.path.exists(k)}
+            self._dirty = False
+
+        temp_path = f'{self.snapshot_path}.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                pickle.dump({'version': SNAPSHOT_VERSION, 'entries': entries}, file,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.snapshot_path)
+        except Exception:
+            log.error('保存yml快照失败 %s', self.snapshot_path, exc_info=True)
+
+
+_snapshot: Optional[YamlSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> YamlSnapshot:
+    """
+    游戏数据和配置的yml快照 退出时自动保存
+    :return:
+    """
+    global _snapshot
+    if _snapshot is not None:
+        return _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = YamlSnapshot(
+                snapshot_path=os.path.join(os_utils.get_path_under_work_dir('.cache'), 'yaml_snapshot.pickle'),
+                scope_dir_list=[
+                    os.path.join(os_utils.get_work_dir(), 'assets', 'game_data'),
+                    os.path.join(os_utils.get_work_dir(), 'config'),
+                ]
+            )
+            atexit.register(_snapshot.save)
+        return _snapshot
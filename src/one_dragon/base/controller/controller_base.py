@@ -1,30 +1,34 @@
 import time
+from collections import deque
 
 from cv2.typing import MatLike
-from typing import List
+from typing import ClassVar, Deque, List, Optional
 
+from one_dragon.base.controller.screen_capture import ScreenshotWithTime, ScreenCapture, FrameSource, CallableFrameSource
+from one_dragon.base.controller.session_record import ActionHook, SessionRecorder
 from one_dragon.base.geometry.point import Point
 
 
-class ScreenshotWithTime:
-
-    def __init__(self, screenshot: MatLike, create_time: float):
-        self.image: MatLike = screenshot
-        self.create_time: float = create_time
-
-
 class ControllerBase:
 
+    # 录制时需要记录的动作 子类有新的动作时需要补充
+    RECORD_ACTION_LIST: ClassVar[List[str]] = ['click', 'scroll', 'drag_to', 'close_game', 'input_str', 'delete_all_input']
+
     def __init__(self,
                  screenshot_alive_seconds: float = 5,
                  max_screenshot_cnt: int = 0):
         """
         基础控制器的定义
         """
-        self.screenshot_history: List[ScreenshotWithTime] = []
+        self.screenshot_history: Deque[ScreenshotWithTime] = deque(maxlen=max(max_screenshot_cnt, 1))
         self.screenshot_alive_seconds: float = screenshot_alive_seconds  # 截图在内存的存活时间
         self.max_screenshot_cnt: int = max_screenshot_cnt  # 内存中最多保持的截图数量
 
+        self.capture: Optional[ScreenCapture] = None  # 后台截图 开启后可以通过 latest_screenshot 获取最新的画面
+
+        self.session_recorder: Optional[SessionRecorder] = None  # 录制运行过程
+        self._record_hook: Optional[ActionHook] = None
+
     def init_before_context_run(self) -> bool:
         """
         运行前初始化
@@ -57,19 +61,101 @@ class ControllerBase:
         self.before_screenshot()
         now = time.time()
         screen = self.get_screenshot(independent)
+        return self._after_screenshot(screen, now)
+
+    def latest_screenshot(self, max_age: float) -> Optional[ScreenshotWithTime]:
+        """
+        获取后台截图中最新的一帧 不需要等待截图
+        适合可以接受稍早画面的场景 例如移动时计算坐标 调用方需要以返回的截图时间为准
+        :param max_age: 画面距离截图时间最多多少秒
+        :return: 没有开启后台截图 或没有足够新的画面时返回空 调用方应改用 screenshot
+        """
+        if self.capture is None or not self.capture.is_running:
+            return None
+        frame = self.capture.latest()
+        if frame is None or time.time() - frame.create_time > max_age:
+            return None
+        # 缓冲中的画面之后会被覆盖 需要复制出来
+        screen = self._after_screenshot(frame.image.copy(), frame.create_time)
+        return ScreenshotWithTime(screen, frame.create_time)
+
+    def _after_screenshot(self, screen: MatLike, now: float) -> MatLike:
+        """
+        截图后的处理 遮挡UID 录制 以及保存在内存中
+        :param screen: 截图
+        :param now: 截图时间
+        :return: 处理后的截图
+        """
         fix_screen = self.fill_uid_black(screen)
 
+        if self.session_recorder is not None:
+            self.session_recorder.record_frame(fix_screen, now)
+
         if self.max_screenshot_cnt > 0:
-            self.screenshot_history.append(ScreenshotWithTime(fix_screen, now))
-            while len(self.screenshot_history) > self.max_screenshot_cnt:
-                self.screenshot_history.pop(0)
+            self.screenshot_history.append(ScreenshotWithTime(fix_screen, now))  # 超过数量时 自动移除最旧的
 
             while (len(self.screenshot_history) > 0
                 and now - self.screenshot_history[0].create_time > self.screenshot_alive_seconds):
-                self.screenshot_history.pop(0)
+                self.screenshot_history.popleft()
 
         return fix_screen
 
+    def new_frame_source(self) -> FrameSource:
+        """
+        后台截图使用的画面来源 在截图线程中使用
+        子类可以实现不需要重新分配内存的来源
+        :return:
+        """
+        return CallableFrameSource(lambda: self.get_screenshot(independent=True))
+
+    def start_capture(self, source: Optional[FrameSource] = None,
+                      fps: float = 30, ring_size: int = 8) -> None:
+        """
+        开始后台截图 之后可以通过 latest_screenshot 获取最新的画面 screenshot 仍然是同步截图
+        :param source: 画面来源 不传入时使用游戏窗口 传入图片或视频时可以用于测试
+        :param fps: 每秒最多截图的次数
+        :param ring_size: 缓冲的画面数量
+        :return:
+        """
+        self.stop_capture()
+        self.capture = ScreenCapture(source if source is not None else self.new_frame_source(),
+                                     fps=fps, ring_size=ring_size)
+        self.capture.start()
+
+    def stop_capture(self) -> None:
+        """
+        停止后台截图
+        :return:
+        """
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+
+    def start_recording(self, session_dir: str, save_frames: bool = True) -> Optional[SessionRecorder]:
+        """
+        开始录制 之后的截图和 RECORD_ACTION_LIST 中的动作都会保存下来 可以用于离线回放
+        :param session_dir: 保存的文件夹
+        :param save_frames: 是否保存画面
+        :return: 录制器 不支持录制时返回空
+        """
+        self.stop_recording()
+        self.session_recorder = SessionRecorder(session_dir, save_frames=save_frames)
+        self._record_hook = ActionHook(self, self.RECORD_ACTION_LIST, self.session_recorder.record_action)
+        self._record_hook.attach()
+        return self.session_recorder
+
+    def stop_recording(self) -> None:
+        """
+        结束录制
+        :return:
+        """
+        if self._record_hook is not None:
+            self._record_hook.detach()
+            self._record_hook = None
+        if self.session_recorder is not None:
+            self.session_recorder.close()
+            self.session_recorder = None
+
     def before_screenshot(self) -> None:
         """
         截图前的操作 由子类实现
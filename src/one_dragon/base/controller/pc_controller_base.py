@@ -11,6 +11,7 @@ from pynput import keyboard
 from typing import Optional
 
 from one_dragon.base.controller.controller_base import ControllerBase
+from one_dragon.base.controller.screen_capture import FrameSource, new_buffer_like
 from one_dragon.base.controller.pc_button import pc_button_utils
 from one_dragon.base.controller.pc_button.ds4_button_controller import Ds4ButtonController
 from one_dragon.base.controller.pc_button.keyboard_mouse_controller import KeyboardMouseController
@@ -151,6 +152,15 @@ class PcControllerBase(ControllerBase):
 
         return result
 
+    def new_frame_source(self) -> FrameSource:
+        """
+        后台截图使用的画面来源 截图直接写入缓冲 不重新分配内存
+        :return:
+        """
+        if self.sct is None:
+            return ControllerBase.new_frame_source(self)
+        return PcWindowFrameSource(self)
+
     def scroll(self, down: int, pos: Point = None):
         """
         向下滚动
@@ -272,3 +282,46 @@ def get_current_mouse_pos() -> Point:
     """
     pos = pyautogui.position()
     return Point(pos.x, pos.y)
+
+
+class PcWindowFrameSource(FrameSource):
+
+    def __init__(self, controller: PcControllerBase):
+        """
+        使用 mss 截取游戏窗口 转换颜色和缩放都直接写入传入的图片
+        mss 对象不能跨线程使用 因此在截图线程中创建
+        :param controller: 控制器
+        """
+        self.controller: PcControllerBase = controller
+        self.sct = None
+        self._rgb: Optional[MatLike] = None  # 需要缩放时 颜色转换后的中间结果
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        if self.sct is None:
+            import mss
+            self.sct = mss.mss()
+
+        rect: Rect = self.controller.game_win.win_rect
+        if rect is None:
+            return None
+        monitor = {"top": rect.y1, "left": rect.x1, "width": rect.width, "height": rect.height}
+        bgra = np.asarray(self.sct.grab(monitor))  # 直接使用截图的内存 不复制
+
+        if self.controller.game_win.is_win_scale:
+            self._rgb = new_buffer_like(self._rgb, (bgra.shape[0], bgra.shape[1], 3))
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=self._rgb)
+            result = new_buffer_like(dst, (self.controller.standard_height, self.controller.standard_width, 3))
+            cv2.resize(self._rgb, (self.controller.standard_width, self.controller.standard_height), dst=result)
+        else:
+            result = new_buffer_like(dst, (bgra.shape[0], bgra.shape[1], 3))
+            cv2.cvtColor(bgra, cv2.COLOR_BGRA2RGB, dst=result)
+
+        return result
+
+    def close(self) -> None:
+        if self.sct is not None:
+            try:
+                self.sct.close()
+            except Exception:
+                pass
+            self.sct = None
@@ -0,0 +1,224 @@
+import time
+
+from typing import Any, Dict, List, Optional
+
+from cv2.typing import MatLike
+
+from one_dragon.base.controller.controller_base import ControllerBase
+from one_dragon.base.controller.screen_capture import FrameSource
+from one_dragon.base.controller.session_record import ActionHook, RecordedSession, ReplayFrameSource, \
+    SessionAction, SessionRecorder, new_session_action
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+
+
+class ReplayButtonController:
+
+    def __init__(self):
+        """
+        回放使用的按键 接口与 PcButtonController 一致
+        不进行实际的按键 只保留按住的耗时 使回放的耗时与录制时接近
+        """
+        self.key_press_time: float = 0.02
+
+    def tap(self, key: str) -> None:
+        pass
+
+    def press(self, key: str, press_time: Optional[float] = None) -> None:
+        if press_time is not None and press_time > 0:
+            time.sleep(press_time)
+
+    def reset(self) -> None:
+        pass
+
+    def release(self, key: str) -> None:
+        pass
+
+    def set_key_press_time(self, key_press_time: float) -> None:
+        self.key_press_time = key_press_time
+
+
+class ReplayGameWindow:
+
+    def __init__(self, standard_width: int = 1920, standard_height: int = 1080):
+        """
+        回放使用的游戏窗口 接口与 PcGameWindow 一致
+        窗口总是有效且在前台 大小与默认分辨率一致 游戏坐标就是窗口坐标
+        :param standard_width: 默认分辨率的宽
+        :param standard_height: 默认分辨率的高
+        """
+        self.standard_width: int = standard_width
+        self.standard_height: int = standard_height
+
+    def init_win(self) -> None:
+        pass
+
+    def get_win(self) -> None:
+        return None
+
+    def get_hwnd(self) -> int:
+        return 0
+
+    @property
+    def is_win_valid(self) -> bool:
+        return True
+
+    @property
+    def is_win_active(self) -> bool:
+        return True
+
+    @property
+    def is_win_scale(self) -> bool:
+        return False
+
+    def active(self) -> bool:
+        return True
+
+    @property
+    def win_rect(self) -> Rect:
+        return Rect(0, 0, self.standard_width, self.standard_height)
+
+    def get_scaled_game_pos(self, game_pos: Point) -> Optional[Point]:
+        return game_pos if self.is_valid_game_pos(game_pos) else None
+
+    def is_valid_game_pos(self, s_pos: Point, rect: Rect = None) -> bool:
+        if rect is None:
+            rect = self.win_rect
+        return 0 <= s_pos.x < rect.width and 0 <= s_pos.y < rect.height
+
+    def game2win_pos(self, game_pos: Point) -> Optional[Point]:
+        return self.get_scaled_game_pos(game_pos)
+
+
+class SessionReplay:
+
+    def __init__(self, controller: ControllerBase, session_dir: str,
+                 realtime: bool = True, output_dir: Optional[str] = None):
+        """
+        回放一段录制的运行过程 控制器共用的部分
+        - 截图使用录制的画面
+        - 控制器收到的动作 与录制时使用相同的 RECORD_ACTION_LIST 记录 可以与录制时的动作直接对比
+        :param controller: 控制器 需要在控制器初始化完成后创建
+        :param session_dir: 录制的文件夹
+        :param realtime: True=按录制时的时间返回画面 用于测量真实耗时; False=每次截图返回下一张画面 结果与运行速度无关
+        :param output_dir: 回放时的动作保存的文件夹 不传入时只保存在内存
+        """
+        self.session: RecordedSession = RecordedSession(session_dir)
+        self.frame_source: ReplayFrameSource = ReplayFrameSource(self.session, realtime=realtime)
+        self.action_list: List[SessionAction] = []  # 回放时控制器收到的动作
+        self.grab_time_list: List[float] = []  # 回放时每次截图的时间 用于计算每轮的耗时
+
+        self.output_recorder: Optional[SessionRecorder] = None
+        if output_dir is not None:
+            self.output_recorder = SessionRecorder(output_dir, save_frames=False)
+
+        self._hook: ActionHook = ActionHook(controller, controller.RECORD_ACTION_LIST, self._on_action)
+        self._hook.attach()
+
+    def restart(self) -> None:
+        """
+        从头开始回放 清空之前记录的动作
+        :return:
+        """
+        self.frame_source.restart()
+        self.action_list.clear()
+        self.grab_time_list.clear()
+
+    def _on_action(self, name: str, args: Dict[str, Any]) -> None:
+        action = new_session_action(self.frame_source.start_time, name, args)
+        self.action_list.append(action)
+        if self.output_recorder is not None:
+            self.output_recorder.write_action(action)
+
+    @property
+    def is_finished(self) -> bool:
+        """
+        画面是否已经回放完
+        """
+        return self.frame_source.is_finished
+
+    def grab(self) -> Optional[MatLike]:
+        """
+        获取当前的回放画面
+        :return:
+        """
+        self.grab_time_list.append(time.time())
+        return self.frame_source.grab()
+
+    def close(self) -> None:
+        """
+        结束回放
+        :return:
+        """
+        self._hook.detach()
+        if self.output_recorder is not None:
+            self.output_recorder.close()
+            self.output_recorder = None
+
+
+class ReplayController(ControllerBase):
+
+    def __init__(self, session_dir: str,
+                 standard_width: int = 1920,
+                 standard_height: int = 1080,
+                 realtime: bool = True,
+                 output_dir: Optional[str] = None):
+        """
+        使用录制画面的控制器 不需要游戏窗口 所有操作只记录不执行
+        只依赖 ControllerBase 和录制相关的模块 可以在没有游戏的 Linux 上运行
+        用于离线复现问题 以及端到端的性能测试
+        :param session_dir: 录制的文件夹
+        :param standard_width: 默认分辨率的宽
+        :param standard_height: 默认分辨率的高
+        :param realtime: 是否按录制时的时间返回画面
+        :param output_dir: 回放时的动作保存的文件夹
+        """
+        ControllerBase.__init__(self)
+        self.standard_width: int = standard_width
+        self.standard_height: int = standard_height
+        self.game_win: ReplayGameWindow = ReplayGameWindow(standard_width, standard_height)
+        self.sct = None
+        self.replay: SessionReplay = SessionReplay(self, session_dir, realtime=realtime, output_dir=output_dir)
+
+    def init_before_context_run(self) -> bool:
+        self.replay.restart()
+        return True
+
+    @property
+    def is_game_window_ready(self) -> bool:
+        return True
+
+    def active_window(self) -> None:
+        pass
+
+    def start_recording(self, session_dir: str, save_frames: bool = True) -> Optional[SessionRecorder]:
+        """
+        回放时不进行录制 避免开启了录制配置时 回放的画面又被保存一次
+        """
+        return None
+
+    def get_screenshot(self, independent: bool = False) -> MatLike:
+        return self.replay.grab()
+
+    def new_frame_source(self) -> FrameSource:
+        return self.replay.frame_source
+
+    def click(self, pos: Point = None, press_time: float = 0, pc_alt: bool = False) -> bool:
+        if press_time > 0:
+            time.sleep(press_time)
+        return True
+
+    def scroll(self, down: int, pos: Point = None):
+        pass
+
+    def drag_to(self, end: Point, start: Point = None, duration: float = 0.5):
+        pass
+
+    def close_game(self):
+        pass
+
+    def input_str(self, to_input: str, interval: float = 0.1):
+        pass
+
+    def mouse_move(self, game_pos: Point):
+        pass
@@ -0,0 +1,262 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.utils import cv2_utils
+from one_dragon.utils.log_utils import log
+
+
+class ScreenshotWithTime:
+
+    def __init__(self, screenshot: MatLike, create_time: float):
+        self.image: MatLike = screenshot
+        self.create_time: float = create_time
+
+
+class FrameSource:
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        """
+        获取一帧画面 RGB格式 默认分辨率
+        由子类实现
+        :param dst: 可以写入的图片 大小一致时应直接写入 避免重新分配内存
+        :return: 画面 获取失败时返回空
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        释放资源 在截图线程中调用
+        :return:
+        """
+        pass
+
+
+class CallableFrameSource(FrameSource):
+
+    def __init__(self, grab_func: Callable[[], Optional[MatLike]]):
+        """
+        使用一个截图方法作为画面来源 每次都会分配新的图片
+        :param grab_func: 截图方法
+        """
+        self.grab_func: Callable[[], Optional[MatLike]] = grab_func
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        return self.grab_func()
+
+
+class ImageFileFrameSource(FrameSource):
+
+    def __init__(self, file_path_list: List[str], loop: bool = True):
+        """
+        按顺序读取图片文件作为画面来源 用于测试和回放
+        :param file_path_list: 图片路径
+        :param loop: 读取完后是否从头开始
+        """
+        self.file_path_list: List[str] = file_path_list
+        self.loop: bool = loop
+        self._idx: int = 0
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        if self._idx >= len(self.file_path_list):
+            if not self.loop or len(self.file_path_list) == 0:
+                return None
+            self._idx = 0
+        image = cv2_utils.read_image(self.file_path_list[self._idx])
+        self._idx += 1
+        return image
+
+
+class VideoFrameSource(FrameSource):
+
+    def __init__(self, video_path: str, loop: bool = True):
+        """
+        读取视频作为画面来源 用于测试和回放
+        :param video_path: 视频路径
+        :param loop: 读取完后是否从头开始
+        """
+        self.video_path: str = video_path
+        self.loop: bool = loop
+        self._video: Optional[cv2.VideoCapture] = None
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        if self._video is None:
+            self._video = cv2.VideoCapture(self.video_path)
+        ret, frame = self._video.read()
+        if not ret and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._video.read()
+        if not ret:
+            return None
+        if dst is not None and dst.shape == frame.shape:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self) -> None:
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+class FrameRingBuffer:
+
+    def __init__(self, size: int = 8):
+        """
+        固定数量的画面环形缓冲 只有一个线程写入 可以多个线程读取
+        每个位置的图片在第一次写入后复用 之后的写入直接覆盖原来的内存
+
+        读取返回的都是缓冲中的图片本身 不会复制 在之后第 size-1 次写入时会被覆盖
+        需要长时间持有的话 要自行复制
+        :param size: 缓冲数量 至少为2 保证正在写入的不是最新的一帧
+        """
+        self.size: int = max(size, 2)
+        self._frames: List[Optional[MatLike]] = [None] * self.size
+        self._times: List[float] = [0] * self.size
+        self._seq: int = 0  # 已经写入的总数
+        self._cond = threading.Condition()
+
+    def next_buffer(self) -> Optional[MatLike]:
+        """
+        下一次写入的位置 当前的图片 只有写入线程可以使用
+        :return:
+        """
+        return self._frames[self._seq % self.size]
+
+    def publish(self, frame: MatLike, create_time: float) -> None:
+        """
+        写入一帧 写入后通知等待中的读取
+        :param frame: 画面 最好是写入到 next_buffer 的图片
+        :param create_time: 截图的时间
+        :return:
+        """
+        with self._cond:
+            idx = self._seq % self.size
+            self._frames[idx] = frame
+            self._times[idx] = create_time
+            self._seq += 1
+            self._cond.notify_all()
+
+    def latest(self) -> Optional[ScreenshotWithTime]:
+        """
+        最新的一帧 不复制
+        :return: 还没有画面时返回空
+        """
+        with self._cond:
+            return self._latest()
+
+    def _latest(self) -> Optional[ScreenshotWithTime]:
+        if self._seq == 0:
+            return None
+        idx = (self._seq - 1) % self.size
+        return ScreenshotWithTime(self._frames[idx], self._times[idx])
+
+    def since(self, t: float) -> List[ScreenshotWithTime]:
+        """
+        截图时间在t之后的画面 不复制
+        :param t: 时间
+        :return: 按时间从旧到新
+        """
+        with self._cond:
+            result = []
+            for i in range(max(self._seq - self.size + 1, 0), self._seq):  # 正在写入的位置不返回
+                idx = i % self.size
+                if self._times[idx] > t:
+                    result.append(ScreenshotWithTime(self._frames[idx], self._times[idx]))
+            return result
+
+
+class ScreenCapture:
+
+    def __init__(self, source: FrameSource, fps: float = 30, ring_size: int = 8):
+        """
+        后台截图 按固定帧率把画面写入环形缓冲
+        :param source: 画面来源
+        :param fps: 每秒最多截图的次数
+        :param ring_size: 缓冲的画面数量
+        """
+        self.source: FrameSource = source
+        self.fps: float = fps
+        self.ring: FrameRingBuffer = FrameRingBuffer(ring_size)
+
+        self._running: bool = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        """
+        开始后台截图
+        :return:
+        """
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='od_screen_capture', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        停止后台截图 等待截图线程结束
+        :return:
+        """
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def _run(self) -> None:
+        interval = 1.0 / self.fps if self.fps > 0 else 0
+        try:
+            while self._running:
+                start_time = time.time()
+                try:
+                    frame = self.source.grab(self.ring.next_buffer())
+                except Exception:
+                    log.error('后台截图失败', exc_info=True)
+                    frame = None
+                if frame is not None:
+                    self.ring.publish(frame, start_time)
+
+                sleep_time = interval - (time.time() - start_time)
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+                elif frame is None:
+                    time.sleep(0.01)  # 截图失败时 避免空转
+        finally:
+            try:
+                self.source.close()
+            except Exception:
+                log.error('关闭画面来源失败', exc_info=True)
+
+    def latest(self) -> Optional[ScreenshotWithTime]:
+        """
+        最新的一帧 不复制
+        :return:
+        """
+        return self.ring.latest()
+
+    def since(self, t: float) -> List[ScreenshotWithTime]:
+        """
+        截图时间在t之后的画面 不复制
+        :param t: 时间
+        :return: 按时间从旧到新
+        """
+        return self.ring.since(t)
+
+
+def new_buffer_like(dst: Optional[MatLike], shape: tuple) -> MatLike:
+    """
+    大小一致时复用传入的图片 否则新建
+    :param dst: 可以复用的图片
+    :param shape: 需要的大小
+    :return:
+    """
+    if dst is not None and dst.shape == shape and dst.dtype == np.uint8:
+        return dst
+    return np.empty(shape, dtype=np.uint8)
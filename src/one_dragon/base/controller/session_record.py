@@ -0,0 +1,286 @@
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+from cv2.typing import MatLike
+
+from one_dragon.base.controller.screen_capture import FrameSource
+from one_dragon.base.geometry.point import Point
+from one_dragon.utils import cv2_utils
+from one_dragon.utils.log_utils import log
+
+SESSION_EVENT_FILE: str = 'session.jsonl'  # 事件文件 每行一个事件
+SESSION_FRAME_DIR: str = 'frames'  # 画面文件夹
+
+_od_session_record_executor = ThreadPoolExecutor(thread_name_prefix='od_session_record', max_workers=1)
+
+
+def _to_json_value(value: Any) -> Any:
+    """
+    动作参数转换成可以保存的值
+    :param value: 参数
+    :return:
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Point):
+        return [value.x, value.y]
+    if isinstance(value, (list, tuple)):
+        return [_to_json_value(i) for i in value]
+    return str(value)
+
+
+class SessionAction:
+
+    def __init__(self, t: float, name: str, args: Dict[str, Any]):
+        """
+        录制或回放时 控制器收到的一个动作
+        :param t: 距离开始的秒数
+        :param name: 动作 即控制器的方法名
+        :param args: 参数
+        """
+        self.t: float = t
+        self.name: str = name
+        self.args: Dict[str, Any] = args
+
+    def __repr__(self):
+        return '%.3f %s %s' % (self.t, self.name, self.args)
+
+
+def new_session_action(start_time: float, name: str, args: Dict[str, Any]) -> SessionAction:
+    """
+    创建一个当前时间的动作 参数转换成可以保存的值
+    :param start_time: 开始的时间
+    :param name: 动作名称
+    :param args: 参数
+    :return:
+    """
+    return SessionAction(time.time() - start_time, name, {k: _to_json_value(v) for k, v in args.items()})
+
+
+class SessionRecorder:
+
+    def __init__(self, session_dir: str, save_frames: bool = True, max_pending_frames: int = 8):
+        """
+        录制一段运行过程 保存画面和动作
+        - session.jsonl 每行一个事件 frame 或 action
+        - frames/ 画面图片
+        :param session_dir: 保存的文件夹
+        :param save_frames: 是否保存画面 回放时只需要记录动作
+        :param max_pending_frames: 最多有多少张画面在等待保存 超过时丢弃新的画面 避免占用过多内存
+        """
+        self.session_dir: str = session_dir
+        self.save_frames: bool = save_frames
+        self.max_pending_frames: int = max_pending_frames
+        self.start_time: float = time.time()
+
+        os.makedirs(os.path.join(session_dir, SESSION_FRAME_DIR), exist_ok=True)
+        self._event_file = open(os.path.join(session_dir, SESSION_EVENT_FILE), 'w', encoding='utf-8')
+        self._lock = threading.Condition()
+        self._frame_idx: int = 0
+        self._pending_frames: int = 0
+
+    def _write_event(self, event: dict) -> None:
+        with self._lock:
+            if self._event_file is None:
+                return
+            self._event_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def record_frame(self, image: MatLike, create_time: float) -> None:
+        """
+        记录一张画面 图片在后台保存
+        :param image: 画面 RGB格式
+        :param create_time: 截图时间
+        :return:
+        """
+        if not self.save_frames:
+            return
+        with self._lock:
+            if self._pending_frames >= self.max_pending_frames:
+                log.debug('录制画面保存不及 丢弃一帧')
+                return
+            self._pending_frames += 1
+            file_name = '%06d.png' % self._frame_idx
+            self._frame_idx += 1
+
+        file_path = os.path.join(self.session_dir, SESSION_FRAME_DIR, file_name)
+        _od_session_record_executor.submit(self._save_frame, image.copy(), file_path)
+        self._write_event({'t': create_time - self.start_time, 'type': 'frame', 'file': file_name})
+
+    def _save_frame(self, image: MatLike, file_path: str) -> None:
+        try:
+            # 压缩等级低一点 保存更快
+            cv2.imwrite(file_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        except Exception:
+            log.error('保存录制画面失败 %s', file_path, exc_info=True)
+        finally:
+            with self._lock:
+                self._pending_frames -= 1
+                self._lock.notify_all()
+
+    def record_action(self, name: str, args: Dict[str, Any]) -> SessionAction:
+        """
+        记录一个动作
+        :param name: 动作名称
+        :param args: 参数
+        :return:
+        """
+        action = new_session_action(self.start_time, name, args)
+        self._write_event({'t': action.t, 'type': 'action', 'name': action.name, 'args': action.args})
+        return action
+
+    def write_action(self, action: SessionAction) -> None:
+        """
+        记录一个已有的动作 保留动作原来的时间
+        :param action: 动作
+        :return:
+        """
+        self._write_event({'t': action.t, 'type': 'action', 'name': action.name, 'args': action.args})
+
+    def close(self, timeout: float = 10) -> None:
+        """
+        结束录制 等待后台的画面保存完 使结束后可以马上回放
+        :param timeout: 最多等待的秒数
+        :return:
+        """
+        with self._lock:
+            if not self._lock.wait_for(lambda: self._pending_frames == 0, timeout=timeout):
+                log.error('录制画面未能在 %.1f 秒内保存完', timeout)
+            if self._event_file is not None:
+                self._event_file.close()
+                self._event_file = None
+
+
+class ActionHook:
+
+    def __init__(self, target: Any, action_name_list: List[str], callback: Callable[[str, Dict[str, Any]], None]):
+        """
+        拦截一个对象的若干方法 调用时先回调再执行原方法
+        方法内部调用的其它被拦截方法不会回调 例如 move_towards 内部的 turn_by_angle 只记录 move_towards
+        :param target: 对象 通常是控制器
+        :param action_name_list: 需要拦截的方法名称
+        :param callback: 回调 参数为 方法名称, 参数
+        """
+        self.target: Any = target
+        self.action_name_list: List[str] = [i for i in action_name_list if callable(getattr(target, i, None))]
+        self.callback: Callable[[str, Dict[str, Any]], None] = callback
+        self._local = threading.local()
+
+    def attach(self) -> None:
+        """
+        开始拦截 在实例上覆盖同名方法
+        :return:
+        """
+        for name in self.action_name_list:
+            setattr(self.target, name, self._wrap(name, getattr(self.target, name)))
+
+    def detach(self) -> None:
+        """
+        停止拦截 恢复原来的方法
+        :return:
+        """
+        for name in self.action_name_list:
+            if name in self.target.__dict__:
+                delattr(self.target, name)
+
+    def _wrap(self, name: str, method: Callable) -> Callable:
+        signature = inspect.signature(method)
+
+        def wrapper(*args, **kwargs):
+            depth = getattr(self._local, 'depth', 0)
+            if depth == 0:
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                    self.callback(name, dict(bound.arguments))
+                except Exception:
+                    log.error('记录动作失败 %s', name, exc_info=True)
+            self._local.depth = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._local.depth = depth
+
+        return wrapper
+
+
+class RecordedSession:
+
+    def __init__(self, session_dir: str):
+        """
+        读取录制的运行过程
+        :param session_dir: 录制的文件夹
+        """
+        self.session_dir: str = session_dir
+        self.frame_list: List[Tuple[float, str]] = []  # 截图时间, 图片路径
+        self.action_list: List[SessionAction] = []
+
+        with open(os.path.join(session_dir, SESSION_EVENT_FILE), 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if len(line) == 0:
+                    continue
+                event = json.loads(line)
+                if event['type'] == 'frame':
+                    self.frame_list.append((event['t'], os.path.join(session_dir, SESSION_FRAME_DIR, event['file'])))
+                elif event['type'] == 'action':
+                    self.action_list.append(SessionAction(event['t'], event['name'], event.get('args', {})))
+        self.frame_list.sort(key=lambda i: i[0])
+
+
+class ReplayFrameSource(FrameSource):
+
+    def __init__(self, session: RecordedSession, realtime: bool = True):
+        """
+        使用录制的画面作为画面来源
+        :param session: 录制的运行过程
+        :param realtime: True=按录制时的时间返回当时的画面 用于测量真实耗时; False=每次返回下一张画面
+        """
+        self.session: RecordedSession = session
+        self.realtime: bool = realtime
+        self.start_time: float = time.time()
+        self._next_idx: int = 0
+        self._cache_idx: int = -1
+        self._cache_image: Optional[MatLike] = None
+
+    def restart(self) -> None:
+        """
+        从头开始回放
+        :return:
+        """
+        self.start_time = time.time()
+        self._next_idx = 0
+
+    @property
+    def is_finished(self) -> bool:
+        """
+        画面是否已经回放完
+        """
+        frame_list = self.session.frame_list
+        if self.realtime:
+            return len(frame_list) == 0 or time.time() - self.start_time > frame_list[-1][0]
+        else:
+            return self._next_idx >= len(frame_list)
+
+    def grab(self, dst: Optional[MatLike] = None) -> Optional[MatLike]:
+        frame_list = self.session.frame_list
+        if len(frame_list) == 0:
+            return None
+
+        if self.realtime:
+            elapsed = time.time() - self.start_time
+            while self._next_idx < len(frame_list) and frame_list[self._next_idx][0] <= elapsed:
+                self._next_idx += 1
+            idx = max(self._next_idx - 1, 0)
+        else:
+            idx = min(self._next_idx, len(frame_list) - 1)
+            self._next_idx += 1
+
+        if idx != self._cache_idx:
+            self._cache_image = cv2_utils.read_image(frame_list[idx][1])
+            self._cache_idx = idx
+        return None if self._cache_image is None else self._cache_image.copy()
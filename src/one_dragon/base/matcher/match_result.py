@@ -1,4 +1,6 @@
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Tuple
+
+import numpy as np
 
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.geometry.rectangle import Rect
@@ -51,6 +53,11 @@ class MatchResultList:
         self.arr: List[MatchResult] = []
         self.max: Optional[MatchResult] = None
 
+        # 合并用的网格索引 格子边长为合并距离 只需要检查相邻的9个格子
+        self._grid: dict[Tuple[int, int], List[int]] = {}  # 格子 -> 结果在 arr 中的下标
+        self._grid_cell_size: int = 0  # 当前网格的格子边长 0为未建立
+        self._grid_item_cnt: int = 0  # 网格中的结果数量 与 arr 长度不一致时重建
+
     def __repr__(self):
         return '[%s]' % ', '.join(str(i) for i in self.arr)
 
@@ -86,18 +93,78 @@ class MatchResultList:
                 self.arr[0] = a
         else:
             if auto_merge:
-                for i in self.arr:
-                    if (i.x - a.x) ** 2 + (i.y - a.y) ** 2 <= merge_distance ** 2:
-                        if a.confidence > i.confidence:
-                            i.x = a.x
-                            i.y = a.y
-                            i.confidence = a.confidence
-                        return
+                i = self._find_merge_target(a, merge_distance)
+                if i is not None:
+                    if a.confidence > i.confidence:
+                        old_cell = self._get_grid_cell(i)
+                        i.x = a.x
+                        i.y = a.y
+                        i.confidence = a.confidence
+                        self._move_grid_item(i, old_cell)
+                        if self.max is None or i.confidence > self.max.confidence:
+                            self.max = i
+                    return
 
             self.arr.append(a)
+            if self._grid_cell_size > 0:
+                self._add_grid_item(len(self.arr) - 1)
             if self.max is None or a.confidence > self.max.confidence:
                 self.max = a
 
+    def _get_grid_cell(self, a: MatchResult) -> Tuple[int, int]:
+        return a.x // self._grid_cell_size, a.y // self._grid_cell_size
+
+    def _add_grid_item(self, idx: int) -> None:
+        self._grid.setdefault(self._get_grid_cell(self.arr[idx]), []).append(idx)
+        self._grid_item_cnt += 1
+
+    def _move_grid_item(self, a: MatchResult, old_cell: Tuple[int, int]) -> None:
+        """
+        合并后结果的坐标有变化 移动到新的格子
+        """
+        new_cell = self._get_grid_cell(a)
+        if new_cell == old_cell:
+            return
+        idx_list = self._grid[old_cell]
+        idx = next(i for i in idx_list if self.arr[i] is a)
+        idx_list.remove(idx)
+        self._grid.setdefault(new_cell, []).append(idx)
+
+    def _rebuild_grid(self, cell_size: int) -> None:
+        """
+        按格子边长重建网格索引
+        """
+        self._grid = {}
+        self._grid_cell_size = cell_size
+        self._grid_item_cnt = 0
+        for idx in range(len(self.arr)):
+            self._add_grid_item(idx)
+
+    def _find_merge_target(self, a: MatchResult, merge_distance: float) -> Optional[MatchResult]:
+        """
+        找出需要合并的结果 与逐个比较一致 多个满足时取最早加入的
+        :param a: 新的结果
+        :param merge_distance: 合并距离
+        :return:
+        """
+        if len(self.arr) == 0:
+            return None
+        cell_size = max(1, int(np.ceil(merge_distance)))
+        if cell_size != self._grid_cell_size or self._grid_item_cnt != len(self.arr):
+            self._rebuild_grid(cell_size)
+
+        cx, cy = self._get_grid_cell(a)
+        target_idx: Optional[int] = None
+        for gx in range(cx - 1, cx + 2):
+            for gy in range(cy - 1, cy + 2):
+                for idx in self._grid.get((gx, gy), []):
+                    if target_idx is not None and idx > target_idx:
+                        continue
+                    i = self.arr[idx]
+                    if (i.x - a.x) ** 2 + (i.y - a.y) ** 2 <= merge_distance ** 2:
+                        target_idx = idx
+        return None if target_idx is None else self.arr[target_idx]
+
     def extend(self, mrl: "MatchResultList", auto_merge: bool = True, merge_distance: float = 10) -> None:
         """
         加入将另一个列表的所有元素
@@ -119,3 +186,13 @@ class MatchResultList:
         """
         for mr in self.arr:
             mr.add_offset(lt)
+        self._grid_cell_size = 0  # 坐标变化后 网格需要重建
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        转换成数组 方便批量计算
+        :return: shape=(n, 5) 每行为 [置信度, x, y, w, h]
+        """
+        if len(self.arr) == 0:
+            return np.zeros((0, 5), dtype=np.float64)
+        return np.array([[i.confidence, i.x, i.y, i.w, i.h] for i in self.arr], dtype=np.float64)
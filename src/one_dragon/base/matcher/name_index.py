@@ -0,0 +1,73 @@
+import difflib
+from typing import Dict, List, Optional, Set
+
+
+class NameIndex:
+
+    def __init__(self, word_list: List[str]):
+        """
+        名称列表的索引 用于根据OCR结果匹配名称
+        - 完全一致时 直接哈希查找
+        - 否则使用字符倒排索引 只对有共同字符的名称计算相似度
+        结果与 str_utils.find_best_match_by_difflib 一致
+        :param word_list: 名称列表
+        """
+        self.word_list: List[str] = word_list
+
+        self._exact_map: Dict[str, int] = {}  # 名称 -> 第一次出现的下标
+        self._char_map: Dict[str, Set[int]] = {}  # 字符 -> 包含该字符的名称下标
+        for idx, word in enumerate(word_list):
+            if word not in self._exact_map:
+                self._exact_map[word] = idx
+            for c in word:
+                self._char_map.setdefault(c, set()).add(idx)
+
+    def __len__(self):
+        return len(self.word_list)
+
+    def find_exact(self, word: str) -> Optional[int]:
+        """
+        :param word: 名称
+        :return: 完全一致的名称的下标
+        """
+        return self._exact_map.get(word)
+
+    def find_best_match(self, word: str, cutoff: float = 0.6) -> Optional[int]:
+        """
+        找出最相似的名称 相似度使用 difflib
+        :param word: OCR结果
+        :param cutoff: 最低相似度
+        :return: 最相似的名称的下标
+        """
+        idx = self._exact_map.get(word)
+        if idx is not None:
+            return idx
+
+        if cutoff <= 0:  # 没有共同字符的也可能满足 只能全部比较
+            candidate_list = range(len(self.word_list))
+        else:
+            candidate_set = set()
+            for c in set(word):
+                candidate_set.update(self._char_map.get(c, ()))
+            candidate_list = sorted(candidate_set)
+
+        # 与 difflib.get_close_matches 的计算一致 按(相似度, 名称)取最大的
+        s = difflib.SequenceMatcher()
+        s.set_seq2(word)
+        best_score: Optional[float] = None
+        best_word: Optional[str] = None
+        for idx in candidate_list:
+            target = self.word_list[idx]
+            s.set_seq1(target)
+            if s.real_quick_ratio() < cutoff or s.quick_ratio() < cutoff:
+                continue
+            score = s.ratio()
+            if score < cutoff:
+                continue
+            if best_score is None or (score, target) > (best_score, best_word):
+                best_score = score
+                best_word = target
+
+        if best_word is None:
+            return None
+        return self._exact_map[best_word]
@@ -57,4 +57,18 @@ class OcrMatcher:
         Returns:
             ocr_result_list: 识别结果列表
         """
-        pass
\ No newline at end of file
+        pass
+
+    def ocr_batch(self, image_list: list[MatLike], threshold: float = 0) -> list[list[OcrMatchResult]]:
+        """
+        对多张图片进行OCR 返回每张图片的识别结果
+        默认逐张识别 子类可以合并识别以减少模型调用
+
+        Args:
+            image_list: 图片列表
+            threshold: 匹配阈值
+
+        Returns:
+            ocr_result_list_per_image: 每张图片的识别结果列表 顺序与传入的图片一致
+        """
+        return [self.ocr(image, threshold) for image in image_list]
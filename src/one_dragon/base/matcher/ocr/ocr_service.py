@@ -1,27 +1,38 @@
+import hashlib
 import time
 
 import cv2
 import numpy as np
 from cv2.typing import MatLike
 from dataclasses import dataclass
-from threading import Lock
 from typing import List, Optional
 
+from one_dragon.base.cache.lru_cache import LruCache, LruCacheStats
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.geometry.rectangle import Rect
 from one_dragon.base.matcher.match_result import MatchResultList
 from one_dragon.base.matcher.ocr.ocr_match_result import OcrMatchResult
 from one_dragon.base.matcher.ocr.ocr_matcher import OcrMatcher
-from one_dragon.utils import cal_utils
+from one_dragon.utils import cv2_utils
 from one_dragon.utils import str_utils
 from one_dragon.utils.i18_utils import gt
 from one_dragon.utils.log_utils import log
 
 
+@dataclass
+class OcrRequest:
+    """一个OCR请求 批量识别时使用"""
+    image: MatLike  # 输入图片
+    rect: Rect | None = None  # 识别特定的区域 为空时识别全图
+    color_range: list[list[int]] | None = None  # 颜色范围过滤 [[lower], [upper]]
+    threshold: float = 0  # OCR阈值
+    dilate_size: int = 5  # 颜色过滤的掩码膨胀大小 0为不膨胀
+
+
 @dataclass(frozen=True)
 class OcrCacheEntry:
     """OCR缓存条目"""
-    ocr_result_list: list[OcrMatchResult]  # OCR识别结果
+    ocr_result_list: list[OcrMatchResult]  # OCR识别结果 坐标相对识别的区域 只读 返回前需要复制
     create_time: float  # 创建时间
     cache_key: str  # 缓存 key
     image_hash: str  # 图片哈希
@@ -31,45 +42,69 @@ class OcrCacheEntry:
 class OcrService:
     """
     OCR服务
-    - 提供缓存
-    - 提存并发识别 (未实现)
+    - 提供缓存 按识别区域内的图片内容哈希 区域内画面不变时不需要重复识别
+    - 提供批量识别 多个区域的文字合并成一次识别
     """
-    
-    def __init__(self, ocr_matcher: OcrMatcher, max_cache_size: int = 2):
+
+    def __init__(self, ocr_matcher: OcrMatcher, max_cache_size: int = 32, cache_ttl: float = 60):
         """
         初始化OCR服务
         
         Args:
             ocr_matcher: OCR匹配器实例
-            max_cache_size: 最大缓存条目数
+            max_cache_size: 最大缓存条目数 超出时淘汰最久未使用的
+            cache_ttl: 缓存过期秒数 0为不过期
         """
         self.ocr_matcher = ocr_matcher
-        self.max_cache_size = max_cache_size
         
-        # 缓存存储：key为图片哈希+颜色范围键，value为缓存条目
-        self._cache: dict[str, OcrCacheEntry] = {}
-        self._cache_list: list[OcrCacheEntry] = []
-        self._cache_lock = Lock()
+        # 缓存存储：key为区域图片哈希+颜色范围键+识别参数，value为缓存条目
+        self._cache: LruCache[str, OcrCacheEntry] = LruCache(max_size=max_cache_size, ttl=cache_ttl)
+
+    @property
+    def max_cache_size(self) -> int:
+        return self._cache.max_size
+
+    @max_cache_size.setter
+    def max_cache_size(self, value: int) -> None:
+        self._cache.max_size = value
+
+    @property
+    def cache_ttl(self) -> float:
+        return self._cache.ttl
+
+    @cache_ttl.setter
+    def cache_ttl(self, value: float) -> None:
+        self._cache.ttl = value
+
+    @property
+    def cache_stats(self) -> LruCacheStats:
+        """
+        缓存的统计信息 包括命中率
+        """
+        return self._cache.stats
     
     def _generate_image_hash(self, image: MatLike) -> str:
         """
         生成图片哈希值
+        按图片内容计算 不同对象但像素相同的图片可以命中同一个缓存
         
         Args:
             image: 输入图片
             
         Returns:
-            图片的MD5哈希值
+            图片内容的哈希值 包含尺寸信息
         """
-        # 将图片转换为字节数组并计算哈希
-        return id(image)
+        data = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(data.data, digest_size=16).hexdigest()
+        return f"{'x'.join(str(i) for i in data.shape)}_{data.dtype}_{digest}"
     
-    def _generate_color_range_key(self, color_range: list[list[int]] | None) -> str:
+    def _generate_color_range_key(self, color_range: list[list[int]] | None, dilate_size: int = 5) -> str:
         """
         生成颜色范围键值
         
         Args:
             color_range: 颜色范围 [[lower], [upper]]
+            dilate_size: 掩码膨胀大小 会影响过滤后的图片
             
         Returns:
             颜色范围的字符串键值
@@ -81,40 +116,33 @@ class OcrService:
         for range in color_range:
             for num in range:
                 range_arr.append(str(num))
+        range_arr.append(f'd{dilate_size}')
         return '_'.join(range_arr)
 
-    def _generate_cache_key(self, image_hash: str, color_range_key: str) -> str:
+    def _generate_cache_key(self, image_hash: str, color_range_key: str,
+                            threshold: float = 0, merge_line_distance: float = -1) -> str:
         """
         生成缓存键
         
         Args:
             image_hash: 图片哈希
             color_range_key: 颜色范围键
+            threshold: OCR阈值 会影响识别结果
+            merge_line_distance: 行合并距离 会影响识别结果
             
         Returns:
             缓存键
         """
-        return f"{image_hash}_{color_range_key}"
+        return f"{image_hash}_{color_range_key}_{threshold}_{merge_line_distance}"
     
-    def _clean_expired_cache(self) -> None:
-        """
-        清除过期缓存
-        Returns:
-
-        """
-        if len(self._cache_list) <= self.max_cache_size:
-            return
-
-        first_cache: OcrCacheEntry = self._cache_list.pop(0)
-        self._cache.pop(first_cache.cache_key)
-    
-    def _apply_color_filter(self, image: MatLike, color_range: Optional[List]) -> MatLike:
+    def _apply_color_filter(self, image: MatLike, color_range: Optional[List], dilate_size: int = 5) -> MatLike:
         """
         应用颜色过滤
         
         Args:
             image: 输入图片
             color_range: 颜色范围 [[lower], [upper]]
+            dilate_size: 掩码膨胀大小 0为不膨胀
             
         Returns:
             过滤后的图片
@@ -125,8 +153,8 @@ class OcrService:
         # 应用颜色范围过滤
         mask = cv2.inRange(image, np.array(color_range[0]), np.array(color_range[1]))
         # 膨胀操作，增强文本区域
-        from one_dragon.utils import cv2_utils
-        mask = cv2_utils.dilate(mask, 5)
+        if dilate_size > 0:
+            mask = cv2_utils.dilate(mask, dilate_size)
         filtered_image = cv2.bitwise_and(image, image, mask=mask)
         
         return filtered_image
@@ -140,7 +168,8 @@ class OcrService:
             merge_line_distance: float = -1
     ) -> list[OcrMatchResult]:
         """
-        获取全图OCR结果，优先从缓存获取
+        获取OCR结果，优先从缓存获取
+        传入区域时 只对区域内的图片进行识别 缓存也只按区域内的图片内容计算 区域外的变化不影响缓存
 
         Args:
             image: 输入图片
@@ -150,24 +179,26 @@ class OcrService:
             merge_line_distance: 行合并距离
 
         Returns:
-            ocr_result_list: OCR识别结果列表
+            ocr_result_list: OCR识别结果列表 坐标是相对原图的 每次返回新的对象 可以随意修改
         """
+        part, crop_rect = cv2_utils.crop_image(image, rect)
+        offset = Point(0, 0) if crop_rect is None else crop_rect.left_top
+
         # 生成缓存键
-        image_hash = self._generate_image_hash(image)
+        image_hash = self._generate_image_hash(part)
         color_range_key = self._generate_color_range_key(color_range)
-        cache_key = self._generate_cache_key(image_hash, color_range_key)
+        cache_key = self._generate_cache_key(image_hash, color_range_key, threshold, merge_line_distance)
 
         # 检查缓存
-        if cache_key in self._cache:
-            ocr_result_list = self._cache[cache_key].ocr_result_list
-        else:
+        cache_entry: Optional[OcrCacheEntry] = self._cache.get(cache_key)
+        if cache_entry is None:
             # 应用颜色过滤
-            processed_image = self._apply_color_filter(image, color_range)
+            processed_image = self._apply_color_filter(part, color_range)
 
             # 执行OCR
             ocr_result_list = self.ocr_matcher.ocr(processed_image, threshold, merge_line_distance)
 
-            # 存储到缓存
+            # 存储到缓存 坐标是相对区域的
             cache_entry = OcrCacheEntry(
                 ocr_result_list=ocr_result_list,
                 create_time=time.time(),
@@ -175,21 +206,95 @@ class OcrService:
                 image_hash=image_hash,
                 color_range_key=color_range_key
             )
-            self._cache[cache_key] = cache_entry
-            self._clean_expired_cache()
+            self._cache.put(cache_key, cache_entry)
 
-        if rect is not None:
-            # 过滤出指定区域内的结果
-            area_result_list: list[OcrMatchResult] = []
+        return self._copy_result_list(cache_entry.ocr_result_list, offset)
 
-            for ocr_result in ocr_result_list:
-                # 检查匹配结果是否和指定区域重叠
-                if cal_utils.cal_overlap_percent(ocr_result.rect, rect) > 0.7:
-                    area_result_list.append(ocr_result)
+    @staticmethod
+    def _copy_result_list(ocr_result_list: list[OcrMatchResult], offset: Point) -> list[OcrMatchResult]:
+        """
+        复制缓存中的识别结果 并加上区域的偏移
+        缓存中的结果不会返回给调用方 避免被修改后影响之后的命中
 
-            return area_result_list
-        else:
-            return ocr_result_list
+        Args:
+            ocr_result_list: 缓存中的识别结果 坐标是相对区域的
+            offset: 区域左上角在原图中的坐标
+
+        Returns:
+            ocr_result_list: 坐标相对原图的新结果
+        """
+        return [
+            OcrMatchResult(i.confidence, i.x + offset.x, i.y + offset.y, i.w, i.h,
+                           template_scale=i.template_scale, data=i.data)
+            for i in ocr_result_list
+        ]
+
+    def get_ocr_result_list_batch(self, request_list: list[OcrRequest],
+                                  use_cache: bool = True) -> list[list[OcrMatchResult]]:
+        """
+        批量获取多个区域的OCR结果，优先从缓存获取
+        每个请求的裁剪、颜色过滤、缓存键都与 get_ocr_result_list 一致 结果也一致 两者共用缓存
+        只是把所有未命中缓存的区域 合并成一次 ocr_matcher.ocr_batch 调用
+        不使用缓存时 同一批中内容相同的区域仍然只识别一次
+
+        Args:
+            request_list: OCR请求列表
+            use_cache: 是否读写缓存 对应 env_config.ocr_cache
+
+        Returns:
+            ocr_result_list_per_request: 每个请求的识别结果列表 顺序与请求一致 坐标是相对原图的
+        """
+        cache_result_list: list[Optional[list[OcrMatchResult]]] = [None] * len(request_list)  # 坐标相对区域
+        offset_list: list[Point] = []
+
+        to_ocr_key_map: dict[str, list[int]] = {}  # 未命中的缓存键 -> 请求下标 相同内容的区域只识别一次
+        to_ocr_image_list: list[MatLike] = []
+        to_ocr_threshold_list: list[float] = []
+        to_ocr_entry_info_list: list[tuple[str, str, str]] = []  # 缓存键, 图片哈希, 颜色范围键
+
+        for idx, request in enumerate(request_list):
+            part, crop_rect = cv2_utils.crop_image(request.image, request.rect)
+            offset_list.append(Point(0, 0) if crop_rect is None else crop_rect.left_top)
+
+            image_hash = self._generate_image_hash(part)
+            color_range_key = self._generate_color_range_key(request.color_range, request.dilate_size)
+            cache_key = self._generate_cache_key(image_hash, color_range_key, request.threshold)
+
+            if cache_key in to_ocr_key_map:
+                to_ocr_key_map[cache_key].append(idx)
+                continue
+
+            cache_entry: Optional[OcrCacheEntry] = self._cache.get(cache_key) if use_cache else None
+            if cache_entry is not None:
+                cache_result_list[idx] = cache_entry.ocr_result_list
+                continue
+
+            to_ocr_key_map[cache_key] = [idx]
+            to_ocr_image_list.append(self._apply_color_filter(part, request.color_range, request.dilate_size))
+            to_ocr_threshold_list.append(request.threshold)
+            to_ocr_entry_info_list.append((cache_key, image_hash, color_range_key))
+
+        # 不同阈值分开调用 通常只有一种
+        for threshold in dict.fromkeys(to_ocr_threshold_list):
+            idx_list = [i for i, t in enumerate(to_ocr_threshold_list) if t == threshold]
+            batch_result = self.ocr_matcher.ocr_batch([to_ocr_image_list[i] for i in idx_list], threshold)
+            for i, ocr_result_list in zip(idx_list, batch_result):
+                cache_key, image_hash, color_range_key = to_ocr_entry_info_list[i]
+                if use_cache:
+                    self._cache.put(cache_key, OcrCacheEntry(
+                        ocr_result_list=ocr_result_list,
+                        create_time=time.time(),
+                        cache_key=cache_key,
+                        image_hash=image_hash,
+                        color_range_key=color_range_key
+                    ))
+                for request_idx in to_ocr_key_map[cache_key]:
+                    cache_result_list[request_idx] = ocr_result_list
+
+        return [
+            self._copy_result_list(ocr_result_list if ocr_result_list is not None else [], offset)
+            for ocr_result_list, offset in zip(cache_result_list, offset_list)
+        ]
 
     def get_ocr_result_map(
             self,
@@ -272,6 +377,12 @@ class OcrService:
 
     def clear_cache(self) -> None:
         """清空所有缓存"""
-        with self._cache_lock:
-            self._cache.clear()
-            log.debug("OCR缓存已清空")
+        self._cache.clear()
+        log.debug("OCR缓存已清空")
+
+    def log_cache_stats(self) -> None:
+        """输出缓存统计信息"""
+        stats = self.cache_stats
+        log.debug("OCR缓存 条目 %d 命中 %d 未命中 %d 命中率 %.2f%% 淘汰 %d 过期 %d",
+                  stats.size, stats.hits, stats.misses, stats.hit_rate * 100,
+                  stats.evictions, stats.expirations)
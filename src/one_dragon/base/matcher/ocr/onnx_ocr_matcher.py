@@ -300,6 +300,43 @@ class OnnxOcrMatcher(OcrMatcher, ZipDownloader):
 
         return ocr_result_list
 
+    def ocr_batch(self, image_list: list[MatLike], threshold: float = 0) -> list[list[OcrMatchResult]]:
+        """
+        对多张图片进行OCR 每张图片单独检测 所有文字合并成一次识别
+
+        Args:
+            image_list: 图片列表
+            threshold: 匹配阈值
+
+        Returns:
+            ocr_result_list_per_image: 每张图片的识别结果列表 顺序与传入的图片一致
+        """
+        if len(image_list) == 0:
+            return []
+        start_time = time.time()
+        result_list: list[list[OcrMatchResult]] = []
+
+        for dt_boxes, rec_res in self._model.batch_call(image_list, cls=False):
+            ocr_result_list: list[OcrMatchResult] = []
+            for box, (anchor_text, anchor_score) in zip(dt_boxes, rec_res):
+                if anchor_score < threshold:
+                    continue
+                anchor_position = box.tolist()
+                ocr_result_list.append(OcrMatchResult(
+                    anchor_score,
+                    anchor_position[0][0],
+                    anchor_position[0][1],
+                    anchor_position[1][0] - anchor_position[0][0],
+                    anchor_position[3][1] - anchor_position[0][1],
+                    data=anchor_text))
+            result_list.append(ocr_result_list)
+
+        if log.isEnabledFor(DEBUG):
+            log.debug('批量OCR %d 张图片 结果 %s 耗时 %.2f', len(image_list),
+                      [[i.data for i in r] for r in result_list], time.time() - start_time)
+
+        return result_list
+
 
 def __debug():
     ocr = OnnxOcrMatcher()
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.matcher.match_result import MatchResult
+from one_dragon.base.screen.template_info import TemplateInfo
+from one_dragon.utils import cv2_utils
+
+
+class TemplateFeatureIndex:
+
+    def __init__(self, template_list: List[TemplateInfo]):
+        """
+        同一类多个模板的特征索引 用于在一张图上同时特征匹配多个模板
+        所有模板的描述子合并成一个矩阵 每帧只需要一次 knnMatch 再按模板拆分结果分别做RANSAC
+        每个模板描述子的 knn 结果只与源图有关 因此结果与逐个模板调用 feature_match_for_one 一致
+        :param template_list: 模板列表 没有特征的模板会被忽略
+        """
+        self.template_list: List[TemplateInfo] = []
+        self._range_list: List[Tuple[int, int]] = []  # 每个模板的描述子在合并矩阵中的下标范围
+        self._kps: List[cv2.KeyPoint] = []  # 合并后的关键点 下标与合并后的描述子对应
+
+        desc_list: List[MatLike] = []
+        for template in template_list:
+            if template is None:
+                continue
+            kps, desc = template.features
+            if kps is None or desc is None or len(kps) == 0:
+                continue
+            start = len(self._kps)
+            self._kps.extend(kps)
+            desc_list.append(desc)
+            self.template_list.append(template)
+            self._range_list.append((start, len(self._kps)))
+
+        self._desc: Optional[MatLike] = np.vstack(desc_list) if len(desc_list) > 0 else None
+
+    def match(self, source_kp, source_desc,
+              source_mask: Optional[MatLike] = None,
+              knn_distance_percent: float = 0.7,
+              template_id_list: Optional[Set[str]] = None) -> Dict[str, MatchResult]:
+        """
+        在源图中找出各个模板的位置
+        :param source_kp: 源图关键点
+        :param source_desc: 源图描述子
+        :param source_mask: 源图掩码
+        :param knn_distance_percent: 越小要求匹配程度越高
+        :param template_id_list: 只返回这些模板的结果 不传入时返回全部
+        :return: 模板id -> 缩放后的位置和大小 按模板顺序 没有找到的模板不在结果中
+        """
+        result_map: Dict[str, MatchResult] = {}
+        if self._desc is None or len(source_kp) == 0:
+            return result_map
+
+        if template_id_list is None:
+            to_match_list = list(zip(self.template_list, self._range_list))
+            query_desc = self._desc
+            query_kps = self._kps
+        else:  # 只取需要的模板 避免计算用不上的描述子
+            to_match_list = []
+            desc_list = []
+            query_kps = []
+            for template, (start, end) in zip(self.template_list, self._range_list):
+                if template.template_id not in template_id_list:
+                    continue
+                to_match_list.append((template, (len(query_kps), len(query_kps) + end - start)))
+                desc_list.append(self._desc[start:end])
+                query_kps.extend(self._kps[start:end])
+            if len(to_match_list) == 0:
+                return result_map
+            query_desc = np.vstack(desc_list)
+
+        feature_matcher = cv2.BFMatcher()
+        matches = feature_matcher.knnMatch(query_desc, source_desc, k=2)
+
+        for template, (start, end) in to_match_list:
+            _, offset_x, offset_y, template_scale = cv2_utils.feature_match_by_knn(
+                source_kp, query_kps, matches[start:end],
+                knn_distance_percent=knn_distance_percent, source_mask=source_mask)
+            if offset_x is None:
+                continue
+
+            scaled_width = int(template.raw.shape[1] * template_scale)
+            scaled_height = int(template.raw.shape[0] * template_scale)
+            result_map[template.template_id] = MatchResult(1, offset_x, offset_y, scaled_width, scaled_height,
+                                                           template_scale)
+
+        return result_map
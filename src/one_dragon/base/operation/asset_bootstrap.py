@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from one_dragon.utils.log_utils import log
+
+_od_asset_bootstrap_executor = ThreadPoolExecutor(thread_name_prefix='od_asset_bootstrap', max_workers=4)
+# 各个资源内部 读取单个文件使用的线程池 与上面分开 避免资源任务等待文件任务时占满线程
+ASSET_FILE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix='od_asset_file', max_workers=8)
+
+
+class AssetLoadProfile:
+
+    def __init__(self, name: str):
+        """
+        一类资源的加载耗时
+        :param name: 资源名称
+        """
+        self.name: str = name
+        self.submit_time: float = time.time()  # 提交的时间
+        self.start_time: float = 0  # 开始加载的时间
+        self.end_time: float = 0  # 加载结束的时间
+        self.thread_name: str = ''  # 加载使用的线程
+        self.error: Optional[BaseException] = None  # 加载失败的异常
+
+    @property
+    def wait_seconds(self) -> float:
+        """
+        提交后 等待线程的时间
+        """
+        return self.start_time - self.submit_time
+
+    @property
+    def cost_seconds(self) -> float:
+        """
+        加载的耗时
+        """
+        return self.end_time - self.start_time
+
+    def __repr__(self):
+        return '%s 等待 %.3fs 耗时 %.3fs 线程 %s' % (self.name, self.wait_seconds, self.cost_seconds, self.thread_name)
+
+
+class AssetBootstrap:
+
+    def __init__(self):
+        """
+        启动时 并行加载互不依赖的各类资源 并记录每类资源的耗时
+        使用方式:
+        1. 尽早 submit 各类资源的加载方法
+        2. 在真正需要使用时 get 获取结果 未加载完时会等待
+        """
+        self._future_map: Dict[str, Future] = {}
+        self._profile_map: Dict[str, AssetLoadProfile] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, load_func: Callable[[], Any]) -> Future:
+        """
+        提交一类资源的加载
+        :param name: 资源名称 同名资源只会加载一次
+        :param load_func: 加载方法 返回值通过 get 获取
+        :return:
+        """
+        with self._lock:
+            if name in self._future_map:
+                return self._future_map[name]
+            profile = AssetLoadProfile(name)
+            self._profile_map[name] = profile
+            future = _od_asset_bootstrap_executor.submit(self._run, profile, load_func)
+            self._future_map[name] = future
+            return future
+
+    @staticmethod
+    def _run(profile: AssetLoadProfile, load_func: Callable[[], Any]) -> Any:
+        profile.start_time = time.time()
+        profile.thread_name = threading.current_thread().name
+        try:
+            return load_func()
+        except BaseException as e:
+            profile.error = e
+            log.error('资源加载失败 %s', profile.name, exc_info=True)
+            raise
+        finally:
+            profile.end_time = time.time()
+            log.debug('资源加载 %s', profile)
+
+    def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        获取一类资源的加载结果 未加载完时会等待
+        加载失败时 会在这里抛出异常
+        :param name: 资源名称
+        :param timeout: 最多等待的秒数
+        :return:
+        """
+        future = self._future_map.get(name)
+        if future is None:
+            raise KeyError(f'资源未提交加载 {name}')
+        return future.result(timeout=timeout)
+
+    def wait_all(self, timeout: Optional[float] = None) -> None:
+        """
+        等待所有已提交的资源加载完毕 不抛出加载的异常
+        :param timeout: 每类资源最多等待的秒数
+        :return:
+        """
+        for future in list(self._future_map.values()):
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    @property
+    def profile_list(self) -> List[AssetLoadProfile]:
+        """
+        :return: 各类资源的加载耗时 按提交顺序
+        """
+        return list(self._profile_map.values())
+
+    def log_profile(self) -> None:
+        """
+        输出各类资源的加载耗时 未加载完的不输出
+        :return:
+        """
+        for profile in self.profile_list:
+            if profile.end_time == 0:
+                continue
+            log.info('资源加载 %s', profile)
@@ -3,11 +3,13 @@ from enum import Enum
 from pynput import keyboard, mouse
 from typing import Optional
 
+from one_dragon.base.config import yaml_snapshot
 from one_dragon.base.config.custom_config import CustomConfig, UILanguageEnum
 from one_dragon.base.config.game_account_config import GameAccountConfig
 from one_dragon.base.config.one_dragon_app_config import OneDragonAppConfig
 from one_dragon.base.config.one_dragon_config import OneDragonConfig
 from one_dragon.base.config.push_config import PushConfig
+from one_dragon.base.operation.asset_bootstrap import AssetBootstrap
 from one_dragon.base.operation.context_lazy_signal import ContextLazySignal
 from one_dragon.base.controller.controller_base import ControllerBase
 from one_dragon.base.controller.pc_button.pc_button_listener import PcButtonListener
@@ -19,7 +21,7 @@ from one_dragon.base.operation.context_event_bus import ContextEventBus
 from one_dragon.base.operation.one_dragon_env_context import OneDragonEnvContext, ONE_DRAGON_CONTEXT_EXECUTOR
 from one_dragon.base.screen.screen_loader import ScreenContext
 from one_dragon.base.screen.template_loader import TemplateLoader
-from one_dragon.utils import debug_utils, i18_utils, log_utils
+from one_dragon.utils import debug_utils, i18_utils, log_utils, os_utils
 from one_dragon.utils import thread_utils
 from one_dragon.utils.i18_utils import gt
 from one_dragon.utils.log_utils import log
@@ -59,6 +61,11 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         ContextEventBus.__init__(self)
         OneDragonEnvContext.__init__(self)
 
+        # 先提交资源加载 与下面的配置读取等并行进行
+        self.asset_bootstrap: AssetBootstrap = AssetBootstrap()
+        self.template_loader: TemplateLoader = TemplateLoader()
+        self.submit_asset_loading()
+
         self.one_dragon_config: OneDragonConfig = OneDragonConfig()
         self.custom_config: CustomConfig = CustomConfig()
         self.signal: ContextLazySignal = ContextLazySignal()
@@ -69,8 +76,7 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
 
         self.context_running_state: ContextRunStateEnum = ContextRunStateEnum.STOP
 
-        self.screen_loader: ScreenContext = ScreenContext()
-        self.template_loader: TemplateLoader = TemplateLoader()
+        self.screen_loader: ScreenContext = self.asset_bootstrap.get('screen_info')
         self.tm: TemplateMatcher = TemplateMatcher(self.template_loader)
         self.ocr: OcrMatcher = OnnxOcrMatcher()
         self.ocr_service: OcrService | None = None  # 延迟初始化
@@ -81,6 +87,14 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         self.btn_listener = PcButtonListener(on_button_tap=self._on_key_press, listen_keyboard=True, listen_mouse=True)
         self.btn_listener.start()
 
+    def submit_asset_loading(self) -> None:
+        """
+        提交启动时需要加载的资源 在后台并行加载
+        子类可以增加需要加载的资源 在使用的地方通过 asset_bootstrap.get 获取
+        :return:
+        """
+        self.asset_bootstrap.submit('screen_info', ScreenContext)
+
     def init_by_config(self) -> None:
         """
         根据配置进行初始化
@@ -104,6 +118,10 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
 
         self.context_running_state = ContextRunStateEnum.RUN
         self.controller.init_before_context_run()
+        if self.env_config.record_session:
+            session_dir = os_utils.get_path_under_work_dir('.debug', 'session', os_utils.now_timestamp_str())
+            if self.controller.start_recording(session_dir) is not None:
+                log.info('开始录制运行过程 %s', session_dir)
         self.dispatch_event(ContextRunningStateEventEnum.START_RUNNING.value, self.context_running_state)
         return True
 
@@ -111,6 +129,7 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         if self.is_context_running:  # 先触发暂停 让执行中的指令停止
             self.switch_context_pause_and_run()
         self.context_running_state = ContextRunStateEnum.STOP
+        self.controller.stop_recording()
         log.info('停止运行')
         self.dispatch_event(ContextRunningStateEventEnum.STOP_RUNNING.value, self.context_running_state)
 
@@ -245,7 +264,10 @@ class OneDragonContext(ContextEventBus, OneDragonEnvContext):
         @return:
         """
         self.btn_listener.stop()
+        if self.ocr_service is not None:
+            self.ocr_service.log_cache_stats()
         self.one_dragon_config.clear_temp_instance_indices()
         self.one_dragon_app_config.clear_temp_app_run_list()
+        yaml_snapshot.get_snapshot().save()
         ContextEventBus.after_app_shutdown(self)
         OneDragonEnvContext.after_app_shutdown(self)
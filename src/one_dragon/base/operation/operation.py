@@ -10,6 +10,7 @@ from io import BytesIO
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.matcher.match_result import MatchResultList
 from one_dragon.base.matcher.ocr import ocr_utils
+from one_dragon.base.matcher.ocr.ocr_service import OcrRequest
 from one_dragon.base.operation.one_dragon_context import OneDragonContext, ContextRunningStateEventEnum
 from one_dragon.base.operation.operation_base import OperationBase, OperationResult
 from one_dragon.base.operation.operation_edge import OperationEdge, OperationEdgeDesc
@@ -18,7 +19,7 @@ from one_dragon.base.operation.operation_round_result import OperationRoundResul
 from one_dragon.base.screen import screen_utils
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.screen.screen_utils import OcrClickResultEnum, FindAreaResultEnum
-from one_dragon.utils import debug_utils, cv2_utils, str_utils
+from one_dragon.utils import debug_utils, str_utils
 from one_dragon.utils.i18_utils import coalesce_gt, gt
 from one_dragon.utils.log_utils import log
 
@@ -757,23 +758,7 @@ class Operation(OperationBase):
         :param color_range: 文本匹配的颜色范围
         :return: 点击结果
         """
-        # 优先使用OCR缓存服务
-        if self.ctx.env_config.ocr_cache:
-            ocr_result_map = self.ctx.ocr_service.get_ocr_result_list(
-                image=screen,
-                color_range=color_range,
-                rect=None if area is None else area.rect
-            )
-        else:
-            # 回退到原有方法
-            to_ocr_part = screen if area is None else cv2_utils.crop_image_only(screen, area.rect)
-            if color_range is not None:
-                mask = cv2.inRange(to_ocr_part, color_range[0], color_range[1])
-                mask = cv2_utils.dilate(mask, 5)
-                to_ocr_part = cv2.bitwise_and(to_ocr_part, to_ocr_part, mask=mask)
-                # cv2_utils.show_image(to_ocr_part, win_name='round_by_ocr_and_click', wait=0)
-
-            ocr_result_map = self.ctx.ocr.run_ocr(to_ocr_part)
+        ocr_result_map = self._ocr_area(screen, area, color_range)
 
         to_click: Optional[Point] = None
         ocr_result_list: List[str] = []
@@ -800,9 +785,6 @@ class Operation(OperationBase):
         if to_click is None:
             return self.round_retry(f'找不到 {target_cn}', wait=retry_wait, wait_round_time=retry_wait_round)
 
-        if area is not None:
-            to_click = to_click + area.left_top
-
         click = self.ctx.controller.click(to_click)
         if click:
             return self.round_success(target_cn, wait=success_wait, wait_round_time=success_wait_round)
@@ -832,23 +814,7 @@ class Operation(OperationBase):
         :param color_range: 文本匹配的颜色范围
         :return: 点击结果
         """
-        # 优先使用OCR缓存服务
-        if self.ctx.env_config.ocr_cache:
-            ocr_result_map = self.ctx.ocr_service.get_ocr_result_list(
-                image=screen,
-                color_range=color_range,
-                rect=area.rect,
-            )
-        else:
-            # 回退到原有方法
-            to_ocr_part = screen if area is None else cv2_utils.crop_image_only(screen, area.rect)
-            if color_range is not None:
-                mask = cv2.inRange(to_ocr_part, color_range[0], color_range[1])
-                mask = cv2_utils.dilate(mask, 5)
-                to_ocr_part = cv2.bitwise_and(to_ocr_part, to_ocr_part, mask=mask)
-                # cv2_utils.show_image(to_ocr_part, win_name='round_by_ocr_and_click', wait=0)
-
-            ocr_result_map = self.ctx.ocr.run_ocr(to_ocr_part)
+        ocr_result_map = self._ocr_area(screen, area, color_range)
 
         match_word, match_word_mrl = ocr_utils.match_word_list_by_priority(
             ocr_result_map,
@@ -861,6 +827,19 @@ class Operation(OperationBase):
 
         return self.round_retry(status='未匹配到目标文本', wait=retry_wait, wait_round_time=retry_wait_round)
 
+    def _ocr_area(self, screen: MatLike, area: Optional[ScreenArea] = None,
+                  color_range: Optional[List] = None) -> dict[str, MatchResultList]:
+        """
+        对目标区域进行OCR 经过 OcrService 按 env_config.ocr_cache 决定是否使用缓存
+        :param screen: 游戏画面
+        :param area: 区域 为空时识别整个画面
+        :param color_range: 文本匹配的颜色范围
+        :return: key=识别文本 value=识别结果列表 坐标是相对游戏画面的
+        """
+        request = OcrRequest(image=screen, rect=None if area is None else area.rect, color_range=color_range)
+        ocr_result_list = screen_utils.get_ocr_result_list_batch(self.ctx, [request])[0]
+        return self.ctx.ocr_service.convert_list_to_map(ocr_result_list)
+
     def round_by_ocr(
             self,
             screen: MatLike,
@@ -2,8 +2,10 @@ import os
 from cv2.typing import MatLike
 from typing import Optional
 
+from one_dragon.base.operation.asset_bootstrap import ASSET_FILE_EXECUTOR
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.base.screen.screen_match_index import ScreenMatchIndex
 from one_dragon.utils.log_utils import log
 
 
@@ -48,6 +50,7 @@ class ScreenContext:
         self.screen_info_map: dict[str, ScreenInfo] = {}
         self._screen_area_map: dict[str, ScreenArea] = {}
         self.screen_route_map: dict[str, dict[str, ScreenRoute]] = {}
+        self.match_index: ScreenMatchIndex = ScreenMatchIndex([])  # 画面识别的索引
 
         self.load_all()
         self.last_screen_name: Optional[str] = None  # 上一个画面名字
@@ -63,17 +66,22 @@ class ScreenContext:
         self._screen_area_map.clear()
 
         dir_path = ScreenInfo.get_dir_path()
+        screen_id_list = []
         for file_name in os.listdir(dir_path):
             file_path = os.path.join(dir_path, file_name)
             if file_name.endswith('.yml') and os.path.isfile(file_path):
-                screen_info = ScreenInfo(screen_id=file_name[:-4])
-                self.screen_info_list.append(screen_info)
-                self.screen_info_map[screen_info.screen_name] = screen_info
+                screen_id_list.append(file_name[:-4])
 
-                for screen_area in screen_info.area_list:
-                    self._screen_area_map[f'{screen_info.screen_name}.{screen_area.area_name}'] = screen_area
+        # 读取yml和图片 并行进行 结果按原来的顺序
+        for screen_info in ASSET_FILE_EXECUTOR.map(lambda screen_id: ScreenInfo(screen_id=screen_id), screen_id_list):
+            self.screen_info_list.append(screen_info)
+            self.screen_info_map[screen_info.screen_name] = screen_info
+
+            for screen_area in screen_info.area_list:
+                self._screen_area_map[f'{screen_info.screen_name}.{screen_area.area_name}'] = screen_area
 
         self.init_screen_route()
+        self.match_index = ScreenMatchIndex(self.screen_info_list)
 
     def get_screen(self, screen_name: str) -> ScreenInfo:
         """
@@ -0,0 +1,261 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.base.screen.screen_area import ScreenArea
+from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.utils import cv2_utils
+
+COST_COLOR: int = 0  # 颜色统计 只需要遍历区域内的像素
+COST_TEMPLATE: int = 1  # 模板匹配
+COST_OCR: int = 2  # OCR
+
+HIST_BINS: List[int] = [8, 8, 8]  # 颜色直方图每个通道的分箱数量
+
+
+def cal_color_hist(image: MatLike) -> np.ndarray:
+    """
+    计算区域的颜色直方图 已归一化
+    :param image: 区域图片
+    :return:
+    """
+    hist = cv2.calcHist([image], [0, 1, 2], None, HIST_BINS, [0, 256, 0, 256, 0, 256])
+    cv2.normalize(hist, hist)
+    return hist
+
+
+class ScreenIdCheck:
+
+    def __init__(self, area: ScreenArea, ref_hist: Optional[np.ndarray] = None):
+        """
+        画面的一个标识区域 及预先计算的判断信息
+        :param area: 区域
+        :param ref_hist: 画面截图中该区域的颜色直方图 没有截图时为空
+        """
+        self.area: ScreenArea = area
+        self.ref_hist: Optional[np.ndarray] = ref_hist
+
+        # 区域内容一致时 不同画面的标识区域判断结果相同 使用同一个key
+        self.key: Tuple = (
+            area.rect.x1, area.rect.y1, area.rect.x2, area.rect.y2,
+            area.text if area.is_text_area else None,
+            area.lcs_percent if area.is_text_area else None,
+            area.template_sub_dir if area.is_template_area else None,
+            area.template_id if area.is_template_area else None,
+            area.template_match_threshold if area.is_template_area else None,
+            str(area.color_range),
+        )
+
+        if area.is_template_area:
+            self.cost: int = COST_TEMPLATE
+        elif area.is_text_area:
+            self.cost: int = COST_OCR
+        else:
+            self.cost: int = COST_COLOR
+
+        self.share_cnt: int = 1  # 有多少个画面使用了同样的标识区域
+
+    @property
+    def has_cheap_reject(self) -> bool:
+        """
+        是否可以在OCR之前 用颜色统计提前排除
+        只有颜色范围的判断是准确的 参考直方图只用于调整判断顺序 不能用来排除
+        """
+        return self.area.is_text_area and self.area.color_range is not None
+
+
+class ScreenMatchIndex:
+
+    def __init__(self, screen_info_list: List[ScreenInfo]):
+        """
+        画面识别的索引
+        预先整理每个画面的标识区域 按 代价从低到高、共用画面数量从多到少 排序
+        - 共用的标识区域只需要判断一次 判断失败时可以一次排除多个画面
+        - 有画面截图的文本区域 预先计算颜色直方图 用于决定同一个画面中多个文本区域的OCR顺序
+        :param screen_info_list: 所有画面
+        """
+        self.screen_check_map: Dict[str, List[ScreenIdCheck]] = {}
+
+        check_map: Dict[Tuple, ScreenIdCheck] = {}
+        for screen_info in screen_info_list:
+            check_list: List[ScreenIdCheck] = []
+            for area in screen_info.area_list:
+                if not area.id_mark:
+                    continue
+                check = ScreenIdCheck(area, ref_hist=self._cal_ref_hist(screen_info, area))
+                if check.key in check_map:
+                    shared = check_map[check.key]
+                    shared.share_cnt += 1
+                    if shared.ref_hist is None:
+                        shared.ref_hist = check.ref_hist
+                    check = shared
+                else:
+                    check_map[check.key] = check
+                check_list.append(check)
+            self.screen_check_map[screen_info.screen_name] = check_list
+
+        for check_list in self.screen_check_map.values():
+            check_list.sort(key=lambda i: (i.cost, -i.share_cnt))
+
+    @staticmethod
+    def _cal_ref_hist(screen_info: ScreenInfo, area: ScreenArea) -> Optional[np.ndarray]:
+        """
+        计算画面截图中 文本区域的颜色直方图
+        有颜色范围的区域 使用颜色范围判断 不需要直方图
+        """
+        if not area.is_text_area or area.color_range is not None or screen_info.screen_image is None:
+            return None
+        h, w = screen_info.screen_image.shape[:2]
+        if area.rect.x2 > w or area.rect.y2 > h:
+            return None
+        part = cv2_utils.crop_image_only(screen_info.screen_image, area.rect)
+        if part.size == 0:
+            return None
+        return cal_color_hist(part)
+
+    def get_check_list(self, screen_info: ScreenInfo) -> List[ScreenIdCheck]:
+        """
+        获取画面的标识区域判断列表 不在索引中的画面(例如正在编辑的) 现场生成
+        :param screen_info: 画面
+        :return:
+        """
+        check_list = self.screen_check_map.get(screen_info.screen_name)
+        if check_list is not None:
+            return check_list
+        check_list = [ScreenIdCheck(area) for area in screen_info.area_list if area.id_mark]
+        check_list.sort(key=lambda i: i.cost)
+        return check_list
+
+
+class ScreenMatchSession:
+
+    def __init__(self, index: ScreenMatchIndex, screen: MatLike,
+                 find_area: Callable[[ScreenArea], bool]):
+        """
+        对一张游戏截图进行画面识别
+        同一张截图中 同样的标识区域只判断一次
+        :param index: 画面识别的索引
+        :param screen: 游戏截图
+        :param find_area: 判断截图中能否找到某个区域 见 screen_utils.find_area_in_screen
+        """
+        self.index: ScreenMatchIndex = index
+        self.screen: MatLike = screen
+        self.find_area: Callable[[ScreenArea], bool] = find_area
+
+        self._result_map: Dict[Tuple, bool] = {}  # 已判断的标识区域结果
+        self._reject_map: Dict[Tuple, bool] = {}  # 已判断的颜色统计结果 True=可以排除
+        self._hist_distance_map: Dict[Tuple, float] = {}  # 已计算的与参考直方图的距离
+
+    def _is_rejected_by_color(self, check: ScreenIdCheck) -> bool:
+        """
+        使用颜色统计 判断文本区域是否一定找不到
+        有颜色范围时 区域内没有任何符合颜色的像素 过滤后的图片为全黑 OCR一定找不到
+        :param check: 标识区域
+        :return: 是否可以排除
+        """
+        if not check.has_cheap_reject:
+            return False
+        rejected = self._reject_map.get(check.key)
+        if rejected is not None:
+            return rejected
+
+        part = cv2_utils.crop_image_only(self.screen, check.area.rect)
+        if part.size == 0:
+            rejected = False
+        else:
+            mask = cv2.inRange(part, check.area.color_range_lower, check.area.color_range_upper)
+            rejected = cv2.countNonZero(mask) == 0
+
+        self._reject_map[check.key] = rejected
+        if rejected:
+            self._result_map[check.key] = False
+        return rejected
+
+    def _get_hist_distance(self, check: ScreenIdCheck) -> float:
+        """
+        文本区域与参考直方图的距离 没有参考直方图时为0
+        距离越大 越可能找不到 只用于调整判断顺序
+        :param check: 标识区域
+        :return:
+        """
+        if check.ref_hist is None:
+            return 0
+        distance = self._hist_distance_map.get(check.key)
+        if distance is not None:
+            return distance
+
+        part = cv2_utils.crop_image_only(self.screen, check.area.rect)
+        if part.size == 0:
+            distance = 0
+        else:
+            distance = cv2.compareHist(cal_color_hist(part), check.ref_hist, cv2.HISTCMP_BHATTACHARYYA)
+        self._hist_distance_map[check.key] = distance
+        return distance
+
+    def _check_area(self, check: ScreenIdCheck) -> bool:
+        """
+        判断标识区域 结果会被记录
+        :param check: 标识区域
+        :return: 是否找到
+        """
+        result = self._result_map.get(check.key)
+        if result is not None:
+            return result
+        if self._is_rejected_by_color(check):
+            return False
+        result = self.find_area(check.area)
+        self._result_map[check.key] = result
+        return result
+
+    def is_possible_screen(self, screen_info: ScreenInfo) -> bool:
+        """
+        只使用代价较低的判断 不进行OCR
+        :param screen_info: 画面
+        :return: 是否可能是这个画面 返回False时一定不是
+        """
+        check_list = self.index.get_check_list(screen_info)
+        if len(check_list) == 0:
+            return False
+        for check in check_list:
+            if self._result_map.get(check.key) is False:
+                return False
+            if check.cost < COST_OCR:
+                if not self._check_area(check):
+                    return False
+            elif self._is_rejected_by_color(check):
+                return False
+        return True
+
+    def is_target_screen(self, screen_info: ScreenInfo) -> bool:
+        """
+        判断是否目标画面 需要所有标识区域都能找到
+        多个文本区域时 与参考直方图差距大的先OCR 更早发现不符合 判断顺序不影响结果
+        :param screen_info: 画面
+        :return:
+        """
+        check_list = self.index.get_check_list(screen_info)
+        if len(check_list) == 0:
+            return False
+        if sum(1 for i in check_list if i.cost == COST_OCR and i.key not in self._result_map) > 1:
+            check_list = sorted(check_list, key=lambda i: (
+                i.cost, -self._get_hist_distance(i) if i.cost == COST_OCR else 0, -i.share_cnt))
+        for check in check_list:
+            if not self._check_area(check):
+                return False
+        return True
+
+    def find_first(self, screen_info_list: List[ScreenInfo]) -> Optional[str]:
+        """
+        按顺序找出第一个符合的画面 结果与逐个调用 is_target_screen 一致
+        先用代价较低的判断筛选一遍所有画面 再对剩下的画面按顺序进行OCR
+        剩下的画面只有一个时 就只需要对这一个画面进行OCR
+        :param screen_info_list: 画面列表 按优先级排序
+        :return: 画面名称
+        """
+        candidate_list = [i for i in screen_info_list if self.is_possible_screen(i)]
+        for screen_info in candidate_list:
+            if self.is_target_screen(screen_info):
+                return screen_info.screen_name
+        return None
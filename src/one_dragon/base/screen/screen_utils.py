@@ -1,13 +1,14 @@
 import cv2
-import numpy as np
 from cv2.typing import MatLike
 from enum import Enum
 from typing import Optional, List
 
-from one_dragon.base.geometry.point import Point
+from one_dragon.base.matcher.ocr.ocr_match_result import OcrMatchResult
+from one_dragon.base.matcher.ocr.ocr_service import OcrRequest
 from one_dragon.base.operation.one_dragon_context import OneDragonContext
 from one_dragon.base.screen.screen_area import ScreenArea
 from one_dragon.base.screen.screen_info import ScreenInfo
+from one_dragon.base.screen.screen_match_index import ScreenMatchSession
 from one_dragon.utils import cv2_utils, str_utils
 from one_dragon.utils.i18_utils import gt
 
@@ -53,31 +54,8 @@ def find_area_in_screen(ctx: OneDragonContext, screen: MatLike, area: ScreenArea
 
     find: bool = False
     if area.is_text_area:
-        if ctx.env_config.ocr_cache:
-            ocr_result_map = ctx.ocr_service.get_ocr_result_list(
-                image=screen,
-                color_range=area.color_range,
-                rect=area.rect
-            )
-        else:
-            rect = area.rect
-            part = cv2_utils.crop_image_only(screen, rect)
-
-            if area.color_range is None:
-                to_ocr = part
-            else:
-                mask = cv2.inRange(part,
-                                   np.array(area.color_range[0], dtype=np.uint8),
-                                   np.array(area.color_range[1], dtype=np.uint8))
-                mask = cv2_utils.dilate(mask, 2)
-                to_ocr = cv2.bitwise_and(part, part, mask=mask)
-
-            ocr_result_map = ctx.ocr.run_ocr(to_ocr)
-
-        for ocr_result, mrl in ocr_result_map.items():
-            if str_utils.find_by_lcs(gt(area.text, 'game'), ocr_result, percent=area.lcs_percent):
-                find = True
-                break
+        ocr_result_list = get_ocr_result_list_batch(ctx, [_get_text_area_request(ctx, screen, area)])[0]
+        find = _is_text_area_found(area, ocr_result_list)
     elif area.is_template_area:
         rect = area.rect
         part = cv2_utils.crop_image_only(screen, rect)
@@ -89,6 +67,70 @@ def find_area_in_screen(ctx: OneDragonContext, screen: MatLike, area: ScreenArea
     return FindAreaResultEnum.TRUE if find else FindAreaResultEnum.FALSE
 
 
+def get_ocr_result_list_batch(ctx: OneDragonContext, request_list: List[OcrRequest]) -> List[List[OcrMatchResult]]:
+    """
+    批量OCR 按 env_config.ocr_cache 决定是否使用缓存
+    :param ctx: 上下文
+    :param request_list: OCR请求列表
+    :return: 每个请求的识别结果 坐标是相对原图的
+    """
+    return ctx.ocr_service.get_ocr_result_list_batch(request_list, use_cache=ctx.env_config.ocr_cache)
+
+
+def _get_text_area_request(ctx: OneDragonContext, screen: MatLike, area: ScreenArea) -> OcrRequest:
+    """
+    文本区域的OCR请求 单个和批量判断区域时共用
+    掩码膨胀大小沿用两种模式原来的预处理 开启OCR缓存时为5 否则为2
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :param area: 文本区域
+    :return:
+    """
+    return OcrRequest(image=screen, rect=area.rect, color_range=area.color_range,
+                      dilate_size=5 if ctx.env_config.ocr_cache else 2)
+
+
+def _is_text_area_found(area: ScreenArea, ocr_result_list: List[OcrMatchResult]) -> bool:
+    """
+    识别结果中 是否有区域的文本
+    :param area: 文本区域
+    :param ocr_result_list: 区域的识别结果
+    :return:
+    """
+    for ocr_result in ocr_result_list:
+        if str_utils.find_by_lcs(gt(area.text, 'game'), ocr_result.data, percent=area.lcs_percent):
+            return True
+    return False
+
+
+def find_areas_in_screen(ctx: OneDragonContext, screen: MatLike, area_list: List[ScreenArea]) -> List[FindAreaResultEnum]:
+    """
+    游戏截图中 是否能找到多个区域
+    文本区域会合并成一次批量OCR 预处理与 find_area_in_screen 一致 结果也一致
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :param area_list: 区域列表
+    :return: 每个区域的结果 顺序与传入一致
+    """
+    result_list: List[Optional[FindAreaResultEnum]] = [None] * len(area_list)
+
+    text_idx_list: List[int] = []
+    for idx, area in enumerate(area_list):
+        if area is not None and area.is_text_area:
+            text_idx_list.append(idx)
+        else:
+            result_list[idx] = find_area_in_screen(ctx, screen, area)
+
+    if len(text_idx_list) > 0:
+        request_list = [_get_text_area_request(ctx, screen, area_list[idx]) for idx in text_idx_list]
+        ocr_result_list_per_area = get_ocr_result_list_batch(ctx, request_list)
+        for idx, ocr_result_list in zip(text_idx_list, ocr_result_list_per_area):
+            find = _is_text_area_found(area_list[idx], ocr_result_list)
+            result_list[idx] = FindAreaResultEnum.TRUE if find else FindAreaResultEnum.FALSE
+
+    return result_list
+
+
 def find_and_click_area(ctx: OneDragonContext, screen: MatLike, screen_name: str, area_name: str) -> OcrClickResultEnum:
     """
     在一个区域匹配成功后进行点击
@@ -137,6 +179,19 @@ def find_and_click_area(ctx: OneDragonContext, screen: MatLike, screen_name: str
         return OcrClickResultEnum.OCR_CLICK_SUCCESS
 
 
+def new_screen_match_session(ctx: OneDragonContext, screen: MatLike) -> ScreenMatchSession:
+    """
+    创建一次画面识别 同一张截图中 同样的标识区域只判断一次
+    :param ctx: 上下文
+    :param screen: 游戏截图
+    :return:
+    """
+    return ScreenMatchSession(
+        ctx.screen_loader.match_index, screen,
+        lambda area: find_area_in_screen(ctx, screen, area) == FindAreaResultEnum.TRUE
+    )
+
+
 def get_match_screen_name(ctx: OneDragonContext, screen: MatLike, screen_name_list: Optional[List[str]] = None) -> Optional[str]:
     """
     根据游戏截图 匹配一个最合适的画面
@@ -146,19 +201,14 @@ def get_match_screen_name(ctx: OneDragonContext, screen: MatLike, screen_name_li
     :return: 画面名字
     """
     if screen_name_list is not None:
-        for screen_info in ctx.screen_loader.screen_info_list:
-            if screen_info.screen_name not in screen_name_list:
-                continue
-            if is_target_screen(ctx, screen, screen_info=screen_info):
-                return screen_info.screen_name
+        session = new_screen_match_session(ctx, screen)
+        return session.find_first([i for i in ctx.screen_loader.screen_info_list
+                                   if i.screen_name in screen_name_list])
     elif ctx.screen_loader.current_screen_name is not None or ctx.screen_loader.last_screen_name is not None:
         return get_match_screen_name_from_last(ctx, screen)
     else:
-        for screen_info in ctx.screen_loader.screen_info_list:
-            if is_target_screen(ctx, screen, screen_info=screen_info):
-                return screen_info.screen_name
-
-    return None
+        session = new_screen_match_session(ctx, screen)
+        return session.find_first(ctx.screen_loader.screen_info_list)
 
 
 def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> str | None:
@@ -178,14 +228,12 @@ def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> s
     if len(bfs_list) == 0:
         return None
 
+    # 搜索顺序只取决于画面之间的跳转 先按顺序排好 再统一判断
     bfs_idx = 0
     while bfs_idx < len(bfs_list):
         current_screen_name = bfs_list[bfs_idx]
         bfs_idx += 1
 
-        if is_target_screen(ctx, screen, screen_name=current_screen_name):
-            return current_screen_name
-
         screen_info = ctx.screen_loader.get_screen(current_screen_name)
         if screen_info is None:
             continue
@@ -196,14 +244,20 @@ def get_match_screen_name_from_last(ctx: OneDragonContext, screen: MatLike) -> s
                 if goto_screen not in bfs_list:
                     bfs_list.append(goto_screen)
 
+    screen_info_list: List[ScreenInfo] = []
+    for screen_name in bfs_list:
+        screen_info = ctx.screen_loader.get_screen(screen_name)
+        if screen_info is not None:
+            screen_info_list.append(screen_info)
+
     # 最后 尝试搜索中没有出现的画面
     for screen_info in ctx.screen_loader.screen_info_list:
-        if screen_info.screen_name in bfs_list:
-            continue
-        if is_target_screen(ctx, screen, screen_info=screen_info):
-            return screen_info.screen_name
+        if screen_info.screen_name not in bfs_list:
+            screen_info_list.append(screen_info)
+
+    session = new_screen_match_session(ctx, screen)
+    return session.find_first(screen_info_list)
 
-    return None
 
 def is_target_screen(ctx: OneDragonContext, screen: MatLike,
                      screen_name: Optional[str] = None,
@@ -223,18 +277,7 @@ def is_target_screen(ctx: OneDragonContext, screen: MatLike,
         if screen_info is None:
             return False
 
-    existed_id_mark: bool = False
-    fit_id_mark: bool = True
-    for screen_area in screen_info.area_list:
-        if not screen_area.id_mark:
-            continue
-        existed_id_mark = True
-
-        if find_area_in_screen(ctx, screen, screen_area) != FindAreaResultEnum.TRUE:
-            fit_id_mark = False
-            break
-
-    return existed_id_mark and fit_id_mark
+    return new_screen_match_session(ctx, screen).is_target_screen(screen_info)
 
 
 def find_by_ocr(ctx: OneDragonContext, screen: MatLike, target_cn: str,
@@ -253,29 +296,18 @@ def find_by_ocr(ctx: OneDragonContext, screen: MatLike, target_cn: str,
     if lcs_percent is None:
         lcs_percent = area.lcs_percent
 
-    # 优先使用OCR缓存服务
+    # 开启OCR缓存时 掩码会膨胀 文本按 OcrService.find_text_in_area 的方式匹配
+    request = OcrRequest(image=screen, rect=None if area is None else area.rect, color_range=color_range,
+                         dilate_size=5 if ctx.env_config.ocr_cache else 0)
+    ocr_result_list = get_ocr_result_list_batch(ctx, [request])[0]
+    ocr_word_list: List[str] = [i.data for i in ocr_result_list]
+
+    target_word = gt(target_cn, 'game')
     if ctx.env_config.ocr_cache:
-        return ctx.ocr_service.find_text_in_area(
-            image=screen,
-            rect=area.rect,
-            color_range=color_range,
-            target_text=target_cn,
-            threshold=lcs_percent,
-        )
-
-    # 回退到原有方法
-    to_ocr_part = screen if area is None else cv2_utils.crop_image_only(screen, area.rect)
-    if color_range is not None:
-        mask = cv2.inRange(to_ocr_part, color_range[0], color_range[1])
-        to_ocr_part = cv2.bitwise_and(to_ocr_part, to_ocr_part, mask=mask)
-    ocr_result_map = ctx.ocr.run_ocr(to_ocr_part)
-
-    to_click: Optional[Point] = None
-    for ocr_result, mrl in ocr_result_map.items():
-        if mrl.max is None:
-            continue
-        if str_utils.find_by_lcs(gt(target_cn, 'game'), ocr_result, percent=lcs_percent):
-            to_click = mrl.max.center
-            break
+        target_idx = str_utils.find_best_match_by_difflib(target_word, ocr_word_list, cutoff=lcs_percent)
+        return target_idx is not None and target_idx >= 0
 
-    return to_click is not None
\ No newline at end of file
+    for ocr_word in ocr_word_list:
+        if str_utils.find_by_lcs(target_word, ocr_word, percent=lcs_percent):
+            return True
+    return False
\ No newline at end of file
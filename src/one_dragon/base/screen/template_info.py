@@ -7,6 +7,7 @@ from enum import Enum
 from functools import lru_cache
 from typing import List, Optional, Tuple
 
+from one_dragon.base.cache import feature_cache
 from one_dragon.base.config.config_item import ConfigItem
 from one_dragon.base.config.yaml_operator import YamlOperator
 from one_dragon.base.geometry.point import Point
@@ -131,7 +132,10 @@ class TemplateInfo(YamlOperator):
         if self._kps is not None:
             return self._kps, self._desc
         if self.raw is not None:
-            self._kps, self._desc = cv2_utils.feature_detect_and_compute(self.raw, self.mask)
+            self._kps, self._desc = feature_cache.get_features(
+                get_template_features_cache_path(self.sub_dir, self.template_id),
+                self.raw, self.mask
+            )
         return self._kps, self._desc
 
     def make_template_dir(self) -> None:
@@ -484,13 +488,12 @@ class TemplateInfo(YamlOperator):
         ]
         self.point_updated = True
 
-    @lru_cache
     def get_template_features(self):
         """
         获取特征
         :return:
         """
-        return cv2_utils.feature_detect_and_compute(self.raw, self.mask)
+        return self.features
 
     def copy_new(self) -> None:
         """
@@ -621,3 +624,13 @@ def get_template_features_path(sub_dir: str, template_id: str) -> str:
     :return:
     """
     return os.path.join(get_template_dir_path(sub_dir, template_id), TEMPLATE_FEATURES_FILE_NAME)
+
+
+def get_template_features_cache_path(sub_dir: str, template_id: str) -> str:
+    """
+    模板特征缓存的路径 内容为 feature_cache 保存的 npz
+    :param sub_dir: 模板分类
+    :param template_id: 模板id
+    :return:
+    """
+    return os.path.join(feature_cache.get_feature_cache_dir('template', sub_dir), f'{template_id}.npz')
@@ -2,6 +2,8 @@ import os
 from cv2.typing import MatLike
 from typing import List, Optional
 
+from one_dragon.base.matcher.template_feature_index import TemplateFeatureIndex
+from one_dragon.base.operation.asset_bootstrap import ASSET_FILE_EXECUTOR
 from one_dragon.base.screen.template_info import TemplateInfo, is_template_existed
 from one_dragon.utils import os_utils
 
@@ -10,6 +12,7 @@ class TemplateLoader:
 
     def __init__(self):
         self.template: dict[str, TemplateInfo] = {}
+        self.feature_index: dict[str, TemplateFeatureIndex] = {}
 
     def get_all_template_info_from_disk(self, need_raw: bool = True, need_config: bool = False) -> List[TemplateInfo]:
         """
@@ -58,6 +61,38 @@ class TemplateLoader:
         self.template[key] = template
         return template
 
+    def preload(self, sub_dir_list: Optional[List[str]] = None,
+                exclude_sub_dir_list: Optional[List[str]] = None) -> int:
+        """
+        预先加载模板到内存 多个线程并行读取图片
+        :param sub_dir_list: 需要加载的分类 不传入时加载全部
+        :param exclude_sub_dir_list: 不需要加载的分类
+        :return: 加载的模板数量
+        """
+        template_dir = os_utils.get_path_under_work_dir('assets', 'template')
+        if sub_dir_list is None:
+            sub_dir_list = [i for i in os.listdir(template_dir) if os.path.isdir(os.path.join(template_dir, i))]
+
+        to_load_list = []
+        for sub_dir in sub_dir_list:
+            if exclude_sub_dir_list is not None and sub_dir in exclude_sub_dir_list:
+                continue
+            sub_dir_path = os.path.join(template_dir, sub_dir)
+            if not os.path.isdir(sub_dir_path):
+                continue
+            for template_id in os.listdir(sub_dir_path):
+                if '%s:%s' % (sub_dir, template_id) in self.template:
+                    continue
+                if not is_template_existed(sub_dir, template_id):
+                    continue
+                to_load_list.append((sub_dir, template_id))
+
+        for template in ASSET_FILE_EXECUTOR.map(lambda i: TemplateInfo(i[0], i[1]), to_load_list):
+            key = '%s:%s' % (template.sub_dir, template.template_id)
+            self.template.setdefault(key, template)  # 期间已经按需加载的 使用已有的
+
+        return len(to_load_list)
+
     def get_template(self, sub_dir: str, template_id: str) -> TemplateInfo:
         """
         获取某个模板 会存在内容
@@ -83,3 +118,16 @@ class TemplateLoader:
             return self.template[key].mask
         else:
             return self.load_template(sub_dir, template_id, only_mask=True).mask
+
+    def get_feature_index(self, sub_dir: str, template_id_list: List[str]) -> TemplateFeatureIndex:
+        """
+        获取多个模板合并的特征索引 会存在内存
+        :param sub_dir: 子文件夹
+        :param template_id_list: 模板id 不存在的会被忽略
+        :return: 特征索引
+        """
+        key = '%s:%s' % (sub_dir, ','.join(template_id_list))
+        if key not in self.feature_index:
+            template_list = [self.get_template(sub_dir, template_id) for template_id in template_id_list]
+            self.feature_index[key] = TemplateFeatureIndex(template_list)
+        return self.feature_index[key]
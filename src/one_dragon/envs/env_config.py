@@ -493,4 +493,16 @@ class EnvConfig(YamlConfig):
 
     @ocr_cache.setter
     def ocr_cache(self, new_value: bool) -> None:
-        self.update('ocr_cache', new_value, save=True)
\ No newline at end of file
+        self.update('ocr_cache', new_value, save=True)
+
+    @property
+    def record_session(self) -> bool:
+        """
+        Returns:
+            是否在运行时录制画面和操作 用于离线回放
+        """
+        return self.get('record_session', False)
+
+    @record_session.setter
+    def record_session(self, new_value: bool) -> None:
+        self.update('record_session', new_value, save=True)
\ No newline at end of file
@@ -1,5 +1,6 @@
 import base64
 import os
+import threading
 from typing import Union, List, Optional, Tuple
 
 import cv2
@@ -9,7 +10,7 @@ from cv2.typing import MatLike
 from one_dragon.base.geometry.rectangle import Rect
 from one_dragon.base.matcher.match_result import MatchResultList, MatchResult
 
-feature_detector = cv2.SIFT_create()
+_feature_detector_local = threading.local()  # SIFT 对象不能在多个线程中同时使用 每个线程单独创建
 
 
 def read_image(file_path: str) -> Optional[MatLike]:
@@ -135,20 +136,61 @@ def match_template(source: MatLike, template: MatLike, threshold,
     # show_image(mask, win_name='mask', wait=1)
     result = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED, mask=mask)
 
+    # 使用掩码时 可能出现 nan 和 inf 先替换成不会被选中的值
+    invalid = np.isnan(result)
+    if ignore_inf:
+        invalid |= np.isinf(result)
+    if invalid.any():
+        result[invalid] = -np.inf
+
     match_result_list = MatchResultList(only_best=only_best)
-    filtered_locations = np.where(np.logical_and(
-        result >= threshold,
-        np.isfinite(result) if ignore_inf else np.ones_like(result))
-    )  # 过滤低置信度的匹配结果
+    if only_best:
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val >= threshold:
+            match_result_list.append(MatchResult(max_val, max_loc[0], max_loc[1], tx, ty))
+        return match_result_list
 
-    # 遍历所有匹配结果，并输出位置和置信度
-    for pt in zip(*filtered_locations[::-1]):
-        confidence = result[pt[1], pt[0]]  # 获取置信度
-        match_result_list.append(MatchResult(confidence, pt[0], pt[1], tx, ty))
+    ys, xs = find_peaks(result, threshold)
+    for x, y in zip(xs, ys):
+        match_result_list.append(MatchResult(result[y, x], x, y, tx, ty), auto_merge=False)
 
     return match_result_list
 
 
+def find_peaks(result: np.ndarray, threshold: float, merge_distance: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    在模板匹配的结果中 找出不低于阈值的峰值
+    先用膨胀找出邻域内的局部最大值 再按置信度从高到低做非极大值抑制
+    与 MatchResultList.append 的合并距离一致 merge_distance 内只保留置信度最高的一个
+    :param result: 模板匹配的结果
+    :param threshold: 阈值
+    :param merge_distance: 合并距离
+    :return: 峰值的 y坐标数组, x坐标数组 按从上到下 从左到右排序
+    """
+    kernel_size = merge_distance * 2 + 1
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+    local_max = cv2.dilate(result, kernel)
+    ys, xs = np.nonzero((result >= threshold) & (result >= local_max))
+    if len(ys) <= 1:
+        return ys, xs
+
+    # 平顶区域会有多个相等的局部最大值 按置信度从高到低保留
+    order = np.argsort(-result[ys, xs], kind='stable')
+    ys = ys[order]
+    xs = xs[order]
+    keep = np.ones(len(ys), dtype=bool)
+    for i in range(len(ys)):
+        if not keep[i]:
+            continue
+        dis2 = (xs[i + 1:] - xs[i]) ** 2 + (ys[i + 1:] - ys[i]) ** 2
+        keep[i + 1:] &= dis2 > merge_distance ** 2
+
+    ys = ys[keep]
+    xs = xs[keep]
+    order = np.lexsort((xs, ys))
+    return ys[order], xs[order]
+
+
 def concat_vertically(img: MatLike, next_img: MatLike, decision_height: int = 150):
     """
     垂直拼接图片。
@@ -274,8 +316,63 @@ def show_overlap(source, template, x, y, template_scale: float = 1, win_name: st
     show_image(to_show_source, win_name=win_name, wait=wait)
 
 
-def feature_detect_and_compute(img: MatLike, mask: Optional[MatLike] = None):
-    return feature_detector.detectAndCompute(img, mask=mask)
+def get_feature_detector(max_kps: int = 0):
+    """
+    获取当前线程的特征点检测器
+    :param max_kps: 最多保留的特征点数量 按响应强度保留 0为不限制
+    :return:
+    """
+    detector_map = getattr(_feature_detector_local, 'detector_map', None)
+    if detector_map is None:
+        detector_map = {}
+        _feature_detector_local.detector_map = detector_map
+    detector = detector_map.get(max_kps)
+    if detector is None:
+        detector = cv2.SIFT_create(nfeatures=max_kps)
+        detector_map[max_kps] = detector
+    return detector
+
+
+def feature_detect_and_compute(img: MatLike, mask: Optional[MatLike] = None,
+                               rect: Optional[Rect] = None,
+                               scale: float = 1,
+                               max_kps: int = 0):
+    """
+    提取特征点和描述子 耗时与像素数量成正比 大图可以先裁剪或缩小
+    返回的特征点坐标和大小 都会换算回原图
+    :param img: 图片
+    :param mask: 掩码 与图片大小一致
+    :param rect: 只在这个区域内提取
+    :param scale: 提取前缩放的比例 小于1时缩小
+    :param max_kps: 最多保留的特征点数量 按响应强度保留 0为不限制
+    :return: 特征点, 描述子
+    """
+    source = img
+    source_mask = mask
+    offset_x, offset_y = 0, 0
+    if rect is not None:
+        source, rect = crop_image(source, rect)
+        if source_mask is not None:
+            source_mask = crop_image_only(source_mask, rect)
+        offset_x, offset_y = rect.x1, rect.y1
+
+    if scale != 1:
+        source = cv2.resize(source, None, fx=scale, fy=scale,
+                            interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        if source_mask is not None:
+            source_mask = cv2.resize(source_mask, (source.shape[1], source.shape[0]), interpolation=cv2.INTER_NEAREST)
+
+    kps, desc = get_feature_detector(max_kps).detectAndCompute(source, mask=source_mask)
+    if rect is None and scale == 1:
+        return kps, desc
+
+    kps = tuple(
+        cv2.KeyPoint(x=kp.pt[0] / scale + offset_x, y=kp.pt[1] / scale + offset_y,
+                     size=kp.size / scale, angle=kp.angle, response=kp.response,
+                     octave=kp.octave, class_id=kp.class_id)
+        for kp in kps
+    )
+    return kps, desc
 
 
 def feature_keypoints_to_np(keypoints):
@@ -295,10 +392,29 @@ def feature_match(source_kp, source_desc, template_kp, template_desc,
     # feature_matcher = cv2.FlannBasedMatcher()
     feature_matcher = cv2.BFMatcher()
     matches = feature_matcher.knnMatch(template_desc, source_desc, k=2)
+    return feature_match_by_knn(source_kp, template_kp, matches,
+                                knn_distance_percent=0.75, source_mask=source_mask)
+
+
+def feature_match_by_knn(source_kp, template_kp, knn_matches,
+                         knn_distance_percent: float = 0.7,
+                         source_mask: Optional[MatLike] = None):
+    """
+    根据模板描述子 knnMatch(k=2) 的结果 用比值测试和RANSAC找到模板的位置
+    :param source_kp: 源图关键点
+    :param template_kp: 目标关键点 下标与 knn_matches 中的 queryIdx 对应
+    :param knn_matches: 模板描述子在源图描述子中的 knnMatch 结果
+    :param knn_distance_percent: 越小要求匹配程度越高
+    :param source_mask: 源图掩码
+    :return: 通过比值测试的匹配点, 模板缩放后在原图上的偏移量x, 偏移量y, 缩放比例
+    """
     # 应用比值测试，筛选匹配点
     good_matches = []
-    for m, n in matches:
-        if m.distance < 0.75 * n.distance:
+    for t in knn_matches:
+        if len(t) < 2:  # 没有match的情况
+            return [], None, None, None
+        m, n = t
+        if m.distance < knn_distance_percent * n.distance:
             good_matches.append(m)
 
     if len(good_matches) < 4:  # 不足4个优秀匹配点时 不能使用RANSAC
@@ -358,47 +474,12 @@ def feature_match_for_one(source_kp, source_desc, template_kp, template_desc,
     # feature_matcher = cv2.FlannBasedMatcher()
     feature_matcher = cv2.BFMatcher()
     matches = feature_matcher.knnMatch(template_desc, source_desc, k=2)
-    # 应用比值测试，筛选匹配点
-    good_matches = []
-    for t in matches:
-        if len(t) < 2:  # 没有match的情况
-            return None
-        m, n = t
-        if m.distance < knn_distance_percent * n.distance:
-            good_matches.append(m)
-
-    if len(good_matches) < 4:  # 不足4个优秀匹配点时 不能使用RANSAC
+    _, offset_x, offset_y, template_scale = feature_match_by_knn(
+        source_kp, template_kp, matches,
+        knn_distance_percent=knn_distance_percent, source_mask=source_mask)
+    if offset_x is None:
         return None
 
-    # 提取匹配点的坐标
-    template_points = np.float32([template_kp[m.queryIdx].pt for m in good_matches]).reshape(-1, 1, 2)  # 模板的
-    source_points = np.float32([source_kp[m.trainIdx].pt for m in good_matches]).reshape(-1, 1, 2)  # 原图的
-
-    # 使用RANSAC算法估计模板位置和尺度
-    _, mask = cv2.findHomography(template_points, source_points, cv2.RANSAC, 5.0, mask=source_mask)
-    # 获取内点的索引 拿最高置信度的
-    inlier_indices = np.where(mask.ravel() == 1)[0]
-    if len(inlier_indices) == 0:  # mask 里没找到就算了 再用good_matches的结果也是很不准的
-        return None
-
-    # 距离最短 置信度最高的结果
-    best_match = None
-    for i in range(len(good_matches)):
-        if mask[i] == 1 and (best_match is None or good_matches[i].distance < best_match.distance):
-            best_match = good_matches[i]
-
-    query_point = source_kp[best_match.trainIdx].pt  # 原图中的关键点坐标 (x, y)
-    train_point = template_kp[best_match.queryIdx].pt  # 模板中的关键点坐标 (x, y)
-
-    # 获取最佳匹配的特征点的缩放比例
-    query_scale = source_kp[best_match.trainIdx].size
-    train_scale = template_kp[best_match.queryIdx].size
-    template_scale = query_scale / train_scale
-
-    # 模板图缩放后在原图上的偏移量
-    offset_x = query_point[0] - train_point[0] * template_scale
-    offset_y = query_point[1] - train_point[1] * template_scale
-
     scaled_width = int(template_width * template_scale)
     scaled_height = int(template_height * template_scale)
 
@@ -76,6 +76,31 @@ def get_env_def(key: str, dft: str) -> str:
     return val if val is not None else dft
 
 
+def get_physical_cpu_count() -> int:
+    """
+    获取物理核心数
+    Linux 下读取 /proc/cpuinfo 其它系统按每个物理核心2个逻辑核心估算
+    :return: 至少为1
+    """
+    logical = os.cpu_count() or 1
+    try:
+        core_set = set()
+        physical_id = None
+        with open('/proc/cpuinfo', 'r', encoding='utf-8') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    core_set.add((physical_id, value.strip()))
+        if len(core_set) > 0:
+            return len(core_set)
+    except Exception:
+        pass
+    return max(1, logical // 2)
+
+
 def now_timestamp_str() -> str:
     """
     返回当前时间字符串
@@ -59,6 +59,12 @@ class SettingEnvInterface(VerticalScrollInterface):
         )
         basic_group.addSettingCard(self.ocr_cache_opt)
 
+        self.record_session_opt = SwitchSettingCard(
+            icon=FluentIcon.VIDEO, title='录制运行过程',
+            content='运行时保存截图和操作到 .debug/session 用于离线回放测试 会占用较多硬盘'
+        )
+        basic_group.addSettingCard(self.record_session_opt)
+
         return basic_group
 
     def _init_code_group(self) -> SettingCardGroup:
@@ -182,6 +188,7 @@ class SettingEnvInterface(VerticalScrollInterface):
         self.debug_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('is_debug'))
         self.copy_screenshot_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('copy_screenshot'))
         self.ocr_cache_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('ocr_cache'))
+        self.record_session_opt.init_with_adapter(self.ctx.env_config.get_prop_adapter('record_session'))
 
         self.key_start_running_input.init_with_adapter(self.ctx.env_config.get_prop_adapter('key_start_running'))
         self.key_stop_running_input.init_with_adapter(self.ctx.env_config.get_prop_adapter('key_stop_running'))
@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import math
+import threading
 from PIL import Image
 
 
@@ -11,7 +12,10 @@ class TextRecognizer(PredictBase):
     def __init__(self, args):
         self.rec_image_shape = [int(v) for v in args.rec_image_shape.split(",")]
         self.rec_batch_num = args.rec_batch_num
+        self.rec_bucket_width = args.rec_bucket_width
         self.rec_algorithm = args.rec_algorithm
+        # 每个线程各自复用的输入内存 key=补齐后的宽度
+        self._input_buffer = threading.local()
         self.postprocess_op = CTCLabelDecode(
             character_dict_path=args.rec_char_dict_path,
             use_space_char=args.use_space_char,
@@ -276,7 +280,95 @@ class TextRecognizer(PredictBase):
 
         return img
 
+    def use_width_bucket(self) -> bool:
+        """
+        是否按宽度分桶识别
+        只有按比例缩放并右侧补齐的算法可以使用 其它算法会缩放到固定尺寸
+        """
+        return self.rec_bucket_width > 0 and self.rec_algorithm not in ["NRTR", "ViTSTR", "RFL", "RARE"]
+
+    def get_bucket_width(self, img) -> int:
+        """
+        按比例缩放到模型高度后 补齐到的宽度
+        向上取整到 rec_bucket_width 的倍数 且不小于模型默认宽度
+        """
+        imgC, imgH, imgW = self.rec_image_shape[:3]
+        h, w = img.shape[0:2]
+        resized_w = int(math.ceil(imgH * w / float(h)))
+        bucket_w = int(math.ceil(resized_w / float(self.rec_bucket_width))) * self.rec_bucket_width
+        return max(imgW, bucket_w)
+
+    def get_input_buffer(self, batch_size: int, width: int):
+        """
+        获取复用的输入内存 已用0填充
+        同一线程中 相同宽度的批次共用一块内存 避免每次识别都重新分配
+        """
+        buffer_map = getattr(self._input_buffer, "buffer_map", None)
+        if buffer_map is None or len(buffer_map) > 32:  # 宽度种类过多时 丢弃旧的内存
+            buffer_map = {}
+            self._input_buffer.buffer_map = buffer_map
+
+        imgC, imgH, imgW = self.rec_image_shape[:3]
+        buffer = buffer_map.get(width)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = np.empty((max(batch_size, self.rec_batch_num), imgC, imgH, width), dtype=np.float32)
+            buffer_map[width] = buffer
+
+        batch_buffer = buffer[:batch_size]
+        batch_buffer.fill(0)
+        return batch_buffer
+
+    def resize_norm_img_into(self, img, out):
+        """
+        与 resize_norm_img 的默认算法一致 结果直接写入 out 的左侧
+        out 右侧需要已经用0填充
+        """
+        imgC, imgH, imgW = out.shape
+        assert imgC == img.shape[2]
+        h, w = img.shape[:2]
+        resized_w = min(imgW, int(math.ceil(imgH * w / float(h))))
+        resized_image = cv2.resize(img, (resized_w, imgH))
+        target = out[:, :, 0:resized_w]
+        target[:] = resized_image.transpose((2, 0, 1))
+        target *= 2 / 255.0
+        target -= 1
+
+    def rec_by_width_bucket(self, img_list):
+        """
+        按补齐后的宽度分桶 同一个桶的图片一起识别
+        一个画面上有很多行文字时 短文字不需要补齐到长文字的宽度 减少无效的计算
+        """
+        img_num = len(img_list)
+        rec_res = [["", 0.0]] * img_num
+
+        bucket_map = {}
+        for idx, img in enumerate(img_list):
+            bucket_map.setdefault(self.get_bucket_width(img), []).append(idx)
+
+        batch_num = self.rec_batch_num
+        for width in sorted(bucket_map.keys()):
+            idx_list = bucket_map[width]
+            for beg in range(0, len(idx_list), batch_num):
+                batch_idx_list = idx_list[beg:beg + batch_num]
+                norm_img_batch = self.get_input_buffer(len(batch_idx_list), width)
+                for bno, idx in enumerate(batch_idx_list):
+                    self.resize_norm_img_into(img_list[idx], norm_img_batch[bno])
+
+                input_feed = self.get_input_feed(self.rec_input_name, norm_img_batch)
+                outputs = self.rec_onnx_session.run(
+                    self.rec_output_name, input_feed=input_feed
+                )
+
+                rec_result = self.postprocess_op(outputs[0])
+                for rno in range(len(rec_result)):
+                    rec_res[batch_idx_list[rno]] = rec_result[rno]
+
+        return rec_res
+
     def __call__(self, img_list):
+        if self.use_width_bucket():
+            return self.rec_by_width_bucket(img_list)
+
         img_num = len(img_list)
         # Calculate the aspect ratio of all text bars
         width_list = []
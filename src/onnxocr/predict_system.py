@@ -71,6 +71,55 @@ class TextSystem(object):
 
         return filter_boxes, filter_rec_res
 
+    def batch_call(self, img_list, cls=True):
+        """
+        对多张图片分别进行文字检测 所有图片的文字裁剪后合并成一次识别
+        识别模型内部会按宽高比排序后分批 合并后每批的填充更少 调用次数也更少
+        :param img_list: 图片列表
+        :param cls: 是否进行方向分类
+        :return: 每张图片的 (dt_boxes, rec_res) 与 __call__ 的返回一致
+        """
+        box_list_per_img = []
+        img_crop_list = []
+        for img in img_list:
+            ori_im = img.copy()
+            dt_boxes = self.text_detector(img)
+            if dt_boxes is None or len(dt_boxes) == 0:
+                box_list_per_img.append([])
+                continue
+
+            dt_boxes = sorted_boxes(dt_boxes)
+            box_list_per_img.append(dt_boxes)
+            for bno in range(len(dt_boxes)):
+                tmp_box = copy.deepcopy(dt_boxes[bno])
+                if self.args.det_box_type == "quad":
+                    img_crop = get_rotate_crop_image(ori_im, tmp_box)
+                else:
+                    img_crop = get_minarea_rect_crop(ori_im, tmp_box)
+                img_crop_list.append(img_crop)
+
+        if len(img_crop_list) > 0:
+            if self.use_angle_cls and cls:
+                img_crop_list, angle_list = self.text_classifier(img_crop_list)
+            rec_res = self.text_recognizer(img_crop_list)
+        else:
+            rec_res = []
+
+        result_list = []
+        rec_idx = 0
+        for dt_boxes in box_list_per_img:
+            filter_boxes, filter_rec_res = [], []
+            for box in dt_boxes:
+                rec_result = rec_res[rec_idx]
+                rec_idx += 1
+                text, score = rec_result
+                if score >= self.drop_score:
+                    filter_boxes.append(box)
+                    filter_rec_res.append(rec_result)
+            result_list.append((filter_boxes, filter_rec_res))
+
+        return result_list
+
 
 def sorted_boxes(dt_boxes):
     """
@@ -313,6 +313,8 @@ def infer_args():
     parser.add_argument("--rec_image_inverse", type=str2bool, default=True)
     parser.add_argument("--rec_image_shape", type=str, default="3, 48, 320")
     parser.add_argument("--rec_batch_num", type=int, default=6)
+    # 识别时按补齐后的宽度分桶 宽度取该值的倍数 <=0 时使用原来的排序分批
+    parser.add_argument("--rec_bucket_width", type=int, default=64)
     parser.add_argument("--max_text_length", type=int, default=25)
     parser.add_argument(
         "--rec_char_dict_path",
@@ -1,4 +1,4 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.geometry.rectangle import Rect
@@ -58,12 +58,14 @@ class MoveDirectlyInSimUni(MoveDirectly):
         return SimUniEnterFight(self.ctx, config=self.config, first_state=first_state)
 
     def do_cal_pos(self, mm_info: MiniMapInfo,
-                   lm_rect: Rect, verify: VerifyPosInfo) -> Optional[MatchResult]:
+                   lm_rect: Rect, verify: VerifyPosInfo,
+                   scale_list: Optional[List[float]] = None) -> Optional[MatchResult]:
         """
         真正的计算坐标
         :param mm_info: 当前的小地图信息
         :param lm_rect: 使用的大地图范围
         :param verify: 用于验证坐标的信息
+        :param scale_list: 需要尝试的小地图缩放比例 不传入时根据移动状态计算
         :return:
         """
         try:
@@ -73,14 +75,16 @@ class MoveDirectlyInSimUni(MoveDirectly):
                 lm_rect=lm_rect,
                 running=self.ctx.controller.is_moving,
                 real_move_time=real_move_time,
-                verify=verify)
+                verify=verify,
+                scale_list=scale_list)
             if next_pos is None and self.next_lm_info is not None:
                 next_pos = cal_pos_utils.sim_uni_cal_pos(
                     self.ctx, self.next_lm_info, mm_info,
                     lm_rect=lm_rect,
                     running=self.ctx.controller.is_moving,
                     real_move_time=real_move_time,
-                    verify=verify)
+                    verify=verify,
+                    scale_list=scale_list)
         except Exception:
             next_pos = None
             log.error('识别坐标失败', exc_info=True)
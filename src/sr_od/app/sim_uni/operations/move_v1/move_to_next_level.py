@@ -152,7 +152,10 @@ class MoveToNextLevel(SrOperation):
                 self.get_rid_direction = game_const.OPPOSITE_DIRECTION[self.get_rid_direction]
             return self.round_wait()
         else:
-            type_list = sim_uni_screen_state.match_next_level_entry(self.ctx, screen)
+            type_list = sim_uni_screen_state.match_next_level_entry(
+                self.ctx, screen,
+                feature_config=sim_uni_screen_state.NEXT_LEVEL_ENTRY_FEATURE,
+                full_screen_fallback=self.node_retry_times >= self.node_max_retry_times)  # 放弃前用整个画面再找一次
             if len(type_list) == 0:  # 当前没有入口 随便旋转看看
                 if self.random_turn:
                     # 因为前面已经转向了入口 所以就算被遮挡 只要稍微转一点应该就能看到了
@@ -130,7 +130,10 @@ class MoveToNextLevelV3(SrOperation):
         :return:
         """
         screen = self.screenshot()
-        type_list = sim_uni_screen_state.match_next_level_entry(self.ctx, screen)
+        type_list = sim_uni_screen_state.match_next_level_entry(
+            self.ctx, screen,
+            feature_config=sim_uni_screen_state.NEXT_LEVEL_ENTRY_FEATURE,
+            full_screen_fallback=self.feature_no_entry_times >= 6)  # 放弃前用整个画面再找一次
 
         if len(type_list) == 0:
             self.feature_no_entry_times += 1
@@ -223,7 +226,10 @@ class MoveToNextLevelV3(SrOperation):
                     return interact
             return self.round_wait()
         else:
-            type_list = sim_uni_screen_state.match_next_level_entry(self.ctx, screen)
+            type_list = sim_uni_screen_state.match_next_level_entry(
+                self.ctx, screen,
+                feature_config=sim_uni_screen_state.NEXT_LEVEL_ENTRY_FEATURE,
+                full_screen_fallback=self.node_retry_times >= self.node_max_retry_times)  # 放弃前用整个画面再找一次
             if len(type_list) == 0:  # 当前没有入口 随便旋转看看
                 # 因为前面已经转向了入口 所以就算被遮挡 只要稍微转一点应该就能看到了
                 angle = (25 + 10 * self.node_retry_times) * (1 if self.node_retry_times % 2 == 0 else -1)  # 来回转动视角
@@ -85,7 +85,10 @@ class SimUniRunRouteBaseV2(SrOperation):
             return self.round_success(status=SimUniRunRouteBaseV2.STATUS_BOSS_EXIT)
         self._view_up()
         screen: MatLike = self.screenshot()
-        entry_list = sim_uni_screen_state.match_next_level_entry(self.ctx, screen, knn_distance_percent=self.check_next_entry_knn)
+        entry_list = sim_uni_screen_state.match_next_level_entry(
+            self.ctx, screen, knn_distance_percent=self.check_next_entry_knn,
+            feature_config=sim_uni_screen_state.NEXT_LEVEL_ENTRY_FEATURE,
+            full_screen_fallback=self.nothing_times >= 22)  # 再转动找目标一次就会放弃 用整个画面再找一次
         if len(entry_list) == 0:
             return self.round_success(status=SimUniRunRouteBaseV2.STATUS_NO_ENTRY)
         else:
@@ -2,6 +2,7 @@ from cv2.typing import MatLike
 from enum import Enum
 from typing import Optional, List
 
+from one_dragon.base.geometry.rectangle import Rect
 from one_dragon.base.matcher.match_result import MatchResult
 from one_dragon.base.screen import screen_utils
 from one_dragon.base.screen.screen_utils import FindAreaResultEnum
@@ -245,30 +246,65 @@ def in_sim_uni_choose_path(ctx: SrContext, screen: MatLike) -> bool:
     return in_sim_uni_secondary_ui(ctx, screen, ScreenState.SIM_PATH.value)
 
 
-def match_next_level_entry(ctx: SrContext, screen: MatLike, knn_distance_percent: float=0.7) -> List[MatchResult]:
+class FeatureDetectConfig:
+
+    def __init__(self, rect: Optional[Rect] = None, scale: float = 1, max_kps: int = 0):
+        """
+        某个场景下 画面提取特征的范围 见 cv2_utils.feature_detect_and_compute
+        :param rect: 只在这个区域内提取特征 为空时使用整个画面
+        :param scale: 提取特征前画面缩放的比例
+        :param max_kps: 画面最多保留的特征点数量 0为不限制
+        """
+        self.rect: Optional[Rect] = rect
+        self.scale: float = scale
+        self.max_kps: int = max_kps
+
+    @property
+    def is_full_screen(self) -> bool:
+        return self.rect is None and self.scale == 1 and self.max_kps == 0
+
+
+FULL_SCREEN_FEATURE: FeatureDetectConfig = FeatureDetectConfig()  # 整个画面 原图提取
+# 下层入口的图标在画面中间的水平带上 排除上方的任务信息和下方的按钮 图标较大 缩小后仍能识别
+NEXT_LEVEL_ENTRY_FEATURE: FeatureDetectConfig = FeatureDetectConfig(rect=Rect(0, 100, 1920, 800), scale=0.75,
+                                                                    max_kps=3000)
+
+
+def match_next_level_entry(ctx: SrContext, screen: MatLike, knn_distance_percent: float=0.7,
+                           feature_config: FeatureDetectConfig = FULL_SCREEN_FEATURE,
+                           full_screen_fallback: bool = False) -> List[MatchResult]:
     """
     获取当前画面中的下一层入口
     MatchResult.data 是对应的类型 SimUniLevelType
     :param ctx: 上下文
     :param screen: 游戏画面
     :param knn_distance_percent: 越小要求匹配程度越高
+    :param feature_config: 画面提取特征的范围 默认使用整个画面
+    :param full_screen_fallback: 按 feature_config 找不到入口时 是否再使用整个画面找一次
+        找不到入口时会识别两次 轮询时只应该在放弃前的最后一次使用
     :return:
     """
-    source_kps, source_desc = cv2_utils.feature_detect_and_compute(screen)
+    result_list = _match_next_level_entry(ctx, screen, knn_distance_percent, feature_config)
+    if len(result_list) == 0 and full_screen_fallback and not feature_config.is_full_screen:
+        log.debug('区域内找不到下层入口 使用整个画面识别')
+        result_list = _match_next_level_entry(ctx, screen, knn_distance_percent, FULL_SCREEN_FEATURE)
+    return result_list
 
-    result_list: List[MatchResult] = []
 
-    for enum in SimUniLevelTypeEnum:
-        level_type: SimUniLevelType = enum.value
-        template = ctx.template_loader.get_template('sim_uni', level_type.template_id)
-        kps, desc = template.features
+def _match_next_level_entry(ctx: SrContext, screen: MatLike, knn_distance_percent: float,
+                            feature_config: FeatureDetectConfig) -> List[MatchResult]:
+    source_kps, source_desc = cv2_utils.feature_detect_and_compute(screen, rect=feature_config.rect,
+                                                                  scale=feature_config.scale,
+                                                                  max_kps=feature_config.max_kps)
 
-        result = cv2_utils.feature_match_for_one(
-            source_kps, source_desc, kps, desc,
-            template_width=template.raw.shape[1], template_height=template.raw.shape[0],
-            knn_distance_percent=knn_distance_percent
-        )
+    result_list: List[MatchResult] = []
+
+    level_type_list: List[SimUniLevelType] = [enum.value for enum in SimUniLevelTypeEnum]
+    feature_index = ctx.template_loader.get_feature_index('sim_uni', [i.template_id for i in level_type_list])
+    result_map = feature_index.match(source_kps, source_desc, knn_distance_percent=knn_distance_percent)
 
+    for level_type in level_type_list:
+        result = result_map.get(level_type.template_id)
         if result is None:
             continue
 
@@ -18,6 +18,7 @@ class ContextPosInfo:
         self.pos_lm_scale: int = 5  # 当前大地图缩放比例
         self.pos_cancel_mission_trace: bool = False  # 是否已经取消了任务追踪
         self.pos_first_cal_pos_after_fight: bool = False  # 战斗后第一次计算坐标 由于部分攻击会产生位移 这次的坐标识别允许更大范围
+        self.pos_mm_scale: Optional[float] = None  # 上一次成功计算坐标时 小地图的缩放比例 用于优先尝试相近的缩放比例
 
     def update_pos_after_tp(self, tp: SpecialPoint):
         """
@@ -168,10 +168,10 @@ class SrContext(OneDragonContext):
         self.is_pc: bool = True
         self.record_coordinate: bool = True  # 记录坐标
 
-        self.map_data: SrMapData = SrMapData()
+        self.map_data: SrMapData = self.asset_bootstrap.get('map_data')
         self.world_patrol_route_data: WorldPatrolRouteData = WorldPatrolRouteData(self.map_data)
         self.sim_uni_route_data: SimUniRouteData = SimUniRouteData(self.map_data)
-        self.guide_data: SrGuideData = SrGuideData()
+        self.guide_data: SrGuideData = self.asset_bootstrap.get('guide_data')
 
         self.pos_info: ContextPosInfo = ContextPosInfo()
         self.team_info: TeamInfo = TeamInfo()
@@ -194,6 +194,14 @@ class SrContext(OneDragonContext):
 
         # 实例独有的配置
         self.load_instance_config()
+        self.asset_bootstrap.log_profile()
+
+    def submit_asset_loading(self) -> None:
+        OneDragonContext.submit_asset_loading(self)
+        self.asset_bootstrap.submit('map_data', SrMapData)
+        self.asset_bootstrap.submit('guide_data', SrGuideData)
+        # 大地图模板较大 且只在切换区域时使用 不预先加载
+        self.asset_bootstrap.submit('template', lambda: self.template_loader.preload(exclude_sub_dir_list=['large_map']))
 
     def init_by_config(self) -> None:
         """
@@ -210,6 +218,27 @@ class SrContext(OneDragonContext):
             standard_height=self.project_config.screen_standard_height
         )
 
+    def init_replay_controller(self, session_dir: str, realtime: bool = True,
+                               output_dir: Optional[str] = None) -> None:
+        """
+        使用录制的运行过程代替游戏窗口 用于离线复现问题和端到端的性能测试
+        不需要调用 init_by_config 因此可以在没有游戏的 Linux 上使用
+        :param session_dir: 录制的文件夹 由 controller.start_recording 生成
+        :param realtime: 是否按录制时的时间返回画面
+        :param output_dir: 回放时的动作保存的文件夹 可以与录制时的动作对比
+        :return:
+        """
+        from sr_od.context.sr_replay_controller import SrReplayController
+        i18_utils.update_default_lang(self.game_config.lang)
+        self.controller = SrReplayController(
+            game_config=self.game_config,
+            session_dir=session_dir,
+            standard_width=self.project_config.screen_standard_width,
+            standard_height=self.project_config.screen_standard_height,
+            realtime=realtime,
+            output_dir=output_dir
+        )
+
     def load_instance_config(self) -> None:
         OneDragonContext.load_instance_config(self)
 
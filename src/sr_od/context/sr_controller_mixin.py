@@ -0,0 +1,216 @@
+import time
+
+import cv2
+from cv2.typing import MatLike
+from typing import Optional, ClassVar, List
+
+from one_dragon.base.controller.controller_base import ControllerBase
+from one_dragon.base.geometry.point import Point
+from one_dragon.utils import cal_utils
+from one_dragon.utils.log_utils import log
+from sr_od.config.game_config import GameConfig
+
+
+class SrControllerMixin:
+    """
+    星穹铁道的控制器逻辑 移动、转向、交互等 与平台无关
+    需要与 ControllerBase 的子类一起使用 并放在继承列表的前面 例如 class SrPcController(SrControllerMixin, PcControllerBase)
+    子类需要提供
+    - btn_controller: 按键
+    - standard_width / standard_height: 默认分辨率
+    - click: 点击
+    - turn_by_distance / turn_down: 视角转动 依赖具体平台
+    """
+
+    MOVE_INTERACT_TYPE: ClassVar[int] = 0
+    TALK_INTERACT_TYPE: ClassVar[int] = 1
+
+    RECORD_ACTION_LIST: ClassVar[List[str]] = ControllerBase.RECORD_ACTION_LIST + [
+        'esc', 'open_map', 'move', 'enter_running', 'start_moving_forward', 'stop_moving_forward',
+        'move_towards', 'turn_by_pos', 'turn_from_angle', 'turn_by_angle', 'turn_by_distance', 'turn_down',
+        'switch_character', 'initiate_attack', 'interact', 'use_technique', 'gameplay_interact',
+    ]
+
+    def __init__(self, game_config: GameConfig):
+        """
+        初始化移动相关的状态 需要在控制器本身初始化之后调用
+        :param game_config: 游戏配置
+        """
+        self.game_config: GameConfig = game_config
+        self.turn_dx: float = self.game_config.turn_dx
+        self.run_speed: float = 30
+        self.walk_speed: float = 20
+        self.is_moving: bool = False
+        self.is_running: bool = False  # 是否在疾跑
+        self.start_move_time: float = 0
+
+    def fill_uid_black(self, screen: MatLike) -> MatLike:
+        lt = (30, 1030)
+        rb = (200, 1080)
+        cv2.rectangle(screen, lt, rb, (114, 114, 114), -1)
+        return screen
+
+    def esc(self) -> bool:
+        self.btn_controller.tap(self.game_config.key_esc)
+        return True
+
+    def open_map(self) -> bool:
+        self.btn_controller.tap(self.game_config.key_open_map)
+        return True
+
+    def move(self, direction: str, press_time: float = 0, run: bool = False):
+        """
+        往固定方向移动
+        :param direction: 方向 wsad
+        :param press_time: 持续秒数
+        :param run: 是否启用疾跑
+        :return:
+        """
+        if direction not in ['w', 's', 'a', 'd']:
+            log.error('非法的方向移动 %s', direction)
+            return False
+        self.start_move_time = time.time()
+        if press_time > 0:
+            self.btn_controller.press(direction)
+            self.is_moving = True
+            self.enter_running(run)
+            time.sleep(press_time)
+            self.btn_controller.release(direction)
+            self.stop_moving_forward()
+        else:
+            self.btn_controller.tap(direction)
+        return True
+
+    def enter_running(self, run: bool):
+        """
+        进入疾跑模式
+        :param run: 是否进入疾跑
+        :return:
+        """
+        if run and not self.is_running:
+            time.sleep(0.02)
+            self.btn_controller.tap('mouse_right')
+            self.is_running = True
+        elif not run and self.is_running:
+            time.sleep(0.02)
+            self.btn_controller.tap('mouse_right')
+            self.is_running = False
+
+    def get_move_time(self) -> float:
+        """
+        获取跑动的时间
+        :return:
+        """
+        return time.time() - self.start_move_time if self.is_moving else 0
+
+    def start_moving_forward(self, run: bool = False):
+        """
+        开始往前走
+        :param run: 是否启用疾跑
+        :return:
+        """
+        self.is_moving = True
+        self.btn_controller.press('w')
+        self.enter_running(run)
+
+    def stop_moving_forward(self):
+        if not self.is_moving:
+            return
+        self.btn_controller.release('w')
+        self.is_moving = False
+        self.is_running = False
+
+    def move_towards(self, pos1: Point, pos2: Point, angle: float, run: bool = False) -> bool:
+        """
+        朝目标点行走
+        :param pos1: 起始点
+        :param pos2: 目标点
+        :param angle: 当前角度
+        :param run: 是否疾跑
+        :return:
+        """
+        if angle is None:
+            log.error('当前角度为空 无法判断移动方向')
+            return False
+        self.turn_by_pos(pos1, pos2, angle)
+        log.info('寻路中 当前点: %s 目标点: %s ', pos1, pos2)
+        self.start_moving_forward(run=run)
+        return True
+
+    def turn_by_pos(self, current_pos: Point, target_pos: Point, current_angle: float):
+        """
+        朝目标点转向
+        :param current_pos: 起始点
+        :param target_pos: 目标点
+        :param current_angle: 当前角度
+        :return:
+        """
+        target_angle = cal_utils.get_angle_by_pts(current_pos, target_pos)
+        self.turn_from_angle(current_angle, target_angle)
+
+    def turn_from_angle(self, from_angle: float, to_angle: float):
+        """
+        从一个角度转向到另一个角度
+        :param from_angle: 原来的角度
+        :param to_angle: 新的角度
+        :return:
+        """
+        delta_angle = cal_utils.angle_delta(from_angle, to_angle)
+        log.info('当前角度: %.2f度 目标角度: %.2f度 转动朝向: %.2f度', from_angle, to_angle, delta_angle)
+        self.turn_by_angle(delta_angle)
+
+    def turn_by_angle(self, angle: float):
+        """
+        按角度旋转
+        :param angle: 正数往右转 人物角度增加；负数往左转 人物角度减少
+        :return:
+        """
+        self.turn_by_distance(self.turn_dx * angle)
+
+    def cal_move_distance_by_time(self, seconds: float):
+        """
+        根据时间计算移动距离
+        :param seconds: 秒
+        :return:
+        """
+        return self.run_speed * seconds
+
+    def switch_character(self, idx: int):
+        """
+        切换角色
+        :param idx: 第几位角色 从1开始
+        :return:
+        """
+        log.info('切换角色 %s', str(idx))
+        self.btn_controller.tap(str(idx))
+
+    def initiate_attack(self):
+        """
+        主动发起攻击
+        :return:
+        """
+        # 虽然在大世界指定坐标点击没有用 但这可以防止准备攻击时候被怪攻击 导致鼠标可以点到游戏窗口外
+        self.click(Point(self.standard_width // 2, self.standard_height // 2))
+
+    def interact(self, pos: Optional[Point] = None, interact_type: int = 0) -> bool:
+        """
+        交互
+        :param pos: 如果是模拟器的话 需要传入交互内容的坐标
+        :param interact_type: 交互类型
+        :return:
+        """
+        if interact_type == SrControllerMixin.MOVE_INTERACT_TYPE:
+            self.btn_controller.tap(self.game_config.key_interact)
+        else:
+            self.click(pos)
+        return True
+
+    def use_technique(self) -> bool:
+        self.btn_controller.tap(self.game_config.key_technique)
+        return True
+
+    def gameplay_interact(self, press_time: float = 0):
+        if press_time > 0:
+            self.btn_controller.press(self.game_config.key_gameplay_interaction, press_time)
+        else:
+            self.btn_controller.tap(self.game_config.key_gameplay_interaction)
@@ -0,0 +1,109 @@
+from typing import List, Optional
+
+from one_dragon.base.controller.replay_controller import ReplayButtonController, ReplayController
+from sr_od.config.game_config import GameConfig
+from sr_od.context.sr_controller_mixin import SrControllerMixin
+
+
+class SrReplayController(SrControllerMixin, ReplayController):
+
+    def __init__(self, game_config: GameConfig,
+                 session_dir: str,
+                 standard_width: int = 1920,
+                 standard_height: int = 1080,
+                 realtime: bool = True,
+                 output_dir: Optional[str] = None):
+        """
+        使用录制画面的控制器 不需要游戏窗口
+        移动、转向等逻辑与 SrPcController 共用 SrControllerMixin 只有最终的按键、鼠标操作不执行
+        :param game_config: 游戏配置
+        :param session_dir: 录制的文件夹
+        :param standard_width: 默认分辨率的宽
+        :param standard_height: 默认分辨率的高
+        :param realtime: 是否按录制时的时间返回画面
+        :param output_dir: 回放时的动作保存的文件夹
+        """
+        ReplayController.__init__(self, session_dir,
+                                  standard_width=standard_width, standard_height=standard_height,
+                                  realtime=realtime, output_dir=output_dir)
+        SrControllerMixin.__init__(self, game_config)
+
+        self.keyboard_controller: ReplayButtonController = ReplayButtonController()
+        self.xbox_controller = None
+        self.ds4_controller = None
+        self.btn_controller: ReplayButtonController = self.keyboard_controller
+
+    def enable_xbox(self):
+        pass
+
+    def enable_ds4(self):
+        pass
+
+    def enable_keyboard(self):
+        pass
+
+    def turn_by_distance(self, d: float):
+        pass
+
+    def turn_down(self, distance: float):
+        pass
+
+
+def __debug():
+    """
+    回放控制器的自检 不需要游戏和图形界面 可以在 Linux 上运行
+    在 src 下运行 python -m sr_od.context.sr_replay_controller
+    录制几张画面和动作后回放 检查画面顺序、动作记录 以及没有加载按键和窗口相关的库
+    """
+    import json
+    import os
+    import sys
+    import tempfile
+
+    import numpy as np
+
+    from one_dragon.base.controller.session_record import SESSION_EVENT_FILE, SessionRecorder
+    from one_dragon.base.geometry.point import Point
+
+    session_dir = tempfile.mkdtemp()
+    output_dir = tempfile.mkdtemp()
+    recorder = SessionRecorder(session_dir)
+    start_time = recorder.start_time
+    for i in range(5):
+        recorder.record_frame(np.full((1080, 1920, 3), i * 40, dtype=np.uint8), start_time + i * 0.05)
+    recorder.record_action('move_towards', {'pos1': [100, 100], 'pos2': [200, 100], 'peak_angle': 0, 'run': False})
+    recorder.record_action('turn_by_angle', {'angle': 30})
+    recorder.record_action('interact', {'pos': [960, 540], 'interact_type': 0})
+    recorder.close()
+
+    controller = SrReplayController(GameConfig(0), session_dir, realtime=False, output_dir=output_dir)
+    controller.init_before_context_run()
+    frame_value_list = [int(controller.screenshot()[0, 0, 0]) for _ in range(5)]
+    assert frame_value_list == [0, 40, 80, 120, 160], frame_value_list
+    assert controller.game_win.is_win_active and controller.game_win.active()
+    controller.active_window()
+
+    controller.move_towards(Point(100, 100), Point(200, 100), 0, run=False)
+    controller.turn_by_angle(30)
+    controller.interact(Point(960, 540), SrReplayController.MOVE_INTERACT_TYPE)
+    controller.replay.close()
+
+    def action_name_list(event_dir: str) -> List[str]:
+        with open(os.path.join(event_dir, SESSION_EVENT_FILE), 'r', encoding='utf-8') as file:
+            event_list = [json.loads(line) for line in file if len(line.strip()) > 0]
+        return [i['name'] for i in event_list if i['type'] == 'action']
+
+    recorded = action_name_list(session_dir)
+    replayed = [i.name for i in controller.replay.action_list]
+    assert replayed == recorded == action_name_list(output_dir), (recorded, replayed)
+
+    loaded = [i for i in ['pyautogui', 'pynput', 'pygetwindow', 'win32gui', 'mss'] if i in sys.modules]
+    assert len(loaded) == 0, loaded
+
+    print('画面', frame_value_list)
+    print('动作', replayed)
+    print('回放控制器自检通过')
+
+
+if __name__ == '__main__':
+    __debug()
@@ -50,6 +50,10 @@ class SrSettingGameInterface(VerticalScrollInterface):
         self.use_quirky_snacks_opt = SwitchSettingCard(icon=FluentIcon.CAFE, title='只用奇巧零食')
         basic_group.addSettingCard(self.use_quirky_snacks_opt)
 
+        self.move_pipeline_opt = SwitchSettingCard(icon=FluentIcon.SPEED_HIGH, title='流水线移动',
+                                                   content='截图分析与坐标计算同时进行 坐标更新更快')
+        basic_group.addSettingCard(self.move_pipeline_opt)
+
         return basic_group
 
     def _get_launch_argument_group(self) -> QWidget:
@@ -113,6 +117,7 @@ class SrSettingGameInterface(VerticalScrollInterface):
         self.input_way_opt.init_with_adapter(self.ctx.game_config.type_input_way_adapter)
         self.run_opt.init_with_adapter(self.ctx.game_config.run_mode_adapter)
         self.use_quirky_snacks_opt.init_with_adapter(self.ctx.game_config.use_quirky_snacks_adapter)
+        self.move_pipeline_opt.init_with_adapter(self.ctx.game_config.move_pipeline_adapter)
 
         self.launch_argument_switch.init_with_adapter(self.ctx.game_config.get_prop_adapter('launch_argument'))
         self.screen_size_opt.init_with_adapter(self.ctx.game_config.get_prop_adapter('screen_size'))
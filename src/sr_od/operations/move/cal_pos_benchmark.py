@@ -0,0 +1,438 @@
+import os
+import re
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+import yaml
+from cv2.typing import MatLike
+
+from one_dragon.base.config.yaml_operator import YamlOperator
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.geometry.rectangle import Rect
+from one_dragon.base.matcher.match_result import MatchResult
+from one_dragon.utils import cal_utils, cv2_utils, os_utils
+from one_dragon.utils.log_utils import log
+from sr_od.context.sr_context import SrContext
+from sr_od.operations.move import cal_pos_utils
+from sr_od.operations.move.cal_pos_utils import VerifyPosInfo
+from sr_od.sr_map import large_map_utils, mini_map_utils
+from sr_od.sr_map.large_map_info import LargeMapInfo
+from sr_od.sr_map.mini_map_info import MiniMapInfo
+from sr_od.sr_map.sr_map_def import Region
+
+CORRECT_DISTANCE: float = 10  # 与标注坐标距离多少以内认为正确
+DEFAULT_RADIUS: float = 30  # 样例没有上一个坐标时 在标注坐标附近多大范围内搜索
+
+# 各种计算方法 整体流程 + 每个单独的策略
+STRATEGY_ALL: str = 'all'
+STRATEGY_ROAD_MASK: str = 'road_mask'
+STRATEGY_SP: str = 'sp'
+STRATEGY_GRAY: str = 'gray'
+STRATEGY_RAW: str = 'raw'
+
+CalPosMethod = Callable[[SrContext, LargeMapInfo, MiniMapInfo, Optional[Rect], Optional[VerifyPosInfo]], Optional[MatchResult]]
+
+
+class CalPosCase:
+
+    def __init__(self, case_dir: str, region: Region, mm: MatLike,
+                 verify: Optional[VerifyPosInfo] = None,
+                 label: Optional[Point] = None):
+        """
+        一个坐标计算的样例
+        :param case_dir: 样例所在目录
+        :param region: 所属区域
+        :param mm: 小地图截图
+        :param verify: 校验信息 来自 cal_pos_utils.save_as_test_case 的 verify.yml
+        :param label: 标注的正确坐标 来自 pos.yml 没有标注时只统计耗时和是否算出结果
+        """
+        self.case_dir: str = case_dir
+        self.region: Region = region
+        self.mm: MatLike = mm
+        self.verify: Optional[VerifyPosInfo] = verify
+        self.label: Optional[Point] = label
+
+    @property
+    def case_id(self) -> str:
+        return f'{self.region.prl_id}/{os.path.basename(self.case_dir)}'
+
+
+class CalPosCaseResult:
+
+    def __init__(self, case_id: str, strategy: str, cost: float,
+                 pos: Optional[Point] = None,
+                 correct: Optional[bool] = None):
+        """
+        一个样例使用某种策略的计算结果
+        :param case_id: 样例ID
+        :param strategy: 计算策略
+        :param cost: 耗时 秒
+        :param pos: 计算得到的坐标
+        :param correct: 是否与标注坐标一致 没有标注时为空
+        """
+        self.case_id: str = case_id
+        self.strategy: str = strategy
+        self.cost: float = cost
+        self.pos: Optional[Point] = pos
+        self.correct: Optional[bool] = correct
+
+    def to_dict(self) -> dict:
+        return {
+            'case_id': self.case_id,
+            'strategy': self.strategy,
+            'cost': round(self.cost, 6),
+            'pos': None if self.pos is None else [self.pos.x, self.pos.y],
+            'correct': self.correct,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CalPosCaseResult':
+        pos = data.get('pos')
+        return CalPosCaseResult(
+            case_id=data.get('case_id'),
+            strategy=data.get('strategy'),
+            cost=data.get('cost', 0),
+            pos=None if pos is None else Point(pos[0], pos[1]),
+            correct=data.get('correct')
+        )
+
+
+class StrategySummary:
+
+    def __init__(self, strategy: str, result_list: List[CalPosCaseResult]):
+        """
+        某种策略在全部样例上的统计
+        :param strategy: 计算策略
+        :param result_list: 该策略的全部结果
+        """
+        self.strategy: str = strategy
+        self.total: int = len(result_list)
+        self.found: int = len([i for i in result_list if i.pos is not None])
+        self.labeled: int = len([i for i in result_list if i.correct is not None])
+        self.correct: int = len([i for i in result_list if i.correct])
+
+        cost_list = [i.cost * 1000 for i in result_list]  # 毫秒
+        if len(cost_list) > 0:
+            self.p50, self.p90, self.p99 = [float(i) for i in np.percentile(cost_list, [50, 90, 99])]
+            self.max = float(np.max(cost_list))
+        else:
+            self.p50 = self.p90 = self.p99 = self.max = 0
+
+    @property
+    def accuracy(self) -> Optional[float]:
+        """
+        有标注的样例中 计算正确的比例
+        """
+        return None if self.labeled == 0 else self.correct / self.labeled
+
+    def to_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'found': self.found,
+            'labeled': self.labeled,
+            'correct': self.correct,
+            'accuracy': None if self.accuracy is None else round(self.accuracy, 4),
+            'p50_ms': round(self.p50, 2),
+            'p90_ms': round(self.p90, 2),
+            'p99_ms': round(self.p99, 2),
+            'max_ms': round(self.max, 2),
+        }
+
+    def __str__(self) -> str:
+        accuracy = '-' if self.accuracy is None else '%.2f%%' % (self.accuracy * 100)
+        return '%-10s 样例 %4d 算出 %4d 正确 %4d/%-4d 准确率 %8s p50 %7.1fms p90 %7.1fms p99 %7.1fms max %7.1fms' % (
+            self.strategy, self.total, self.found, self.correct, self.labeled, accuracy,
+            self.p50, self.p90, self.p99, self.max
+        )
+
+
+class CalPosBenchmarkReport:
+
+    def __init__(self, sim_uni: bool, result_list: List[CalPosCaseResult]):
+        """
+        一次基准测试的结果
+        :param sim_uni: 是否使用模拟宇宙的计算方法
+        :param result_list: 全部样例全部策略的结果
+        """
+        self.sim_uni: bool = sim_uni
+        self.result_list: List[CalPosCaseResult] = result_list
+
+    @property
+    def strategy_list(self) -> List[str]:
+        strategy_list = []
+        for result in self.result_list:
+            if result.strategy not in strategy_list:
+                strategy_list.append(result.strategy)
+        return strategy_list
+
+    def get_summary(self, strategy: str) -> StrategySummary:
+        return StrategySummary(strategy, [i for i in self.result_list if i.strategy == strategy])
+
+    def get_result(self, case_id: str, strategy: str) -> Optional[CalPosCaseResult]:
+        for result in self.result_list:
+            if result.case_id == case_id and result.strategy == strategy:
+                return result
+        return None
+
+    def print_summary(self) -> None:
+        for strategy in self.strategy_list:
+            print(self.get_summary(strategy))
+
+    def save(self, file_path: str) -> None:
+        data = {
+            'sim_uni': self.sim_uni,
+            'summary': {i: self.get_summary(i).to_dict() for i in self.strategy_list},
+            'result_list': [i.to_dict() for i in self.result_list],
+        }
+        with open(file_path, 'w', encoding='utf-8') as file:
+            yaml.safe_dump(data, file, allow_unicode=True, sort_keys=False)
+
+    @staticmethod
+    def load(file_path: str) -> 'CalPosBenchmarkReport':
+        with open(file_path, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file)
+        return CalPosBenchmarkReport(
+            sim_uni=data.get('sim_uni', False),
+            result_list=[CalPosCaseResult.from_dict(i) for i in data.get('result_list', [])]
+        )
+
+
+def _parse_point(value) -> Optional[Point]:
+    """
+    解析 verify.yml 中的坐标 保存时使用的是 Point 的字符串形式 (x, y)
+    :param value: yml 中的值
+    :return:
+    """
+    if value is None:
+        return None
+    num_list = re.findall(r'-?\d+(?:\.\d+)?', str(value))
+    if len(num_list) < 2:
+        return None
+    return Point(float(num_list[0]), float(num_list[1]))
+
+
+def load_case(case_dir: str, region: Region) -> Optional[CalPosCase]:
+    """
+    加载一个样例 兼容两种目录
+    - .debug/cal_pos_fail 下的 mm.png + verify.yml 可以手动补充 pos.yml 作为标注
+    - .debug/gps 下的 mm.png + pos.yml
+    :param case_dir: 样例目录
+    :param region: 所属区域
+    :return:
+    """
+    mm_path = os.path.join(case_dir, 'mm.png')
+    if not os.path.exists(mm_path):
+        return None
+    mm = cv2_utils.read_image(mm_path)
+    if mm is None:
+        return None
+
+    verify: Optional[VerifyPosInfo] = None
+    verify_path = os.path.join(case_dir, 'verify.yml')
+    if os.path.exists(verify_path):
+        verify_yml = YamlOperator(verify_path)
+        verify = VerifyPosInfo(
+            last_pos=_parse_point(verify_yml.get('last_pos')),
+            max_distance=verify_yml.get('max_distance'),
+            line_p1=_parse_point(verify_yml.get('line_p1')),
+            line_p2=_parse_point(verify_yml.get('line_p2')),
+        )
+
+    label: Optional[Point] = None
+    pos_path = os.path.join(case_dir, 'pos.yml')
+    if os.path.exists(pos_path):
+        pos_yml = YamlOperator(pos_path)
+        pos = MatchResult(1, pos_yml.get('x'), pos_yml.get('y'), pos_yml.get('w'), pos_yml.get('h'),
+                          template_scale=pos_yml.get('template_scale', 1))
+        label = pos.center
+
+    return CalPosCase(case_dir, region, mm, verify=verify, label=label)
+
+
+def load_case_list(ctx: SrContext, base_dir: str) -> List[CalPosCase]:
+    """
+    加载目录下全部样例 目录结构为 base_dir/<prl_id>/<case_id>
+    :param ctx: 上下文
+    :param base_dir: 样例根目录
+    :return:
+    """
+    prl_id_2_region = {i.prl_id: i for i in ctx.map_data.region_list}
+    case_list: List[CalPosCase] = []
+    if not os.path.isdir(base_dir):
+        return case_list
+
+    for prl_id in sorted(os.listdir(base_dir)):
+        region = prl_id_2_region.get(prl_id)
+        prl_dir = os.path.join(base_dir, prl_id)
+        if region is None or not os.path.isdir(prl_dir):
+            continue
+        for case_name in sorted(os.listdir(prl_dir)):
+            case = load_case(os.path.join(prl_dir, case_name), region)
+            if case is not None:
+                case_list.append(case)
+
+    return case_list
+
+
+def get_case_rect(case: CalPosCase, lm_info: LargeMapInfo) -> Optional[Rect]:
+    """
+    获取样例计算坐标时使用的大地图范围 与 MoveDirectly 的计算方式一致
+    :param case: 样例
+    :param lm_info: 大地图信息
+    :return:
+    """
+    if case.verify is not None and case.verify.last_pos is not None:
+        max_distance = case.verify.max_distance if case.verify.max_distance is not None else DEFAULT_RADIUS
+        possible_pos = (case.verify.last_pos.x, case.verify.last_pos.y, max_distance)
+    elif case.label is not None:
+        possible_pos = (case.label.x, case.label.y, DEFAULT_RADIUS)
+    else:
+        return None
+    return large_map_utils.get_large_map_rect_by_pos(lm_info.gray.shape, case.mm.shape[:2], possible_pos)
+
+
+def get_strategy_methods(sim_uni: bool) -> dict[str, CalPosMethod]:
+    """
+    获取需要测试的计算方法
+    单独的策略不会进行结果校验 只看能否算出坐标和坐标是否正确
+    :param sim_uni: 是否模拟宇宙
+    :return:
+    """
+    if sim_uni:
+        return {
+            STRATEGY_ALL: lambda ctx, lm, mm, rect, verify: cal_pos_utils.sim_uni_cal_pos(
+                ctx, lm, mm, lm_rect=rect, running=True, verify=verify),
+            STRATEGY_GRAY: lambda ctx, lm, mm, rect, verify: cal_pos_utils.sim_uni_cal_pos_by_gray(
+                ctx, lm, mm, lm_rect=rect, scale_list=_scale_list(ctx)),
+            STRATEGY_RAW: lambda ctx, lm, mm, rect, verify: cal_pos_utils.sim_uni_cal_pos_by_raw(
+                ctx, lm, mm, lm_rect=rect, scale_list=_scale_list(ctx)),
+        }
+    else:
+        return {
+            STRATEGY_ALL: lambda ctx, lm, mm, rect, verify: cal_pos_utils.cal_character_pos(
+                ctx, lm, mm, lm_rect=rect, running=True, verify=verify),
+            STRATEGY_ROAD_MASK: lambda ctx, lm, mm, rect, verify: cal_pos_utils.cal_character_pos_by_road_mask(
+                ctx, lm, mm, lm_rect=rect, scale_list=_scale_list(ctx)),
+            STRATEGY_SP: lambda ctx, lm, mm, rect, verify: cal_pos_utils.cal_character_pos_by_sp_result(
+                ctx, lm, mm, lm_rect=rect),
+            STRATEGY_GRAY: lambda ctx, lm, mm, rect, verify: cal_pos_utils.cal_character_pos_by_gray(
+                ctx, lm, mm, lm_rect=rect, scale_list=_scale_list(ctx)),
+            STRATEGY_RAW: lambda ctx, lm, mm, rect, verify: cal_pos_utils.cal_character_pos_by_raw(
+                ctx, lm, mm, lm_rect=rect, scale_list=_scale_list(ctx)),
+        }
+
+
+def _scale_list(ctx: SrContext) -> List[float]:
+    """
+    单独策略使用的缩放比例 样例都是移动中截取的
+    """
+    return cal_pos_utils.get_mini_map_scale_list(True, 0, is_debug=ctx.env_config.is_debug)
+
+
+def run_benchmark(ctx: SrContext, case_list: List[CalPosCase],
+                  sim_uni: bool = False,
+                  strategy_list: Optional[List[str]] = None,
+                  repeat: int = 1) -> CalPosBenchmarkReport:
+    """
+    使用样例回放坐标计算 不需要游戏窗口
+    :param ctx: 上下文 不需要初始化控制器
+    :param case_list: 样例
+    :param sim_uni: 是否使用模拟宇宙的计算方法
+    :param strategy_list: 需要测试的策略 不传入时测试全部
+    :param repeat: 每个样例重复次数 耗时取最小值 减少偶然的波动
+    :return:
+    """
+    method_map = get_strategy_methods(sim_uni)
+    if strategy_list is None:
+        strategy_list = list(method_map.keys())
+
+    result_list: List[CalPosCaseResult] = []
+    for case in case_list:
+        lm_info = ctx.map_data.get_large_map_info(case.region)
+        lm_rect = get_case_rect(case, lm_info)
+        for strategy in strategy_list:
+            method = method_map.get(strategy)
+            if method is None:
+                continue
+            cost: Optional[float] = None
+            pos: Optional[MatchResult] = None
+            for _ in range(max(1, repeat)):
+                mm_info = mini_map_utils.analyse_mini_map(case.mm)  # 每次重新分析 避免复用上一次的特殊点结果
+                start_time = time.perf_counter()
+                try:
+                    pos = method(ctx, lm_info, mm_info, lm_rect, case.verify)
+                except Exception:
+                    log.error('样例计算失败 %s %s', case.case_id, strategy, exc_info=True)
+                    pos = None
+                current_cost = time.perf_counter() - start_time
+                cost = current_cost if cost is None else min(cost, current_cost)
+
+            center = None if pos is None else pos.center
+            correct = None
+            if case.label is not None:
+                correct = center is not None and cal_utils.distance_between(center, case.label) <= CORRECT_DISTANCE
+            result_list.append(CalPosCaseResult(case.case_id, strategy, cost, pos=center, correct=correct))
+
+    return CalPosBenchmarkReport(sim_uni, result_list)
+
+
+def diff_report(old: CalPosBenchmarkReport, new: CalPosBenchmarkReport) -> List[str]:
+    """
+    对比两次基准测试的结果
+    :param old: 旧的结果
+    :param new: 新的结果
+    :return: 对比描述 每行一条
+    """
+    lines: List[str] = []
+    for strategy in new.strategy_list:
+        if strategy not in old.strategy_list:
+            continue
+        s1 = old.get_summary(strategy)
+        s2 = new.get_summary(strategy)
+        accuracy_diff = '-'
+        if s1.accuracy is not None and s2.accuracy is not None:
+            accuracy_diff = '%+.2f%%' % ((s2.accuracy - s1.accuracy) * 100)
+        lines.append('%-10s 准确率 %8s 算出 %+4d p50 %+7.1fms p90 %+7.1fms p99 %+7.1fms' % (
+            strategy, accuracy_diff, s2.found - s1.found,
+            s2.p50 - s1.p50, s2.p90 - s1.p90, s2.p99 - s1.p99
+        ))
+
+        for r2 in new.result_list:
+            if r2.strategy != strategy:
+                continue
+            r1 = old.get_result(r2.case_id, strategy)
+            if r1 is None:
+                continue
+            if r1.correct and r2.correct is False:
+                lines.append(f'  退化 {r2.case_id} {r1.pos} -> {r2.pos}')
+            elif r1.correct is False and r2.correct:
+                lines.append(f'  修复 {r2.case_id} {r1.pos} -> {r2.pos}')
+            elif r1.correct is None and (r1.pos is None) != (r2.pos is None):
+                lines.append(f'  变化 {r2.case_id} {r1.pos} -> {r2.pos}')
+
+    return lines
+
+
+def __debug(base_dir: Optional[str] = None, sim_uni: bool = False, old_report: Optional[str] = None):
+    ctx = SrContext()
+    if base_dir is None:
+        base_dir = os_utils.get_path_under_work_dir('.debug', 'cal_pos_fail')
+    case_list = load_case_list(ctx, base_dir)
+    log.info('加载样例 %d 个', len(case_list))
+
+    report = run_benchmark(ctx, case_list, sim_uni=sim_uni)
+    report.print_summary()
+
+    save_dir = os_utils.get_path_under_work_dir('.debug', 'cal_pos_benchmark')
+    save_path = os.path.join(save_dir, f'{os_utils.now_timestamp_str()}.yml')
+    report.save(save_path)
+    log.info('结果已保存 %s', save_path)
+
+    if old_report is not None:
+        for line in diff_report(CalPosBenchmarkReport.load(old_report), report):
+            print(line)
+
+
+if __name__ == '__main__':
+    __debug()
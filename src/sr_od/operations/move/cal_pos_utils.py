@@ -14,12 +14,16 @@ from one_dragon.base.matcher.match_result import MatchResult, MatchResultList
 from one_dragon.utils import cal_utils, cv2_utils, os_utils, thread_utils
 from one_dragon.utils.log_utils import log
 from sr_od.context.sr_context import SrContext
-from sr_od.sr_map import mini_map_utils
+from sr_od.sr_map import mini_map_utils, large_map_cache
+from sr_od.sr_map.scaled_template_bank import BoundTemplate, ScaledTemplate
 from sr_od.sr_map.large_map_info import LargeMapInfo
 from sr_od.sr_map.mini_map_info import MiniMapInfo
 from sr_od.sr_map.sr_map_def import Region
 
-cal_pos_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='sr_od_cal_pos')
+CAL_POS_MAX_WORKERS: int = os_utils.get_physical_cpu_count()  # 同时进行的模板匹配数量 避免与YOLO和OCR抢占CPU
+cal_pos_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='sr_od_cal_pos',
+                                                         max_workers=CAL_POS_MAX_WORKERS)
+EARLY_EXIT_CONFIDENCE: float = 0.8  # 并行匹配时 某个缩放比例达到这个置信度后 不再尝试剩余的缩放比例
 
 
 def get_mini_map_scale_list(running: bool, real_move_time: float = 0, is_debug: bool = False):
@@ -151,7 +155,9 @@ def cal_character_pos(ctx: SrContext,
                       retry_without_rect: bool = False,
                       running: bool = False,
                       real_move_time: float = 0,
-                      verify: Optional[VerifyPosInfo] = None) -> Optional[MatchResult]:
+                      verify: Optional[VerifyPosInfo] = None,
+                      pyramid: Optional[bool] = None,
+                      scale_list: Optional[List[float]] = None) -> Optional[MatchResult]:
     """
     根据小地图 匹配大地图 判断当前的坐标
     :param ctx: 上下文
@@ -163,19 +169,23 @@ def cal_character_pos(ctx: SrContext,
     :param running: 角色是否在移动 移动时候小地图会缩小
     :param real_move_time: 真实移动时间
     :param verify: 校验结果需要的信息
+    :param pyramid: 是否使用图像金字塔匹配 不传入时根据搜索区域大小自动判断
+    :param scale_list: 需要尝试的小地图缩放比例 不传入时根据移动状态计算
     :return:
     """
     # 匹配结果 是缩放后的 offset 和宽高
     result: Optional[MatchResult] = None
 
-    scale_list = get_mini_map_scale_list(running, real_move_time, is_debug=ctx.env_config.is_debug)
+    if scale_list is None:
+        scale_list = get_mini_map_scale_list(running, real_move_time, is_debug=ctx.env_config.is_debug)
     r1 = None
     r2 = None
     r3 = None
     r4 = None
 
     if result is None:  # 使用模板匹配 用道路掩码的
-        r1 = cal_character_pos_by_road_mask(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show)
+        r1 = cal_character_pos_by_road_mask(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show,
+                                            pyramid=pyramid)
         if is_valid_result(r1, verify):
             result = r1
 
@@ -188,12 +198,14 @@ def cal_character_pos(ctx: SrContext,
             result = r2
 
     if result is None:  # 使用模板匹配 用灰度图的
-        r3 = cal_character_pos_by_gray(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show)
+        r3 = cal_character_pos_by_gray(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show,
+                                       pyramid=pyramid)
         if is_valid_result(r3, verify):
             result = r3
 
     if result is None:  # 使用模板匹配 用原图的
-        r4 = cal_character_pos_by_raw(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show)
+        r4 = cal_character_pos_by_raw(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show,
+                                      pyramid=pyramid)
         if is_valid_result(r4, verify):
             result = r4
 
@@ -202,7 +214,7 @@ def cal_character_pos(ctx: SrContext,
 
     if result is None:
         if lm_rect is not None and retry_without_rect:  # 整张大地图试试
-            return cal_character_pos(ctx, lm_info, mm_info, running=False, show=show)
+            return cal_character_pos(ctx, lm_info, mm_info, running=False, show=show, pyramid=pyramid)
         else:
             return None
 
@@ -214,6 +226,7 @@ def cal_character_pos(ctx: SrContext,
                                win_name='overlap')
 
     log.debug('计算当前坐标为 %s 使用缩放 %.2f 置信度 %.2f', result.center, result.template_scale, result.confidence)
+    ctx.pos_info.pos_mm_scale = result.template_scale
 
     return result
 
@@ -222,7 +235,8 @@ def cal_character_pos_by_gray(ctx: SrContext,
                               lm_info: LargeMapInfo, mm_info: MiniMapInfo,
                               lm_rect: Rect = None,
                               scale_list: List[float] = None,
-                              show: bool = False) -> Optional[MatchResult]:
+                              show: bool = False,
+                              pyramid: Optional[bool] = None) -> Optional[MatchResult]:
     """
     使用模板匹配 在大地图上匹配小地图的位置 会对小地图进行缩放尝试
     使用灰度图进行匹配
@@ -232,19 +246,22 @@ def cal_character_pos_by_gray(ctx: SrContext,
     :param lm_rect: 圈定的大地图区域 传入后更准确
     :param scale_list: 缩放比例
     :param show: 是否显示调试结果
+    :param pyramid: 是否使用图像金字塔匹配 不传入时自动判断
     :return:
     """
-    source, lm_rect = cv2_utils.crop_image(lm_info.raw, lm_rect)
-    source = cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+    source, lm_rect = cv2_utils.crop_image(lm_info.match_gray, lm_rect)
     # 使用道路掩码
     mm_del_radio = mm_info.raw_del_radio
-    template = cv2.cvtColor(mm_del_radio, cv2.COLOR_BGR2GRAY)
+    template = mm_info.gray
 
     mini_map_utils.init_road_mask_for_world_patrol(mm_info, another_floor=lm_info.region.another_floor)
     template_mask = mm_info.road_mask_with_edge
+    bound = mm_info.template_bank.bind('gray', template, 'road_mask_with_edge', template_mask)
 
-    target: MatchResult = template_match_with_scale_list_parallely(ctx, source, template, template_mask,
-                                                                   scale_list, 0.3)
+    small_source = get_pyramid_source(lm_info, 'match_gray', lm_rect, pyramid)
+    target: MatchResult = template_match_with_scale_list(ctx, source, template, template_mask,
+                                                         scale_list, 0.3, pyramid=pyramid,
+                                                         small_source=small_source, bound=bound)
 
     if show:
         scale = target.template_scale if target is not None else 1
@@ -269,7 +286,8 @@ def cal_character_pos_by_raw(ctx: SrContext,
                              lm_rect: Rect = None,
                              show: bool = False,
                              scale_list: List[float] = None,
-                             match_threshold: float = 0.3) -> Optional[MatchResult]:
+                             match_threshold: float = 0.3,
+                             pyramid: Optional[bool] = None) -> Optional[MatchResult]:
     """
     使用模板匹配 在大地图上匹配小地图的位置 会对小地图进行缩放尝试
     使用小地图原图 - 需要到这一步 说明背景比较杂乱 因此道路掩码只使用中心点包含的连通块
@@ -280,6 +298,7 @@ def cal_character_pos_by_raw(ctx: SrContext,
     :param show: 是否显示调试结果
     :param scale_list: 缩放比例
     :param match_threshold: 模板匹配的阈值
+    :param pyramid: 是否使用图像金字塔匹配 不传入时自动判断
     :return:
     """
     source, lm_rect = cv2_utils.crop_image(lm_info.raw, lm_rect)
@@ -287,9 +306,12 @@ def cal_character_pos_by_raw(ctx: SrContext,
     template = mm_info.raw_del_radio
     mini_map_utils.init_road_mask_for_world_patrol(mm_info, another_floor=lm_info.region.another_floor)
     template_mask = mm_info.road_mask_with_edge
+    bound = mm_info.template_bank.bind('raw', template, 'road_mask_with_edge', template_mask)
 
-    target: MatchResult = template_match_with_scale_list_parallely(ctx, source, template, template_mask,
-                                                                   scale_list, match_threshold)
+    small_source = get_pyramid_source(lm_info, 'raw', lm_rect, pyramid)
+    target: MatchResult = template_match_with_scale_list(ctx, source, template, template_mask,
+                                                         scale_list, match_threshold, pyramid=pyramid,
+                                                         small_source=small_source, bound=bound)
 
     if show:
         scale = target.template_scale if target is not None else 1
@@ -384,7 +406,8 @@ def cal_character_pos_by_road_mask(ctx: SrContext,
                                    lm_info: LargeMapInfo, mm_info: MiniMapInfo,
                                    lm_rect: Rect = None,
                                    show: bool = False,
-                                   scale_list: List[float] = None) -> Optional[MatchResult]:
+                                   scale_list: List[float] = None,
+                                   pyramid: Optional[bool] = None) -> Optional[MatchResult]:
     """
     使用模板匹配 在大地图上匹配小地图的位置 会对小地图进行缩放尝试
     使用处理过后的道路掩码图
@@ -394,6 +417,7 @@ def cal_character_pos_by_road_mask(ctx: SrContext,
     :param lm_rect: 圈定的大地图区域 传入后更准确
     :param show: 是否显示调试结果
     :param scale_list: 缩放比例
+    :param pyramid: 是否使用图像金字塔匹配 不传入时自动判断
     :return:
     """
     source, lm_rect = cv2_utils.crop_image(lm_info.mask, lm_rect)
@@ -401,10 +425,12 @@ def cal_character_pos_by_road_mask(ctx: SrContext,
     mini_map_utils.init_road_mask_for_world_patrol(mm_info, another_floor=lm_info.region.another_floor)
     template = cv2.bitwise_or(mm_info.road_mask, mm_info.arrow_mask)  # 需要把中心补上
     template_mask = mm_info.circle_mask
+    bound = mm_info.template_bank.bind('road_mask', template, 'circle_mask', template_mask)
 
-    target: MatchResult = template_match_with_scale_list_parallely(ctx, source, template, template_mask,
-                                                                   scale_list,
-                                                                   0.4)
+    small_source = get_pyramid_source(lm_info, 'mask', lm_rect, pyramid)
+    target: MatchResult = template_match_with_scale_list(ctx, source, template, template_mask,
+                                                         scale_list, 0.4, pyramid=pyramid,
+                                                         small_source=small_source, bound=bound)
 
     if show:
         scale = target.template_scale if target is not None else 1
@@ -431,43 +457,313 @@ def merge_road_mask(road_mask, edge_mask):
     return mask
 
 
+PYRAMID_LEVEL: int = 1  # 金字塔匹配时 粗匹配使用的金字塔层级
+PYRAMID_SCALE: float = large_map_cache.get_pyramid_scale(PYRAMID_LEVEL)  # 粗匹配使用的缩小比例
+PYRAMID_MIN_AREA_RATIO: float = 16  # 搜索区域面积是模板面积的多少倍以上时 自动使用金字塔匹配
+PYRAMID_CANDIDATE_CNT: int = 3  # 粗匹配后 保留多少个候选位置进行精匹配
+PYRAMID_REFINE_SCALE_RANGE: float = 0.03  # 精匹配时 尝试候选缩放比例附近多大范围内的缩放比例
+
+
+def should_use_pyramid(source: MatLike, template: MatLike, auto: bool = True) -> bool:
+    """
+    判断是否可以使用金字塔匹配
+    :param source: 原图
+    :param template: 模板图
+    :param auto: 是否自动判断 搜索区域较小时 粗匹配 + 精匹配的开销反而比直接匹配大
+    :return:
+    """
+    source_h, source_w = source.shape[:2]
+    template_h, template_w = template.shape[:2]
+    if source_h * PYRAMID_SCALE < template_h or source_w * PYRAMID_SCALE < template_w:  # 缩小后原图比模板还小
+        return False
+    if not auto:
+        return True
+    return source_h * source_w >= template_h * template_w * PYRAMID_MIN_AREA_RATIO
+
+
+def get_pyramid_source(lm_info: LargeMapInfo, mt: str, lm_rect: Optional[Rect],
+                       pyramid: Optional[bool] = None) -> Optional[MatLike]:
+    """
+    从大地图预先计算好的金字塔中 截取搜索区域对应的缩小图
+    :param lm_info: 大地图信息
+    :param mt: 地图类型 raw / mask / match_gray
+    :param lm_rect: 搜索区域 为空时使用整张大地图
+    :param pyramid: 是否使用金字塔匹配 明确不使用时直接返回空
+    :return:
+    """
+    if pyramid is not None and not pyramid:
+        return None
+    small = lm_info.get_pyramid(mt, PYRAMID_LEVEL)
+    if small is None or lm_rect is None:
+        return small
+    return cv2_utils.crop_image_only(small, Rect(lm_rect.x1 * PYRAMID_SCALE, lm_rect.y1 * PYRAMID_SCALE,
+                                                 lm_rect.x2 * PYRAMID_SCALE, lm_rect.y2 * PYRAMID_SCALE))
+
+
+def template_match_with_scale_list(ctx: SrContext,
+                                   source: MatLike, template: MatLike, template_mask: MatLike,
+                                   scale_list: List[float],
+                                   threshold: float,
+                                   pyramid: Optional[bool] = None,
+                                   small_source: Optional[MatLike] = None,
+                                   bound: Optional[BoundTemplate] = None) -> Optional[MatchResult]:
+    """
+    按一定缩放比例进行模板匹配，返回置信度最高的结果
+    根据搜索区域大小 选择直接并行匹配或金字塔匹配
+    :param ctx: 上下文
+    :param source: 原图
+    :param template: 模板图
+    :param template_mask: 模板掩码
+    :param scale_list: 模板的缩放比例
+    :param threshold: 匹配阈值
+    :param pyramid: 是否使用金字塔匹配 不传入时自动判断
+    :param small_source: 预先计算好的缩小原图 金字塔匹配时使用
+    :param bound: 共用的缩放模板 传入时先在当前线程计算好全部缩放比例
+    :return: 置信度最高的结果
+    """
+    if bound is not None:
+        bound.prepare(scale_list)
+
+    if pyramid is None:
+        pyramid = should_use_pyramid(source, template)
+    elif pyramid:
+        pyramid = should_use_pyramid(source, template, auto=False)
+
+    if pyramid:
+        return template_match_with_pyramid(ctx, source, template, template_mask, scale_list, threshold,
+                                           small_source=small_source, bound=bound)
+    else:
+        return template_match_with_scale_list_parallely(ctx, source, template, template_mask, scale_list, threshold,
+                                                        bound=bound)
+
+
+def template_match_with_pyramid(ctx: SrContext,
+                                source: MatLike, template: MatLike, template_mask: MatLike,
+                                scale_list: List[float],
+                                threshold: float,
+                                pyramid_scale: float = PYRAMID_SCALE,
+                                candidate_cnt: int = PYRAMID_CANDIDATE_CNT,
+                                small_source: Optional[MatLike] = None,
+                                bound: Optional[BoundTemplate] = None) -> Optional[MatchResult]:
+    """
+    使用图像金字塔 由粗到精进行模板匹配
+    1. 原图和各缩放比例的模板都缩小后进行匹配 得到若干个候选位置和缩放比例
+    2. 只在候选位置附近的小窗口内 使用原分辨率和候选附近的缩放比例进行精匹配
+    :param ctx: 上下文
+    :param source: 原图
+    :param template: 模板图
+    :param template_mask: 模板掩码
+    :param scale_list: 模板的缩放比例
+    :param threshold: 匹配阈值 只用于精匹配
+    :param pyramid_scale: 粗匹配时的缩小比例
+    :param candidate_cnt: 保留多少个候选进行精匹配
+    :param small_source: 预先计算好的缩小原图 尺寸不符合时会重新计算
+    :param bound: 共用的缩放模板
+    :return: 置信度最高的结果
+    """
+    source_h, source_w = source.shape[:2]
+    template_h, template_w = template.shape[:2]
+    small_w = int(source_w * pyramid_scale)
+    small_h = int(source_h * pyramid_scale)
+    if (small_source is None
+            or abs(small_source.shape[0] - small_h) > 1
+            or abs(small_source.shape[1] - small_w) > 1):
+        small_source = cv2.resize(source, (small_w, small_h), interpolation=cv2.INTER_AREA)
+
+    # 粗匹配 每个缩放比例在缩小图上找若干个峰值
+    coarse_future_list: List[Future] = []
+    for scale in scale_list:
+        f = cal_pos_executor.submit(pyramid_coarse_match, small_source, template, template_mask, scale,
+                                    pyramid_scale, candidate_cnt, bound)
+        f.add_done_callback(thread_utils.handle_future_result)
+        coarse_future_list.append(f)
+
+    candidate_list: List[MatchResult] = []
+    for future in coarse_future_list:
+        try:
+            candidate_list.extend(future.result(1))
+        except concurrent.futures.TimeoutError:
+            log.error('金字塔粗匹配超时', exc_info=True)
+
+    # 不同缩放比例可能找到相同的位置 只保留置信度最高的几个不同位置
+    candidate_list.sort(key=lambda i: i.confidence, reverse=True)
+    merge_distance = max(template_w, template_h) * 0.1
+    chosen_list: List[MatchResult] = []
+    for candidate in candidate_list:
+        if len(chosen_list) >= candidate_cnt:
+            break
+        merged = False
+        for chosen in chosen_list:
+            if cal_utils.distance_between(candidate.left_top, chosen.left_top) < merge_distance:
+                merged = True
+                break
+        if not merged:
+            chosen_list.append(candidate)
+
+    # 精匹配 只在候选位置附近的窗口内匹配 窗口大小覆盖缩小时丢失的精度
+    margin = int(2 / pyramid_scale) + 2
+    fine_future_list: List[Tuple[Future, int, int]] = []
+    for candidate in chosen_list:
+        window_x1 = max(0, candidate.x - margin)
+        window_y1 = max(0, candidate.y - margin)
+        window_x2 = min(source_w, candidate.x + template_w + margin)
+        window_y2 = min(source_h, candidate.y + template_h + margin)
+        if window_x2 - window_x1 < template_w or window_y2 - window_y1 < template_h:
+            continue
+        window = source[window_y1:window_y2, window_x1:window_x2]
+        for scale in scale_list:
+            if abs(scale - candidate.template_scale) > PYRAMID_REFINE_SCALE_RANGE + 1e-6:
+                continue
+            f = cal_pos_executor.submit(template_match_with_scale, ctx, window, template, template_mask,
+                                        scale, threshold, bound)
+            f.add_done_callback(thread_utils.handle_future_result)
+            fine_future_list.append((f, window_x1, window_y1))
+
+    target: Optional[MatchResult] = None
+    for future, offset_x, offset_y in fine_future_list:
+        try:
+            result: MatchResult = future.result(1)
+            if result is not None:
+                result.x += offset_x
+                result.y += offset_y
+                if target is None or result.confidence > target.confidence:
+                    target = result
+        except concurrent.futures.TimeoutError:
+            log.error('金字塔精匹配超时', exc_info=True)
+
+    return target
+
+
+def pyramid_coarse_match(small_source: MatLike, template: MatLike, template_mask: MatLike,
+                         scale: float, pyramid_scale: float, candidate_cnt: int,
+                         bound: Optional[BoundTemplate] = None) -> List[MatchResult]:
+    """
+    金字塔粗匹配 在缩小后的原图上 找出某个缩放比例下的若干个峰值
+    :param small_source: 缩小后的原图
+    :param template: 模板图 原分辨率
+    :param template_mask: 模板掩码 原分辨率
+    :param scale: 模板的缩放比例
+    :param pyramid_scale: 原图的缩小比例
+    :param candidate_cnt: 最多返回多少个峰值
+    :param bound: 共用的缩放模板
+    :return: 候选结果 坐标已经换算回原分辨率 是截取中心部分后的模板左上角
+    """
+    template_usage, template_mask_usage, _, _, _, _ = get_scaled_template(template, template_mask, scale, bound)
+    template_h, template_w = template_usage.shape[:2]
+    small_w = max(1, int(template_w * pyramid_scale))
+    small_h = max(1, int(template_h * pyramid_scale))
+    small_template = cv2.resize(template_usage, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    small_mask = cv2.resize(template_mask_usage, (small_w, small_h), interpolation=cv2.INTER_NEAREST)
+
+    if np.max(small_mask) == 0:
+        return []
+
+    result = cv2.matchTemplate(small_source, small_template, cv2.TM_CCOEFF_NORMED, mask=small_mask)
+    result[~np.isfinite(result)] = -1
+
+    # 每次取最大值后 将其附近抑制掉 再取下一个
+    suppress_r = max(1, min(small_w, small_h) // 4)
+    candidate_list: List[MatchResult] = []
+    for _ in range(candidate_cnt):
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val <= -1:
+            break
+        x, y = max_loc
+        candidate_list.append(MatchResult(max_val, x / pyramid_scale, y / pyramid_scale,
+                                          template_w, template_h, template_scale=scale))
+        result[max(0, y - suppress_r):y + suppress_r + 1, max(0, x - suppress_r):x + suppress_r + 1] = -1
+
+    return candidate_list
+
+
 def template_match_with_scale_list_parallely(ctx: SrContext,
                                              source: MatLike, template: MatLike, template_mask: MatLike,
                                              scale_list: List[float],
-                                             threshold: float) -> MatchResult:
+                                             threshold: float,
+                                             bound: Optional[BoundTemplate] = None,
+                                             early_exit_confidence: Optional[float] = EARLY_EXIT_CONFIDENCE,
+                                             max_workers: int = CAL_POS_MAX_WORKERS) -> MatchResult:
     """
     按一定缩放比例进行模板匹配，并行处理不同的缩放比例，返回置信度最高的结果
+    - 越可能的缩放比例越先匹配 即与上一次成功时的缩放比例接近的
+    - 同时最多只有 max_workers 个匹配在进行
+    - 某个结果达到 early_exit_confidence 后 不再提交剩余的缩放比例 也不等待进行中的结果
     :param ctx: 上下文
     :param source: 原图
     :param template: 模板图
     :param template_mask: 模板掩码
     :param scale_list: 模板的缩放比例
     :param threshold: 匹配阈值
+    :param bound: 共用的缩放模板
+    :param early_exit_confidence: 提前结束的置信度 为空时匹配全部缩放比例
+    :param max_workers: 最多同时进行的匹配数量
     :return: 置信度最高的结果
     """
-    future_list: List[Future] = []
-    for scale in scale_list:
-        f = cal_pos_executor.submit(template_match_with_scale, ctx, source, template, template_mask, scale, threshold)
-        thread_utils.handle_future_result(f)
-        future_list.append(f)
+    to_submit: List[float] = sort_scale_list_by_prior(scale_list, ctx.pos_info.pos_mm_scale)
+    to_submit.reverse()  # 从后面取出
+    running: set[Future] = set()
 
     target: Optional[MatchResult] = None
-    for future in future_list:
-        try:
-            result: MatchResult = future.result(1)
+    while len(to_submit) > 0 or len(running) > 0:
+        while len(to_submit) > 0 and len(running) < max(1, max_workers):
+            scale = to_submit.pop()
+            f = cal_pos_executor.submit(template_match_with_scale, ctx, source, template, template_mask, scale,
+                                        threshold, bound)
+            f.add_done_callback(_handle_match_future_result)
+            running.add(f)
+
+        done, running = concurrent.futures.wait(running, timeout=1,
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+        if len(done) == 0:
+            log.error('模板匹配超时')
+            break
+
+        for future in done:
+            if future.exception() is not None:
+                continue
+            result: MatchResult = future.result()
             if result is not None:
                 # log.debug('缩放比例 %.2f 置信度 %.2f', result.template_scale, result.confidence)
                 if target is None or result.confidence > target.confidence:
                     target = result
-        except concurrent.futures.TimeoutError:
-            log.error('模板匹配超时', exc_info=True)
+
+        if early_exit_confidence is not None and target is not None and target.confidence >= early_exit_confidence:
+            break
+
+    for future in running:  # 还没开始的可以取消 已经开始的只能不等待结果
+        future.cancel()
 
     return target
 
 
+def _handle_match_future_result(future: Future) -> None:
+    """
+    提前结束时 未开始的匹配会被取消 取消不是失败 不需要记录错误
+    :param future: 匹配的结果
+    :return:
+    """
+    if future.cancelled():
+        return
+    thread_utils.handle_future_result(future)
+
+
+def sort_scale_list_by_prior(scale_list: List[float], prior_scale: Optional[float]) -> List[float]:
+    """
+    按可能性排序缩放比例 与上一次成功时的缩放比例越接近越优先
+    传入的缩放比例已经按移动时间排好 距离相同时保持原顺序
+    :param scale_list: 缩放比例
+    :param prior_scale: 上一次成功时的缩放比例
+    :return: 新的列表
+    """
+    if prior_scale is None:
+        return list(scale_list)
+    return sorted(scale_list, key=lambda i: abs(i - prior_scale))
+
+
 def template_match_with_scale(ctx: SrContext,
                               source: MatLike, template: MatLike, template_mask: MatLike, scale: float,
-                              threshold: float) -> MatchResult:
+                              threshold: float,
+                              bound: Optional[BoundTemplate] = None) -> MatchResult:
     """
     按一定缩放比例进行模板匹配，返回置信度最高的结果
     :param ctx: 上下文
@@ -476,12 +772,42 @@ def template_match_with_scale(ctx: SrContext,
     :param template_mask: 模板掩码
     :param scale: 模板的缩放比例
     :param threshold: 匹配阈值
+    :param bound: 共用的缩放模板
     :return:
     """
+    template_usage, template_mask_usage, sx, sy, scale_width, scale_height = get_scaled_template(
+        template, template_mask, scale, bound)
+
+    result: MatchResultList = cv2_utils.match_template(source, template_usage,
+                                                       mask=template_mask_usage, threshold=threshold,
+                                                       only_best=True, ignore_inf=True)
+    if result.max is not None:
+        result.max.x -= sx
+        result.max.y -= sy
+        result.max.w = scale_width
+        result.max.h = scale_height
+        result.max.template_scale = scale
+
+    return result.max
+
+
+def get_scaled_template(template: MatLike, template_mask: MatLike,
+                        scale: float,
+                        bound: Optional[BoundTemplate] = None) -> ScaledTemplate:
+    """
+    按比例放大模板后 截取中心部分 防止放大后的图片超过了原图的范围
+    :param template: 模板图
+    :param template_mask: 模板掩码
+    :param scale: 模板的缩放比例
+    :param bound: 共用的缩放模板 传入时直接使用已经计算好的结果
+    :return: 截取后的模板、截取后的掩码、截取的左上角偏移量x, y、放大后的宽、高
+    """
+    if bound is not None:
+        return bound.get(scale)
+
     template_scale = cv2_utils.scale_image(template, scale, copy=False)
     template_mask_scale = cv2_utils.scale_image(template_mask, scale, copy=False)
 
-    # 放大后 截取中心部分来匹配 防止放大后的图片超过了原图的范围
     template_usage = np.zeros_like(template, dtype=np.uint8)
     template_mask_usage = np.zeros_like(template_mask, dtype=np.uint8)
 
@@ -497,17 +823,7 @@ def template_match_with_scale(ctx: SrContext,
     template_usage[:, :] = template_scale[sy:ey, sx:ex]
     template_mask_usage[:, :] = template_mask_scale[sy:ey, sx:ex]
 
-    result: MatchResultList = cv2_utils.match_template(source, template_usage,
-                                                       mask=template_mask_usage, threshold=threshold,
-                                                       only_best=True, ignore_inf=True)
-    if result.max is not None:
-        result.max.x -= sx
-        result.max.y -= sy
-        result.max.w = scale_width
-        result.max.h = scale_height
-        result.max.template_scale = scale
-
-    return result.max
+    return template_usage, template_mask_usage, sx, sy, scale_width, scale_height
 
 
 def sim_uni_cal_pos(
@@ -515,7 +831,9 @@ def sim_uni_cal_pos(
         lm_info: LargeMapInfo, mm_info: MiniMapInfo,
         lm_rect: Rect = None, show: bool = False,
         running: bool = False, real_move_time: float = 0,
-        verify: Optional[VerifyPosInfo] = None) -> Optional[MatchResult]:
+        verify: Optional[VerifyPosInfo] = None,
+        pyramid: Optional[bool] = None,
+        scale_list: Optional[List[float]] = None) -> Optional[MatchResult]:
     """
     根据小地图 匹配大地图 判断当前的坐标。模拟宇宙中使用
     :param ctx: 上下文
@@ -526,12 +844,15 @@ def sim_uni_cal_pos(
     :param running: 角色是否在移动 移动时候小地图会缩小
     :param real_move_time: 真正按住移动的时间
     :param verify: 校验结果需要的信息
+    :param pyramid: 是否使用图像金字塔匹配 不传入时根据搜索区域大小自动判断
+    :param scale_list: 需要尝试的小地图缩放比例 不传入时根据移动状态计算
     :return:
     """
     # 匹配结果 是缩放后的 offset 和宽高
     result: Optional[MatchResult] = None
 
-    scale_list = get_mini_map_scale_list(running, real_move_time, is_debug=ctx.env_config.is_debug)
+    if scale_list is None:
+        scale_list = get_mini_map_scale_list(running, real_move_time, is_debug=ctx.env_config.is_debug)
     r1 = None
     r2 = None
     r3 = None
@@ -540,12 +861,14 @@ def sim_uni_cal_pos(
     # 模拟宇宙中 由于地图都是裁剪的 小地图缺块 不能直接使用道路掩码匹配（误报率非常高）
 
     if result is None:  # 使用模板匹配 灰度图
-        r1 = sim_uni_cal_pos_by_gray(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show)
+        r1 = sim_uni_cal_pos_by_gray(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show,
+                                     pyramid=pyramid)
         if is_valid_result(r1, verify):
             result = r1
 
     if result is None:  # 使用模板匹配 原图
-        r2 = sim_uni_cal_pos_by_raw(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show)
+        r2 = sim_uni_cal_pos_by_raw(ctx, lm_info, mm_info, lm_rect=lm_rect, scale_list=scale_list, show=show,
+                                    pyramid=pyramid)
         if is_valid_result(r2, verify):
             result = r2
 
@@ -566,6 +889,7 @@ def sim_uni_cal_pos(
                              win_name='sim_uni_cal_pos_point')
 
     log.debug('计算当前坐标为 %s 使用缩放 %.2f 置信度 %.2f', target, scale, result.confidence)
+    ctx.pos_info.pos_mm_scale = scale
 
     return result
 
@@ -575,7 +899,8 @@ def sim_uni_cal_pos_by_gray(ctx: SrContext,
                             lm_rect: Rect = None,
                             show: bool = False,
                             scale_list: List[float] = None,
-                            match_threshold: float = 0.3) -> Optional[MatchResult]:
+                            match_threshold: float = 0.3,
+                            pyramid: Optional[bool] = None) -> Optional[MatchResult]:
     """
     使用模板匹配 在大地图上匹配小地图的位置 会对小地图进行缩放尝试
     使用模拟宇宙专用的道路掩码图 + 灰度图
@@ -586,17 +911,20 @@ def sim_uni_cal_pos_by_gray(ctx: SrContext,
     :param show: 是否显示调试结果
     :param scale_list: 缩放比例
     :param match_threshold: 模板匹配的阈值
+    :param pyramid: 是否使用图像金字塔匹配 不传入时自动判断
     :return:
     """
-    source, lm_rect = cv2_utils.crop_image(lm_info.raw, lm_rect)
-    source = cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+    source, lm_rect = cv2_utils.crop_image(lm_info.match_gray, lm_rect)
     # 使用道路掩码
-    template = cv2.cvtColor(mm_info.raw_del_radio, cv2.COLOR_BGR2GRAY)
+    template = mm_info.gray
     mini_map_utils.init_road_mask_for_sim_uni(mm_info)
     template_mask = mm_info.road_mask_with_edge  # 把白色边缘包括进来
+    bound = mm_info.template_bank.bind('gray', template, 'road_mask_with_edge', template_mask)
 
-    target: MatchResult = template_match_with_scale_list_parallely(ctx, source, template, template_mask, scale_list,
-                                                                   match_threshold)
+    small_source = get_pyramid_source(lm_info, 'match_gray', lm_rect, pyramid)
+    target: MatchResult = template_match_with_scale_list(ctx, source, template, template_mask,
+                                                         scale_list, match_threshold, pyramid=pyramid,
+                                                         small_source=small_source, bound=bound)
 
     if show:
         scale = target.template_scale if target is not None else 1
@@ -622,7 +950,8 @@ def sim_uni_cal_pos_by_raw(ctx: SrContext,
                            lm_rect: Rect = None,
                            show: bool = False,
                            scale_list: List[float] = None,
-                           match_threshold: float = 0.3) -> Optional[MatchResult]:
+                           match_threshold: float = 0.3,
+                           pyramid: Optional[bool] = None) -> Optional[MatchResult]:
     """
     使用模板匹配 在大地图上匹配小地图的位置 会对小地图进行缩放尝试
     使用模拟宇宙专用的道路掩码图 + 原图
@@ -632,6 +961,7 @@ def sim_uni_cal_pos_by_raw(ctx: SrContext,
     :param lm_rect: 圈定的大地图区域 传入后更准确
     :param show: 是否显示调试结果
     :param scale_list: 缩放比例
+    :param pyramid: 是否使用图像金字塔匹配 不传入时自动判断
     :return:
     """
     source, lm_rect = cv2_utils.crop_image(lm_info.raw, lm_rect)
@@ -639,10 +969,12 @@ def sim_uni_cal_pos_by_raw(ctx: SrContext,
     template = mm_info.raw_del_radio
     mini_map_utils.init_road_mask_for_sim_uni(mm_info)
     template_mask = mm_info.road_mask_with_edge
+    bound = mm_info.template_bank.bind('raw', template, 'road_mask_with_edge', template_mask)
 
-    target: MatchResult = template_match_with_scale_list_parallely(ctx, source, template, template_mask,
-                                                                   scale_list,
-                                                                   threshold=match_threshold)
+    small_source = get_pyramid_source(lm_info, 'raw', lm_rect, pyramid)
+    target: MatchResult = template_match_with_scale_list(ctx, source, template, template_mask,
+                                                         scale_list, match_threshold, pyramid=pyramid,
+                                                         small_source=small_source, bound=bound)
 
     if show:
         scale = target.template_scale if target is not None else 1
@@ -0,0 +1,220 @@
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from one_dragon.base.geometry.point import Point
+
+
+class MotionTracker:
+
+    def __init__(self,
+                 pos_noise: float = 3,
+                 accel_noise: float = 150,
+                 heading_noise_percent: float = 0.3,
+                 stop_noise: float = 10,
+                 n_sigma: float = 3,
+                 min_radius: float = 10,
+                 scale_change_per_second: float = 0.05 / 0.6):
+        """
+        使用卡尔曼滤波 跟踪人物在大地图上的运动
+        状态为 [x, y, vx, vy] 匀速运动模型
+        - 坐标计算结果作为位置的观测
+        - 小地图箭头朝向和移动速度作为速度的观测
+        根据预测的位置和不确定度 缩小下一次坐标计算需要的大地图范围和缩放比例
+
+        :param pos_noise: 坐标计算结果的误差 像素
+        :param accel_noise: 加速度的误差 像素/秒^2 人物起步停止较快 需要给大一点
+        :param heading_noise_percent: 使用朝向和速度观测时 速度误差占速度的比例 转向和撞墙都会产生误差
+        :param stop_noise: 没有移动时 速度的误差 像素/秒 停止后会有惯性
+        :param n_sigma: 搜索半径取多少倍标准差
+        :param min_radius: 最小的搜索半径
+        :param scale_change_per_second: 移动时 小地图缩放比例每秒最多变化多少
+        """
+        self.pos_noise: float = pos_noise
+        self.accel_noise: float = accel_noise
+        self.heading_noise_percent: float = heading_noise_percent
+        self.stop_noise: float = stop_noise
+        self.n_sigma: float = n_sigma
+        self.min_radius: float = min_radius
+        self.scale_change_per_second: float = scale_change_per_second
+
+        self.state: Optional[np.ndarray] = None  # [x, y, vx, vy]
+        self.cov: Optional[np.ndarray] = None  # 状态的协方差
+        self.state_time: float = 0  # 状态对应的时间
+
+        self.last_scale: Optional[float] = None  # 上一次坐标计算使用的缩放比例
+        self.last_scale_time: float = 0  # 上一次坐标计算的时间
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state is not None
+
+    def reset(self, pos: Point, now: float, scale: Optional[float] = None,
+              pos_std: Optional[float] = None, speed_std: float = 30) -> None:
+        """
+        重置到一个已知位置 速度未知
+        :param pos: 位置
+        :param now: 当前时间
+        :param scale: 计算使用的小地图缩放比例
+        :param pos_std: 位置的标准差 不传入时使用坐标计算的误差
+        :param speed_std: 速度的标准差
+        :return:
+        """
+        if pos_std is None:
+            pos_std = self.pos_noise
+        self.state = np.array([pos.x, pos.y, 0, 0], dtype=np.float64)
+        self.cov = np.diag([pos_std ** 2, pos_std ** 2, speed_std ** 2, speed_std ** 2])
+        self.state_time = now
+        self.last_scale = scale
+        self.last_scale_time = now
+
+    def clear(self) -> None:
+        """
+        清除状态 后续需要重新 reset
+        :return:
+        """
+        self.state = None
+        self.cov = None
+        self.last_scale = None
+
+    def _predict(self, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        预测某个时间的状态 不修改当前状态
+        :param now: 时间
+        :return: 状态和协方差
+        """
+        dt = max(0.0, now - self.state_time)
+        f = np.array([
+            [1, 0, dt, 0],
+            [0, 1, 0, dt],
+            [0, 0, 1, 0],
+            [0, 0, 0, 1],
+        ], dtype=np.float64)
+        q = self.accel_noise ** 2 * np.array([
+            [dt ** 3 / 3, 0, dt ** 2 / 2, 0],
+            [0, dt ** 3 / 3, 0, dt ** 2 / 2],
+            [dt ** 2 / 2, 0, dt, 0],
+            [0, dt ** 2 / 2, 0, dt],
+        ], dtype=np.float64)
+        state = f @ self.state
+        cov = f @ self.cov @ f.T + q
+        return state, cov
+
+    def _advance(self, now: float) -> None:
+        """
+        将当前状态推进到某个时间
+        :param now: 时间
+        :return:
+        """
+        if now <= self.state_time:
+            return
+        self.state, self.cov = self._predict(now)
+        self.state_time = now
+
+    def _correct(self, h: np.ndarray, z: np.ndarray, r: np.ndarray) -> None:
+        """
+        卡尔曼滤波的观测更新
+        :param h: 观测矩阵
+        :param z: 观测值
+        :param r: 观测噪声
+        :return:
+        """
+        y = z - h @ self.state
+        s = h @ self.cov @ h.T + r
+        k = self.cov @ h.T @ np.linalg.inv(s)
+        self.state = self.state + k @ y
+        self.cov = (np.eye(4) - k @ h) @ self.cov
+
+    def update(self, pos: Point, now: float, scale: Optional[float] = None) -> None:
+        """
+        使用坐标计算结果更新
+        :param pos: 计算得到的坐标
+        :param now: 计算使用的截图时间
+        :param scale: 计算使用的小地图缩放比例
+        :return:
+        """
+        if self.state is None:
+            self.reset(pos, now, scale=scale)
+            return
+
+        self._advance(now)
+        h = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float64)
+        r = np.eye(2) * self.pos_noise ** 2
+        self._correct(h, np.array([pos.x, pos.y], dtype=np.float64), r)
+
+        if scale is not None:
+            self.last_scale = scale
+            self.last_scale_time = now
+
+    def update_heading(self, angle: Optional[float], speed: float, moving: bool, now: float) -> None:
+        """
+        使用人物朝向和移动速度更新速度
+        :param angle: 小地图箭头朝向 正右方为0 顺时针为正
+        :param speed: 当前移动速度 像素/秒
+        :param moving: 是否正在移动
+        :param now: 当前时间
+        :return:
+        """
+        if self.state is None:
+            return
+        self._advance(now)
+        h = np.array([[0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float64)
+        if not moving:
+            z = np.zeros(2, dtype=np.float64)
+            r = np.eye(2) * self.stop_noise ** 2
+        elif angle is not None:
+            rad = math.radians(angle)
+            z = np.array([speed * math.cos(rad), speed * math.sin(rad)], dtype=np.float64)
+            noise = max(self.stop_noise, speed * self.heading_noise_percent)
+            r = np.eye(2) * noise ** 2
+        else:
+            return
+        self._correct(h, z, r)
+
+    def predict(self, now: float) -> Tuple[Point, float]:
+        """
+        预测某个时间的位置和搜索半径
+        :param now: 时间
+        :return: 预测位置 和 搜索半径
+        """
+        state, cov = self._predict(now)
+        pos_cov = cov[:2, :2]
+        max_std = math.sqrt(max(0.0, float(np.max(np.linalg.eigvalsh(pos_cov)))))
+        radius = max(self.min_radius, self.n_sigma * max_std)
+        return Point(int(state[0]), int(state[1])), radius
+
+    def get_possible_pos(self, now: float, max_distance: float,
+                         last_pos: Point) -> Tuple[int, int, float]:
+        """
+        获取可能位置 格式与 large_map_utils.get_large_map_rect_by_pos 一致
+        搜索范围不会超出原来按移动时间计算的范围
+        :param now: 时间
+        :param max_distance: 按移动时间计算的最大移动距离
+        :param last_pos: 上一次的坐标 原来的搜索中心
+        :return: (x, y, r)
+        """
+        pos, radius = self.predict(now)
+        # 预测的圆需要在原来的搜索圆内 否则退回原来的搜索范围
+        shift = math.sqrt((pos.x - last_pos.x) ** 2 + (pos.y - last_pos.y) ** 2)
+        if shift + radius > max_distance:
+            return last_pos.x, last_pos.y, max_distance
+        return pos.x, pos.y, radius
+
+    def get_scale_list(self, scale_list: List[float], now: float) -> List[float]:
+        """
+        根据上一次使用的缩放比例 缩小需要尝试的缩放比例
+        :param scale_list: 原来需要尝试的缩放比例
+        :param now: 当前时间
+        :return:
+        """
+        if self.last_scale is None or len(scale_list) == 0:
+            return scale_list
+        dt = max(0.0, now - self.last_scale_time)
+        max_delta = 0.02 + self.scale_change_per_second * dt
+
+        result = [i for i in scale_list if abs(i - self.last_scale) <= max_delta + 1e-6]
+        closest = min(scale_list, key=lambda i: abs(i - self.last_scale))
+        if closest not in result:
+            result.append(closest)
+        return result
@@ -18,6 +18,8 @@ from sr_od.context.sr_context import SrContext
 from sr_od.operations.move import cal_pos_utils, record_pos_utils
 from sr_od.operations.move.cal_pos_utils import VerifyPosInfo
 from sr_od.operations.move.get_rid_of_stuck import GetRidOfStuck
+from sr_od.operations.move.motion_tracker import MotionTracker
+from sr_od.operations.move.move_frame_pipeline import MoveFramePipeline
 from sr_od.operations.sr_operation import SrOperation
 from sr_od.operations.technique import UseTechnique
 from sr_od.screen_state import common_screen_state, battle_screen_state
@@ -71,12 +73,16 @@ class MoveDirectly(SrOperation):
         self.last_no_pos_time = 0  # 上一次算不到坐标的时间 目前算坐标太快了 可能地图还在缩放中途就已经失败 所以稍微隔点时间再记录算不到坐标
         self.stop_move_time: Optional[float] = None  # 停止移动的时间
         self.last_move_stuck_time: float = 0  # 上一次脱困结束的时间
+        self.motion_tracker: MotionTracker = MotionTracker()  # 预测下一次坐标 用于缩小计算坐标的范围
 
         self.run_mode = RunModeEnum.OFF.value.value if no_run else self.ctx.game_config.run_mode
         self.no_battle: bool = no_battle  # 本次移动是否保证没有战斗
         self.technique_fight: bool = technique_fight  # 是否使用秘技进入战斗
         self.technique_only: bool = technique_only  # 是否只使用秘技进入战斗
 
+        # 流水线模式 截图和小地图分析在后台进行 与坐标计算同时进行
+        self.frame_pipeline: Optional[MoveFramePipeline] = MoveFramePipeline(ctx) if ctx.game_config.move_pipeline else None
+
     def handle_init(self):
         """
         执行前的初始化 由子类实现
@@ -91,9 +97,17 @@ class MoveDirectly(SrOperation):
         self.last_battle_time = now  # 上一次在战斗的时间 用于判断是否长时间没有进入战斗 然后退出
         self.last_battle_exit_with_alert: bool = False  # 上一次战斗指令退出时 仍然有告警。说明人物卡住了，后续要先忽略攻击告警进行移动。
         self.pos = []
+        self.motion_tracker.clear()
         if self.ctx.controller.is_moving:  # 连续移动的时候 使用开始点作为一个起始点
             self.pos.append(self.start_pos)
+            self.motion_tracker.reset(self.start_pos, now)
         self.stop_move_time = None
+        if self.frame_pipeline is not None:
+            self.frame_pipeline.invalidate()
+
+        # 移动过程中需要使用的大地图 不能被缓存淘汰
+        self.ctx.map_data.pin_large_map_info(self.region,
+                                             None if self.next_lm_info is None else self.next_lm_info.region)
 
         return None
 
@@ -108,6 +122,15 @@ class MoveDirectly(SrOperation):
         if stuck is not None:  # 只有脱困失败的情况会返回 round_fail
             return stuck
 
+        if self.frame_pipeline is not None:
+            # 使用截图时间作为当前时间 计算坐标和移动都以画面为准
+            frame = self.frame_pipeline.next_frame()
+            self.last_screenshot = frame.screen
+            if frame.in_world:
+                return self.handle_in_world(frame.screen, frame.capture_time, mm=frame.mm, mm_info=frame.mm_info)
+            else:
+                return self.handle_not_in_world(frame.screen, frame.capture_time)
+
         screen = self.screenshot()
 
         if common_screen_state.is_normal_in_world(self.ctx, screen):
@@ -140,13 +163,21 @@ class MoveDirectly(SrOperation):
                                      technique_only=self.technique_only,
                                      first_state=first_state)
 
-    def handle_in_world(self, screen: MatLike, now_time: float) -> OperationRoundResult:
+    def handle_in_world(self, screen: MatLike, now_time: float,
+                        mm: Optional[MatLike] = None,
+                        mm_info: Optional[MiniMapInfo] = None) -> OperationRoundResult:
         """
         在大世界中 进行处理
+        :param screen: 游戏画面
+        :param now_time: 当前时间
+        :param mm: 已经截取的小地图 不传入时从画面截取
+        :param mm_info: 已经分析的小地图信息 不传入时进行分析
         :return:
         """
         if self.ctx.world_patrol_fx_should_use_tech:
             # 特殊处理飞霄逻辑 使用秘技
+            if self.frame_pipeline is not None:
+                self.frame_pipeline.invalidate()  # 使用秘技时会截图 不能与后台截图同时进行
             op = UseTechnique(
                 self.ctx,
                 max_consumable_cnt=self.ctx.world_patrol_config.max_consumable_cnt,
@@ -163,9 +194,10 @@ class MoveDirectly(SrOperation):
             submit, attack_future = self.ctx.yolo_detector.detect_should_attack_in_world_async(screen, now_time)
             log.debug('提交攻击检测 %s', submit)
 
-        mm = mini_map_utils.cut_mini_map(screen, self.ctx.game_config.mini_map_pos)
+        if mm is None:
+            mm = mini_map_utils.cut_mini_map(screen, self.ctx.game_config.mini_map_pos)
 
-        next_pos, mm_info = self.cal_pos(mm, now_time)  # 计算当前坐标
+        next_pos, mm_info = self.cal_pos(mm, now_time, mm_info=mm_info)  # 计算当前坐标
 
         check_no_pos = self.check_no_pos(next_pos, now_time)  # 坐标计算失败处理
         if check_no_pos is None:
@@ -206,6 +238,8 @@ class MoveDirectly(SrOperation):
             self.stuck_times += 1
             if self.stuck_times > 12:
                 return self.round_fail('脱困失败')
+            if self.frame_pipeline is not None:
+                self.frame_pipeline.invalidate()  # 脱困时会截图和移动 不能与后台截图同时进行
             get_rid_of_stuck = GetRidOfStuck(self.ctx, self.stuck_times)
             stuck_op_result = get_rid_of_stuck.execute()
             if stuck_op_result.success:
@@ -242,6 +276,9 @@ class MoveDirectly(SrOperation):
         if self.stop_move_time is None:
             self.stop_move_time = time.time() + (1 if self.run_mode != RunModeEnum.OFF.value.value else 0)
 
+        if self.frame_pipeline is not None:
+            self.frame_pipeline.invalidate()  # 战斗时会截图 不能与后台截图同时进行
+
         fight = self.get_fight_op(in_world=in_world)
         fight_start_time = time.time()
         op_result = fight.execute()
@@ -258,11 +295,13 @@ class MoveDirectly(SrOperation):
 
         return self.round_wait()
 
-    def cal_pos(self, mm: MatLike, now_time: float) -> Tuple[Optional[Point], MiniMapInfo]:
+    def cal_pos(self, mm: MatLike, now_time: float,
+                mm_info: Optional[MiniMapInfo] = None) -> Tuple[Optional[Point], MiniMapInfo]:
         """
         根据上一次的坐标和行进距离 计算当前位置坐标
         :param mm: 小地图截图
         :param now_time: 当前时间
+        :param mm_info: 已经分析的小地图信息 不传入时进行分析
         :return:
         """
         # 根据上一次的坐标和行进距离 计算当前位置
@@ -283,18 +322,35 @@ class MoveDirectly(SrOperation):
                   0 if self.stop_move_time is None else self.stop_move_time,
                   now_time)
 
+        if mm_info is None:
+            mm_info = mini_map_utils.analyse_mini_map(mm)
+
+        if len(self.pos) == 0:  # 第一个可以直接使用开始点 不进行计算
+            self.motion_tracker.reset(self.start_pos, now_time)
+            return self.start_pos, mm_info
+
         move_distance = self.ctx.controller.cal_move_distance_by_time(move_time)
         last_pos = self.pos[len(self.pos) - 1] if len(self.pos) > 0 else self.start_pos
         possible_pos = (last_pos.x, last_pos.y, move_distance)
+        scale_list: Optional[List[float]] = None
+
+        # 攻击后和脱困时 位移无法预测 使用原来的范围
+        use_tracker = (self.motion_tracker.is_ready
+                       and not self.ctx.pos_info.pos_first_cal_pos_after_fight
+                       and self.stuck_times == 0)
+        if use_tracker:
+            controller = self.ctx.controller
+            speed = controller.run_speed if controller.is_running else controller.walk_speed
+            self.motion_tracker.update_heading(mm_info.angle, speed, controller.is_moving, now_time)
+            possible_pos = self.motion_tracker.get_possible_pos(now_time, move_distance, last_pos)
+            full_scale_list = cal_pos_utils.get_mini_map_scale_list(controller.is_moving, controller.get_move_time(),
+                                                                    is_debug=self.ctx.env_config.is_debug)
+            scale_list = self.motion_tracker.get_scale_list(full_scale_list, now_time)
+
         log.debug('准备计算人物坐标 使用上一个坐标为 %s 移动时间 %.2f 是否在移动 %s', possible_pos,
                   move_time, self.ctx.controller.is_moving)
         lm_rect = large_map_utils.get_large_map_rect_by_pos(self.lm_info.gray.shape, mm.shape[:2], possible_pos)
 
-        mm_info = mini_map_utils.analyse_mini_map(mm)
-
-        if len(self.pos) == 0:  # 第一个可以直接使用开始点 不进行计算
-            return self.start_pos, mm_info
-
         # 正确移动时 人物不应该偏离直线太远
         # 攻击后 可能因为攻击产生了位移 允许远一点
         # 脱困移动时 会向左右移动 允许远一点
@@ -308,25 +364,31 @@ class MoveDirectly(SrOperation):
                                max_line_distance=max_line_distance
                                )
 
-        next_pos = self.do_cal_pos(mm_info, lm_rect, verify)
+        next_pos = self.do_cal_pos(mm_info, lm_rect, verify, scale_list=scale_list)
 
         if next_pos is None:
             log.error('无法判断当前人物坐标')
             if self.ctx.env_config.is_debug and self.no_pos_times == 0:  # 只记录第一次识别坐标失败的
                 cal_pos_utils.save_as_test_case_async(mm, self.region, verify)
         else:
+            if use_tracker:
+                self.motion_tracker.update(next_pos.center, now_time, next_pos.template_scale)
+            else:
+                self.motion_tracker.reset(next_pos.center, now_time, scale=next_pos.template_scale)
             if self.ctx.record_coordinate and now_time - self.last_rec_time > 0.5:
                 record_pos_utils.save_sample(self.region, mm, next_pos)
                 pass
         return next_pos.center if next_pos is not None else None, mm_info
 
     def do_cal_pos(self, mm_info: MiniMapInfo,
-                   lm_rect: Rect, verify: VerifyPosInfo) -> Optional[MatchResult]:
+                   lm_rect: Rect, verify: VerifyPosInfo,
+                   scale_list: Optional[List[float]] = None) -> Optional[MatchResult]:
         """
         真正的计算坐标
         :param mm_info: 当前的小地图信息
         :param lm_rect: 使用的大地图范围
         :param verify: 用于验证坐标的信息
+        :param scale_list: 需要尝试的小地图缩放比例 不传入时根据移动状态计算
         :return:
         """
         try:
@@ -336,14 +398,16 @@ class MoveDirectly(SrOperation):
                 lm_rect=lm_rect, retry_without_rect=False,
                 running=self.ctx.controller.is_moving,
                 real_move_time=real_move_time,
-                verify=verify)
+                verify=verify,
+                scale_list=scale_list)
             if next_pos is None and self.next_lm_info is not None:
                 next_pos = cal_pos_utils.cal_character_pos(
                     self.ctx, self.next_lm_info, mm_info,
                     lm_rect=lm_rect, retry_without_rect=False,
                     running=self.ctx.controller.is_moving,
                     real_move_time=real_move_time,
-                    verify=verify)
+                    verify=verify,
+                    scale_list=scale_list)
         except Exception:
             next_pos = None
             log.error('识别坐标失败', exc_info=True)
@@ -413,6 +477,8 @@ class MoveDirectly(SrOperation):
         :return:
         """
         self.ctx.controller.stop_moving_forward()
+        if self.frame_pipeline is not None:
+            self.frame_pipeline.invalidate()
 
     def handle_resume(self) -> None:
         """
@@ -421,8 +487,12 @@ class MoveDirectly(SrOperation):
         """
         self.last_rec_time += self.current_pause_time
         self.last_battle_time += self.current_pause_time
+        self.motion_tracker.clear()  # 暂停期间可能被手动移动
 
     def after_operation_done(self, result: OperationResult):
         SrOperation.after_operation_done(self, result)
+        if self.frame_pipeline is not None:
+            self.frame_pipeline.invalidate()  # 不在指令结束后继续后台截图
+        self.ctx.map_data.unpin_large_map_info()  # 移动结束后 大地图重新受缓存容量限制
         if not result.success:
             self.ctx.controller.stop_moving_forward()
\ No newline at end of file
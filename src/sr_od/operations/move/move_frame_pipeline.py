@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from cv2.typing import MatLike
+
+from one_dragon.utils.log_utils import log
+from sr_od.context.sr_context import SrContext
+from sr_od.screen_state import common_screen_state
+from sr_od.sr_map import mini_map_utils
+from sr_od.sr_map.mini_map_info import MiniMapInfo
+
+_move_frame_executor = ThreadPoolExecutor(thread_name_prefix='sr_od_move_frame', max_workers=1)
+
+
+class MoveFrame:
+
+    def __init__(self, screen: MatLike, capture_time: float):
+        """
+        移动时的一帧画面 及其预处理结果
+        :param screen: 游戏画面
+        :param capture_time: 截图的时间 计算坐标和移动都以这个时间为准
+        """
+        self.screen: MatLike = screen
+        self.capture_time: float = capture_time
+        self.in_world: bool = False  # 是否在大世界中
+        self.mm: Optional[MatLike] = None  # 小地图截图 只有在大世界中才有
+        self.mm_info: Optional[MiniMapInfo] = None  # 小地图分析结果 只有在大世界中才有
+
+
+class MoveFramePipeline:
+
+    def __init__(self, ctx: SrContext, max_frame_age: float = 0.5, capture_fps: float = 30):
+        """
+        移动的流水线 截图和小地图分析 与 坐标计算和移动 同时进行
+        每次取出一帧后 马上在后台准备下一帧 后台最多只有一帧在准备 即队列长度为1
+        取出时后台的帧已经太旧的话 例如中途进行了战斗 则丢弃并重新截图 保证使用的是最新的画面
+        任何时候最多只有一个线程在截图和分析 不会与主线程同时操作控制器
+        capture_fps 大于0时 使用后台截图 准备时直接取最新的画面 不需要等待截图
+        后台截图在第一次取帧时开始 在 invalidate 时停止 因此战斗等其它指令进行时不会继续截图
+        :param ctx: 上下文
+        :param max_frame_age: 可以使用的帧 距离截图的最长时间
+        :param capture_fps: 后台截图的帧率 0为不使用后台截图
+        """
+        self.ctx: SrContext = ctx
+        self.max_frame_age: float = max_frame_age
+        self._pending: Optional[Future] = None  # 后台正在准备的帧
+        self._lock = threading.Lock()  # 暂停时会在其它线程中调用 invalidate
+        self.capture_fps: float = capture_fps
+        self._capture_started: bool = False  # 是否由这里开启了后台截图
+        self._last_capture_time: float = 0  # 上一次取出的帧的截图时间 后台截图的画面需要比它新
+
+    def _prepare(self, independent: bool) -> MoveFrame:
+        """
+        截图并分析小地图
+        :param independent: 是否使用独立的截图器 在后台线程中截图时需要
+        :return:
+        """
+        latest = self.ctx.controller.latest_screenshot(self.max_frame_age) if self._capture_started else None
+        if latest is not None and latest.create_time > self._last_capture_time:
+            screen, capture_time = latest.image, latest.create_time
+        else:
+            capture_time = time.time()
+            screen = self.ctx.controller.screenshot(independent=independent)
+        frame = MoveFrame(screen, capture_time)
+        frame.in_world = common_screen_state.is_normal_in_world(self.ctx, screen)
+        if frame.in_world:
+            frame.mm = mini_map_utils.cut_mini_map(screen, self.ctx.game_config.mini_map_pos)
+            frame.mm_info = mini_map_utils.analyse_mini_map(frame.mm)
+        return frame
+
+    def next_frame(self) -> MoveFrame:
+        """
+        获取下一帧 并马上开始在后台准备再下一帧
+        :return:
+        """
+        frame: Optional[MoveFrame] = None
+        with self._lock:
+            if self.capture_fps > 0 and not self._capture_started:
+                self.ctx.controller.start_capture(fps=self.capture_fps)
+                self._capture_started = True
+            pending = self._pending
+            self._pending = None
+        if pending is not None:
+            try:
+                frame = pending.result()
+            except Exception:
+                log.error('移动画面预处理失败', exc_info=True)
+            if frame is not None and time.time() - frame.capture_time > self.max_frame_age:
+                log.debug('丢弃过旧的移动画面 %.2fs', time.time() - frame.capture_time)
+                frame = None
+
+        if frame is None:
+            frame = self._prepare(independent=False)
+
+        self._last_capture_time = frame.capture_time
+        with self._lock:
+            self._pending = _move_frame_executor.submit(self._prepare, True)
+        return frame
+
+    def invalidate(self) -> None:
+        """
+        画面发生了不能预测的变化 例如战斗、脱困、使用秘技 后台准备中的帧不再使用
+        还没开始的直接取消 已经开始的等待其完成 同时停止后台截图 返回后后台不会再有截图
+        :return:
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+        if pending is not None and not pending.cancel():
+            try:
+                pending.result()
+            except Exception:
+                pass  # 结果不再使用 失败也不需要处理
+
+        with self._lock:
+            if self._capture_started:
+                self.ctx.controller.stop_capture()
+                self._capture_started = False
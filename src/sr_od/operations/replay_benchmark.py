@@ -0,0 +1,327 @@
+import difflib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+import numpy as np
+import yaml
+
+from one_dragon.base.config.yaml_operator import YamlOperator
+from one_dragon.base.controller.session_record import SESSION_EVENT_FILE
+from one_dragon.base.geometry.point import Point
+from one_dragon.base.operation.operation import Operation
+from one_dragon.utils import os_utils
+from one_dragon.utils.log_utils import log
+from sr_od.context.sr_context import SrContext
+
+CASE_FILE: str = 'case.yml'  # 录制文件夹中 描述回放时运行哪个指令的文件
+FINISH_WAIT_SECONDS: float = 3  # 画面回放完之后 最多再等待指令多少秒 超过后停止运行
+
+_replay_benchmark_executor = ThreadPoolExecutor(thread_name_prefix='sr_od_replay_benchmark', max_workers=1)
+
+ReplayOpFactory = Callable[[SrContext, YamlOperator], Operation]
+
+
+def _new_move_directly(ctx: SrContext, case_yml: YamlOperator) -> Operation:
+    from sr_od.operations.move.move_directly import MoveDirectly
+    prl_id_2_region = {i.prl_id: i for i in ctx.map_data.region_list}
+    region = prl_id_2_region[case_yml.get('region')]
+    start = case_yml.get('start')
+    target = case_yml.get('target')
+    return MoveDirectly(ctx, ctx.map_data.get_large_map_info(region),
+                        start=Point(start[0], start[1]), target=Point(target[0], target[1]),
+                        no_run=case_yml.get('no_run', False))
+
+
+def _new_sim_uni_combat_v2(ctx: SrContext, case_yml: YamlOperator) -> Operation:
+    from sr_od.app.sim_uni.operations.move_v2.sim_uni_run_combat_route_v2 import SimUniRunCombatRouteV2
+    return SimUniRunCombatRouteV2(ctx)
+
+
+def _new_sim_uni_elite_v2(ctx: SrContext, case_yml: YamlOperator) -> Operation:
+    from sr_od.app.sim_uni.operations.move_v2.sim_uni_run_elite_route_v2 import SimUniRunEliteRouteV2
+    return SimUniRunEliteRouteV2(ctx)
+
+
+def _new_sim_uni_event_v2(ctx: SrContext, case_yml: YamlOperator) -> Operation:
+    from sr_od.app.sim_uni.operations.move_v2.sim_uni_run_event_route_v2 import SimUniRunEventRouteV2
+    return SimUniRunEventRouteV2(ctx)
+
+
+def _new_sim_uni_respite_v2(ctx: SrContext, case_yml: YamlOperator) -> Operation:
+    from sr_od.app.sim_uni.operations.move_v2.sim_uni_run_respite_route_v2 import SimUniRunRespiteRouteV2
+    return SimUniRunRespiteRouteV2(ctx)
+
+
+# case.yml 中 op 对应的指令
+OP_FACTORY_MAP: dict[str, ReplayOpFactory] = {
+    'move_directly': _new_move_directly,
+    'sim_uni_combat_v2': _new_sim_uni_combat_v2,
+    'sim_uni_elite_v2': _new_sim_uni_elite_v2,
+    'sim_uni_event_v2': _new_sim_uni_event_v2,
+    'sim_uni_respite_v2': _new_sim_uni_respite_v2,
+}
+
+
+class ReplayCase:
+
+    def __init__(self, session_dir: str, case_yml: YamlOperator):
+        """
+        一个端到端回放的样例
+        录制文件夹由开启 录制运行过程 后运行生成 位于 .debug/session 下
+        需要手动补充 case.yml 说明录制的是哪个指令 例如
+        - op: move_directly region: <prl_id> start: [x, y] target: [x, y]
+        - op: sim_uni_combat_v2
+        :param session_dir: 录制文件夹
+        :param case_yml: 样例描述
+        """
+        self.session_dir: str = session_dir
+        self.case_yml: YamlOperator = case_yml
+
+    @property
+    def case_id(self) -> str:
+        return os.path.basename(self.session_dir)
+
+    @property
+    def op(self) -> str:
+        return self.case_yml.get('op', '')
+
+
+class ReplayCaseResult:
+
+    def __init__(self, case_id: str, op: str, success: bool, status: str, cost: float,
+                 round_cost_list: List[float], action_match: float):
+        """
+        一个样例的回放结果
+        :param case_id: 样例ID
+        :param op: 指令
+        :param success: 指令是否成功
+        :param status: 指令结束的状态
+        :param cost: 指令总耗时 秒
+        :param round_cost_list: 相邻两次截图的间隔 秒 即每轮识别和操作的耗时
+        :param action_match: 回放时的动作与录制时的相似度 0~1
+        """
+        self.case_id: str = case_id
+        self.op: str = op
+        self.success: bool = success
+        self.status: str = status
+        self.cost: float = cost
+        self.round_cost_list: List[float] = round_cost_list
+        self.action_match: float = action_match
+
+        cost_list = [i * 1000 for i in round_cost_list]  # 毫秒
+        if len(cost_list) > 0:
+            self.round_p50, self.round_p90, self.round_p99 = [float(i) for i in np.percentile(cost_list, [50, 90, 99])]
+        else:
+            self.round_p50 = self.round_p90 = self.round_p99 = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'case_id': self.case_id,
+            'op': self.op,
+            'success': self.success,
+            'status': self.status,
+            'cost': round(self.cost, 3),
+            'round_cost_list': [round(i, 4) for i in self.round_cost_list],
+            'action_match': round(self.action_match, 4),
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> 'ReplayCaseResult':
+        return ReplayCaseResult(
+            case_id=data.get('case_id'),
+            op=data.get('op'),
+            success=data.get('success', False),
+            status=data.get('status'),
+            cost=data.get('cost', 0),
+            round_cost_list=data.get('round_cost_list', []),
+            action_match=data.get('action_match', 0),
+        )
+
+    def __str__(self) -> str:
+        return '%-24s %-18s %s 耗时 %7.2fs 轮数 %4d 每轮 p50 %7.1fms p90 %7.1fms p99 %7.1fms 动作相似度 %.2f %s' % (
+            self.case_id, self.op, '成功' if self.success else '失败', self.cost, len(self.round_cost_list),
+            self.round_p50, self.round_p90, self.round_p99, self.action_match, self.status
+        )
+
+
+class ReplayBenchmarkReport:
+
+    def __init__(self, result_list: List[ReplayCaseResult]):
+        """
+        一次端到端回放的结果
+        :param result_list: 全部样例的结果
+        """
+        self.result_list: List[ReplayCaseResult] = result_list
+
+    def get_result(self, case_id: str) -> Optional[ReplayCaseResult]:
+        for result in self.result_list:
+            if result.case_id == case_id:
+                return result
+        return None
+
+    def print_summary(self) -> None:
+        for result in self.result_list:
+            print(result)
+
+    def save(self, file_path: str) -> None:
+        data = {
+            'result_list': [i.to_dict() for i in self.result_list],
+        }
+        with open(file_path, 'w', encoding='utf-8') as file:
+            yaml.safe_dump(data, file, allow_unicode=True, sort_keys=False)
+
+    @staticmethod
+    def load(file_path: str) -> 'ReplayBenchmarkReport':
+        with open(file_path, 'r', encoding='utf-8') as file:
+            data = yaml.safe_load(file)
+        return ReplayBenchmarkReport(
+            result_list=[ReplayCaseResult.from_dict(i) for i in data.get('result_list', [])]
+        )
+
+
+def load_case_list(base_dir: str) -> List[ReplayCase]:
+    """
+    加载目录下全部样例 每个子目录是一次录制 同时有 session.jsonl 和 case.yml 的才是样例
+    :param base_dir: 样例根目录
+    :return:
+    """
+    case_list: List[ReplayCase] = []
+    if not os.path.isdir(base_dir):
+        return case_list
+
+    for case_name in sorted(os.listdir(base_dir)):
+        session_dir = os.path.join(base_dir, case_name)
+        case_path = os.path.join(session_dir, CASE_FILE)
+        if not os.path.exists(os.path.join(session_dir, SESSION_EVENT_FILE)) or not os.path.exists(case_path):
+            continue
+        case = ReplayCase(session_dir, YamlOperator(case_path))
+        if case.op not in OP_FACTORY_MAP:
+            log.error('样例 %s 的指令 %s 不支持', case.case_id, case.op)
+            continue
+        case_list.append(case)
+
+    return case_list
+
+
+def _stop_when_replay_finished(ctx: SrContext) -> None:
+    """
+    画面回放完之后 指令只会看到最后一张画面 等待一段时间后仍未结束的话 停止运行
+    :param ctx: 上下文
+    :return:
+    """
+    replay = ctx.controller.replay
+    while ctx.is_context_running and not replay.is_finished:
+        time.sleep(0.1)
+    finish_time = time.time()
+    while ctx.is_context_running and time.time() - finish_time < FINISH_WAIT_SECONDS:
+        time.sleep(0.1)
+    if ctx.is_context_running:
+        log.info('画面已回放完 停止运行')
+        ctx.stop_running()
+
+
+def run_case(ctx: SrContext, case: ReplayCase) -> ReplayCaseResult:
+    """
+    使用录制的画面运行一次指令 按录制时的时间返回画面 因此耗时变化会体现在每轮看到的画面上
+    :param ctx: 上下文
+    :param case: 样例
+    :return:
+    """
+    ctx.init_replay_controller(case.session_dir, realtime=True)
+    op = OP_FACTORY_MAP[case.op](ctx, case.case_yml)
+
+    ctx.start_running()
+    watcher = _replay_benchmark_executor.submit(_stop_when_replay_finished, ctx)
+    start_time = time.perf_counter()
+    try:
+        op_result = op.execute()
+    finally:
+        cost = time.perf_counter() - start_time
+        if not ctx.is_context_stop:
+            ctx.stop_running()
+        watcher.result()
+
+    replay = ctx.controller.replay
+    replay.close()
+
+    grab_time_list = replay.grab_time_list
+    round_cost_list = [grab_time_list[i] - grab_time_list[i - 1] for i in range(1, len(grab_time_list))]
+    action_match = difflib.SequenceMatcher(
+        a=[i.name for i in replay.session.action_list],
+        b=[i.name for i in replay.action_list],
+        autojunk=False
+    ).ratio()
+
+    return ReplayCaseResult(case.case_id, case.op, op_result.success, op_result.status, cost,
+                            round_cost_list, action_match)
+
+
+def run_benchmark(ctx: SrContext, case_list: List[ReplayCase]) -> ReplayBenchmarkReport:
+    """
+    逐个回放样例 不需要游戏窗口
+    :param ctx: 上下文 不需要调用 init_by_config
+    :param case_list: 样例
+    :return:
+    """
+    result_list: List[ReplayCaseResult] = []
+    for case in case_list:
+        try:
+            result = run_case(ctx, case)
+        except Exception:
+            log.error('样例回放失败 %s', case.case_id, exc_info=True)
+            continue
+        log.info('%s', result)
+        result_list.append(result)
+
+    return ReplayBenchmarkReport(result_list)
+
+
+def diff_report(old: ReplayBenchmarkReport, new: ReplayBenchmarkReport) -> List[str]:
+    """
+    对比两次回放的结果
+    :param old: 旧的结果
+    :param new: 新的结果
+    :return: 对比描述 每行一条
+    """
+    lines: List[str] = []
+    for r2 in new.result_list:
+        r1 = old.get_result(r2.case_id)
+        if r1 is None:
+            continue
+        lines.append('%-24s 耗时 %+7.2fs 每轮 p50 %+7.1fms p90 %+7.1fms 动作相似度 %+.2f' % (
+            r2.case_id, r2.cost - r1.cost, r2.round_p50 - r1.round_p50, r2.round_p90 - r1.round_p90,
+            r2.action_match - r1.action_match
+        ))
+        if r1.success and not r2.success:
+            lines.append(f'  退化 {r1.status} -> {r2.status}')
+        elif not r1.success and r2.success:
+            lines.append(f'  修复 {r1.status} -> {r2.status}')
+
+    return lines
+
+
+def __debug(base_dir: Optional[str] = None, old_report: Optional[str] = None):
+    ctx = SrContext()
+    ctx.init_ocr()
+    if base_dir is None:
+        base_dir = os_utils.get_path_under_work_dir('.debug', 'session')
+    case_list = load_case_list(base_dir)
+    log.info('加载样例 %d 个', len(case_list))
+
+    report = run_benchmark(ctx, case_list)
+    report.print_summary()
+
+    save_dir = os_utils.get_path_under_work_dir('.debug', 'replay_benchmark')
+    save_path = os.path.join(save_dir, f'{os_utils.now_timestamp_str()}.yml')
+    report.save(save_path)
+    log.info('结果已保存 %s', save_path)
+
+    if old_report is not None:
+        for line in diff_report(ReplayBenchmarkReport.load(old_report), report):
+            print(line)
+
+
+if __name__ == '__main__':
+    __debug()
@@ -4,6 +4,7 @@ from cv2.typing import MatLike
 from enum import Enum
 from typing import List
 
+from one_dragon.base.matcher.ocr.ocr_service import OcrRequest
 from one_dragon.base.screen import screen_utils
 from one_dragon.base.screen.screen_utils import FindAreaResultEnum
 from one_dragon.utils import cv2_utils
@@ -47,8 +48,12 @@ def is_express_supply(ctx: SrContext, screen: MatLike) -> bool:
     :param screen: 游戏画面
     :return:
     """
-    return (screen_utils.find_area(ctx, screen, '列车补给', '列车补给1') == FindAreaResultEnum.TRUE
-            or screen_utils.find_area(ctx, screen, '列车补给', '列车补给2') == FindAreaResultEnum.TRUE)
+    area_list = [
+        ctx.screen_loader.get_area('列车补给', '列车补给1'),
+        ctx.screen_loader.get_area('列车补给', '列车补给2'),
+    ]
+    result_list = screen_utils.find_areas_in_screen(ctx, screen, area_list)
+    return FindAreaResultEnum.TRUE in result_list
 
 
 def get_ui_titles(ctx: SrContext, screen: MatLike,
@@ -63,10 +68,8 @@ def get_ui_titles(ctx: SrContext, screen: MatLike,
     :return:
     """
     area = ctx.screen_loader.get_area(screen_name, area_name)
-    part = cv2_utils.crop_image_only(screen, area.rect)
-    # cv2_utils.show_image(part, wait=0)
-    ocr_result_map = ctx.ocr.run_ocr(part)
-    return list(ocr_result_map.keys())
+    ocr_result_list = screen_utils.get_ocr_result_list_batch(ctx, [OcrRequest(image=screen, rect=area.rect)])[0]
+    return list(dict.fromkeys(i.data for i in ocr_result_list))
 
 
 def in_secondary_ui(ctx: SrContext, screen: MatLike,
@@ -0,0 +1,184 @@
+import os
+import shutil
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.utils import cv2_utils, os_utils
+from one_dragon.utils.log_utils import log
+from sr_od.sr_map.sr_map_def import Region
+
+CACHE_VERSION: int = 1  # 缓存格式版本 计算方式有变化时需要增加 旧缓存会自动失效
+PYRAMID_LEVELS: list[int] = [1, 2]  # 预计算的金字塔层级 第n层为原图的 0.5^n 倍
+
+
+def get_large_map_cache_dir(region: Region) -> str:
+    """
+    获取某个区域大地图的衍生数据缓存根目录 下面每个子目录对应一个版本的缓存
+    :param region: 区域
+    :return:
+    """
+    return os_utils.get_path_under_work_dir('.cache', 'large_map', region.planet.np_id, region.rl_id)
+
+
+def get_pyramid_scale(level: int) -> float:
+    """
+    :param level: 金字塔层级
+    :return: 该层级相对原图的缩放比例
+    """
+    return 0.5 ** level
+
+
+class LargeMapCache:
+
+    def __init__(self, region: Region, large_map_dir: str):
+        """
+        某个区域大地图的衍生数据缓存
+        灰度图、金字塔等 第一次使用时计算并保存到磁盘 后续使用内存映射读取
+        原图修改时间变化 或缓存版本变化时 旧缓存自动失效
+        :param region: 区域
+        :param large_map_dir: 大地图原图所在的目录
+        """
+        self.region: Region = region
+        self.large_map_dir: str = large_map_dir
+        self.cache_dir: str = self._prepare_cache_dir()
+
+        self._data: dict[str, MatLike] = {}  # 已经加载的数据
+        self._lock = threading.RLock()  # 移动时会在多个线程中使用 计算时会递归获取依赖的数据
+
+    def _cache_key(self) -> str:
+        """
+        缓存的子目录名称 由缓存版本和原图修改时间组成
+        原图或计算方式变化时 会使用新的目录 不需要判断旧缓存是否有效
+        :return:
+        """
+        mtime_list = []
+        for mt in ['raw', 'mask']:
+            path = os.path.join(self.large_map_dir, f'{mt}.png')
+            mtime_list.append(int(os.path.getmtime(path) * 1000) if os.path.exists(path) else 0)
+        return 'v%d_%s' % (CACHE_VERSION, '_'.join(str(i) for i in mtime_list))
+
+    def _prepare_cache_dir(self) -> str:
+        """
+        获取当前版本的缓存目录 并尝试删除旧版本的目录
+        旧目录中的文件可能还在被内存映射而无法删除 但旧目录不会再被读取 下次再尝试删除即可
+        :return:
+        """
+        root_dir = get_large_map_cache_dir(self.region)
+        cache_key = self._cache_key()
+        for sub_dir in os.listdir(root_dir):
+            if sub_dir == cache_key:
+                continue
+            sub_path = os.path.join(root_dir, sub_dir)
+            log.debug('删除旧的大地图缓存 %s', sub_path)
+            if os.path.isdir(sub_path):
+                shutil.rmtree(sub_path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(sub_path)
+                except Exception:
+                    pass
+
+        cache_dir = os.path.join(root_dir, cache_key)
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
+    def get(self, key: str) -> Optional[MatLike]:
+        """
+        获取某个衍生数据 内存中没有时从磁盘读取 磁盘中没有时计算并保存
+        :param key: 数据名称 见 _compute
+        :return:
+        """
+        data = self._data.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                return data
+
+            path = os.path.join(self.cache_dir, f'{key}.npy')
+            if os.path.exists(path):
+                try:
+                    # 写时复制 调用方就算原地修改也不会影响磁盘上的缓存
+                    data = np.load(path, mmap_mode='c')
+                except Exception:
+                    log.error('读取大地图缓存失败 %s', path, exc_info=True)
+                    data = None
+
+            if data is None:
+                data = self._compute(key)
+                if data is None:
+                    return None
+                try:
+                    np.save(path, data)
+                except Exception:
+                    log.error('保存大地图缓存失败 %s', path, exc_info=True)
+
+            self._data[key] = data
+            return data
+
+    def _compute(self, key: str) -> Optional[MatLike]:
+        """
+        计算某个衍生数据 依赖的数据通过 get 获取 因此也会被缓存
+        - raw / mask: 原图 / 道路掩码
+        - gray: RGB转换的灰度图
+        - match_gray: BGR转换的灰度图 与小地图模板匹配时的转换方式一致
+        - pyramid_{mt}_{level}: 某种地图的金字塔层级
+        :param key: 数据名称
+        :return:
+        """
+        if key in ['raw', 'mask']:
+            return cv2_utils.read_image(os.path.join(self.large_map_dir, f'{key}.png'))
+        elif key == 'gray':
+            raw = self.get('raw')
+            return None if raw is None else cv2.cvtColor(raw, cv2.COLOR_RGB2GRAY)
+        elif key == 'match_gray':
+            raw = self.get('raw')
+            return None if raw is None else cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY)
+
+        prefix, _, rest = key.partition('_')
+        mt, _, level = rest.rpartition('_')
+        if len(mt) == 0 or not level.isdigit():
+            return None
+
+        if prefix == 'pyramid':
+            source = self.get(mt)
+            if source is None:
+                return None
+            scale = get_pyramid_scale(int(level))
+            h, w = source.shape[:2]
+            interpolation = cv2.INTER_NEAREST if mt == 'mask' else cv2.INTER_AREA
+            return cv2.resize(source, (int(w * scale), int(h * scale)), interpolation=interpolation)
+        return None
+
+    def get_pyramid(self, mt: str, level: int) -> Optional[MatLike]:
+        """
+        获取金字塔层级
+        :param mt: 地图类型 raw / mask / gray / match_gray
+        :param level: 层级 0为原图
+        :return:
+        """
+        if level == 0:
+            return self.get(mt)
+        return self.get(f'pyramid_{mt}_{level}')
+
+    def preload(self) -> None:
+        """
+        预先生成常用的衍生数据 使得进入区域后的前几次坐标计算不需要等待
+        :return:
+        """
+        for mt in ['raw', 'mask', 'gray', 'match_gray']:
+            self.get(mt)
+            for level in PYRAMID_LEVELS:
+                self.get_pyramid(mt, level)
+
+    def loaded_data(self) -> list[MatLike]:
+        """
+        :return: 已加载的数据
+        """
+        return list(self._data.values())
@@ -1,10 +1,16 @@
+import os
+
 import cv2
 from cv2.typing import MatLike
 from typing import Optional, Tuple, List
 
+from one_dragon.base.cache import feature_cache
 from one_dragon.utils import cv2_utils
+from sr_od.sr_map.large_map_cache import LargeMapCache
 from sr_od.sr_map.sr_map_def import Region
 
+KEYPOINT_NBYTES: int = 128  # 每个特征点 cv2.KeyPoint 对象大约占用的字节数
+
 
 class LargeMapInfo:
 
@@ -12,24 +18,81 @@ class LargeMapInfo:
         self.region: Optional[Region] = None  # 区域
         self.raw: MatLike = None  # 原图
         self._gray: MatLike = None  # 灰度图
+        self._match_gray: MatLike = None  # 用于模板匹配的灰度图
         self.mask: MatLike = None  # 主体掩码 用于特征匹配
         self.sp_result: Optional[dict] = None  # 特殊点坐标
         self._kps = None  # 特征点 用于特征匹配
         self._desc = None  # 描述子 用于特征匹配
+        self.cache: Optional[LargeMapCache] = None  # 衍生数据的缓存
 
     @property
     def gray(self) -> MatLike:
         if self._gray is not None:
             return self._gray
+        if self.cache is not None:
+            self._gray = self.cache.get('gray')
+            return self._gray
         if self.raw is None:
             return None
         self._gray = cv2.cvtColor(self.raw, cv2.COLOR_RGB2GRAY)
         return self._gray
 
+    @property
+    def match_gray(self) -> MatLike:
+        """
+        与小地图模板相同转换方式的灰度图 用于灰度图模板匹配
+        """
+        if self._match_gray is not None:
+            return self._match_gray
+        if self.cache is not None:
+            self._match_gray = self.cache.get('match_gray')
+            return self._match_gray
+        if self.raw is None:
+            return None
+        self._match_gray = cv2.cvtColor(self.raw, cv2.COLOR_BGR2GRAY)
+        return self._match_gray
+
+    def get_pyramid(self, mt: str, level: int) -> Optional[MatLike]:
+        """
+        获取金字塔层级 没有缓存时返回空
+        :param mt: 地图类型 raw / mask / gray / match_gray
+        :param level: 层级 第n层为原图的 0.5^n 倍
+        :return:
+        """
+        if self.cache is None:
+            return None
+        return self.cache.get_pyramid(mt, level)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        占用内存的估算字节数 同一个数组只计算一次
+        """
+        arr_list = [self.raw, self.mask, self._gray, self._match_gray, self._desc]
+        if self.cache is not None:
+            arr_list.extend(self.cache.loaded_data())
+        counted = set()
+        total = 0
+        for arr in arr_list:
+            if arr is None or id(arr) in counted:
+                continue
+            counted.add(id(arr))
+            total += arr.nbytes
+        if self._kps is not None:
+            total += len(self._kps) * KEYPOINT_NBYTES
+        return total
+
     @property
     def features(self) -> Tuple[List[cv2.KeyPoint], MatLike]:
         if self._kps is not None:
             return self._kps, self._desc
-        if self.raw is not None:
+        if self.raw is None:
+            return self._kps, self._desc
+        if self.cache is not None:
+            self._kps, self._desc = feature_cache.get_features(
+                os.path.join(self.cache.cache_dir, 'features.npz'),
+                self.raw, self.mask
+            )
+        else:
             self._kps, self._desc = cv2_utils.feature_detect_and_compute(self.raw, self.mask)
         return self._kps, self._desc
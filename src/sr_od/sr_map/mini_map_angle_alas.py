@@ -8,13 +8,18 @@ from scipy import signal
 
 @lru_cache
 def RotationRemapData(d: int):
-    mx = np.zeros((d, d), dtype=np.float32)
-    my = np.zeros((d, d), dtype=np.float32)
-    for i in range(d):
-        for j in range(d):
-            mx[i, j] = d / 2 + i / 2 * np.cos(2 * np.pi * j / d)
-            my[i, j] = d / 2 + i / 2 * np.sin(2 * np.pi * j / d)
-    return mx, my
+    """
+    把圆形展开成矩形的映射 第i行第j列 对应半径i/2 角度2πj/d 的点
+    转换成定点数格式 cv2.remap 双线性插值时内部也是先转成这个格式 结果一致 占用内存更少
+    :param d: 小地图直径
+    :return: cv2.remap 使用的两个映射
+    """
+    i = np.arange(d, dtype=np.float64).reshape((d, 1))
+    j = np.arange(d, dtype=np.float64).reshape((1, d))
+    theta = 2 * np.pi * j / d
+    mx = (d / 2 + i / 2 * np.cos(theta)).astype(np.float32)
+    my = (d / 2 + i / 2 * np.sin(theta)).astype(np.float32)
+    return cv2.convertMaps(mx, my, cv2.CV_16SC2)
 
 
 def peak_confidence(arr, **kwargs):
@@ -1,17 +1,120 @@
+import cv2
+import numpy as np
 from cv2.typing import MatLike
-from typing import Optional
+from typing import Optional, Tuple
+
+from sr_od.sr_map.scaled_template_bank import ScaledTemplateBank
 
 
 class MiniMapInfo:
 
     def __init__(self):
+        """
+        小地图信息
+        各类中间结果(灰度图、通道、各种掩码)在第一次使用时计算 同一帧内各个方法共用
+        """
         self.raw: Optional[MatLike] = None  # 原图
         self.raw_del_radio: Optional[MatLike] = None  # 原图减掉雷达
-        self.center_arrow_mask: Optional[MatLike] = None  # 小地图中心小箭头的掩码 用于判断方向
-        self.arrow_mask: Optional[MatLike] = None  # 整张小地图的小箭头掩码 用于合成道路掩码
         self.angle: Optional[float] = None  # 箭头方向
         self.circle_mask: Optional[MatLike] = None  # 小地图圆形
         self.sp_mask: Optional[MatLike] = None  # 特殊点的掩码
         self.sp_result: Optional[dict] = None  # 匹配到的特殊点结果
         self.road_mask: Optional[MatLike] = None  # 道路掩码 不包含中间的小箭头 以及特殊点
         self.road_mask_with_edge: Optional[MatLike] = None  # 有边缘道路掩码 不包含中间的小箭头 以及特殊点 适用于灰度图和原图匹配
+        self.template_bank: ScaledTemplateBank = ScaledTemplateBank()  # 各个模板缩放后的结果 计算坐标的各个策略共用
+
+        self._center_arrow_mask: Optional[MatLike] = None  # 小地图中心小箭头的掩码 用于判断方向
+        self._arrow_mask: Optional[MatLike] = None  # 整张小地图的小箭头掩码 用于合成道路掩码
+        self._gray: Optional[MatLike] = None  # 去除雷达后的灰度图
+        self._channels: Optional[Tuple[MatLike, MatLike, MatLike]] = None  # 去除雷达后的 r, g, b 通道
+        self._flat_color_mask: Optional[MatLike] = None  # 三色差不超过1的掩码
+        self._enemy_mask: Optional[MatLike] = None  # 敌人红点的掩码
+        self._enemy_mask_with_radio: Optional[MatLike] = None  # 敌人红点及其雷达的掩码
+        self._edge_mask: Optional[MatLike] = None  # 道路白色边缘的掩码
+
+    def _init_arrow_mask(self) -> None:
+        from sr_od.sr_map import mini_map_utils
+        self._center_arrow_mask, self._arrow_mask = mini_map_utils.get_arrow_mask(self.raw)
+
+    @property
+    def center_arrow_mask(self) -> MatLike:
+        if self._center_arrow_mask is None:
+            self._init_arrow_mask()
+        return self._center_arrow_mask
+
+    @property
+    def arrow_mask(self) -> MatLike:
+        if self._arrow_mask is None:
+            self._init_arrow_mask()
+        return self._arrow_mask
+
+    @property
+    def gray(self) -> MatLike:
+        """
+        与大地图 match_gray 相同转换方式的灰度图 用于灰度图模板匹配
+        """
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.raw_del_radio, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def channels(self) -> Tuple[MatLike, MatLike, MatLike]:
+        """
+        去除雷达后的 r, g, b 通道
+        """
+        if self._channels is None:
+            self._channels = tuple(cv2.split(self.raw_del_radio))
+        return self._channels
+
+    @property
+    def flat_color_mask(self) -> MatLike:
+        """
+        rgb颜色差不超过1的掩码 当前层的道路和边缘都是这种颜色
+        """
+        if self._flat_color_mask is None:
+            r, g, b = self.channels
+            max_rgb = cv2.max(cv2.max(r, g), b)
+            min_rgb = cv2.min(cv2.min(r, g), b)
+            self._flat_color_mask = cv2.inRange(cv2.subtract(max_rgb, min_rgb), 0, 1)
+        return self._flat_color_mask
+
+    @property
+    def enemy_mask(self) -> MatLike:
+        """
+        敌人红点的掩码 只取最红色的部分 只考虑圆形内部分
+        """
+        if self._enemy_mask is None:
+            self._enemy_mask = self._cal_enemy_mask(170)
+        return self._enemy_mask
+
+    @property
+    def enemy_mask_with_radio(self) -> MatLike:
+        """
+        敌人红点及其雷达的掩码 只考虑圆形内部分
+        """
+        if self._enemy_mask_with_radio is None:
+            self._enemy_mask_with_radio = self._cal_enemy_mask(80)
+        return self._enemy_mask_with_radio
+
+    def _cal_enemy_mask(self, lower_r: int) -> MatLike:
+        """
+        原来还会与 g≈b 的掩码取交集 但 uint8 下 (b-g <= 2) | (b-g >= -2) 恒成立 因此省略
+        :param lower_r: 红色的下限
+        :return:
+        """
+        lower_color = np.array([lower_r, 45, 45], dtype=np.uint8)
+        upper_color = np.array([255, 70, 70], dtype=np.uint8)
+        enemy_mask = cv2.inRange(self.raw_del_radio, lower_color, upper_color)
+        return cv2.bitwise_and(enemy_mask, self.circle_mask)
+
+    @property
+    def edge_mask(self) -> MatLike:
+        """
+        道路白色边缘的掩码
+        """
+        if self._edge_mask is None:
+            lower_color = np.array([160, 160, 160], dtype=np.uint8)
+            upper_color = np.array([210, 210, 210], dtype=np.uint8)
+            edge_mask_rough = cv2.inRange(self.raw_del_radio, lower_color, upper_color)  # 这是粗略的边缘掩码
+            self._edge_mask = cv2.bitwise_and(edge_mask_rough, self.flat_color_mask)  # 三色差不超过1
+        return self._edge_mask
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from cv2.typing import MatLike
+
+from one_dragon.utils import cv2_utils, os_utils
+from one_dragon.utils.log_utils import log
+
+RADIO_LUT_VERSION: int = 1  # 查找表格式版本 旋转方式有变化时需要增加 旧文件会自动失效
+RADIO_ANGLE_STEP: float = 1.875  # 小地图朝向识别结果的精度
+RADIO_ANGLE_CNT: int = int(360 // RADIO_ANGLE_STEP)
+
+_radio_raw: Optional[MatLike] = None
+_radio_lut: Optional[np.ndarray] = None  # (角度数量, 高, 宽, 3) 的只读内存映射
+_lock = threading.Lock()
+
+
+def get_radio_raw() -> MatLike:
+    """
+    未旋转的雷达区域颜色
+    :return:
+    """
+    global _radio_raw
+    if _radio_raw is None:
+        path = os.path.join(os_utils.get_path_under_work_dir('assets', 'template', 'mini_map', 'mini_map_radio'), 'raw.png')
+        _radio_raw = cv2_utils.read_image(path)
+    return _radio_raw
+
+
+def get_radio_lut_path(radio: MatLike) -> str:
+    """
+    查找表的文件路径 文件名中带有原图的哈希 原图变化后会使用新的文件
+    :param radio: 未旋转的雷达区域颜色
+    :return:
+    """
+    hasher = hashlib.blake2b(digest_size=8)
+    hasher.update(str((RADIO_LUT_VERSION, RADIO_ANGLE_STEP, radio.shape, radio.dtype.str)).encode())
+    hasher.update(memoryview(np.ascontiguousarray(radio)).cast('B'))
+    lut_dir = os_utils.get_path_under_work_dir('.cache', 'mini_map_lut')
+    return os.path.join(lut_dir, 'radio_%s.npy' % hasher.hexdigest())
+
+
+def build_radio_lut(radio: MatLike, file_path: str) -> None:
+    """
+    计算每个朝向旋转后的雷达区域颜色 保存到文件
+    先写入临时文件再替换 避免中途退出时留下损坏的文件
+    :param radio: 未旋转的雷达区域颜色
+    :param file_path: 文件路径
+    :return:
+    """
+    lut = np.zeros((RADIO_ANGLE_CNT,) + radio.shape, dtype=radio.dtype)
+    for i in range(RADIO_ANGLE_CNT):
+        lut[i] = cv2_utils.image_rotate(radio, 360 - i * RADIO_ANGLE_STEP)
+
+    temp_path = f'{file_path}.tmp'
+    with open(temp_path, 'wb') as file:
+        np.save(file, lut)
+    os.replace(temp_path, file_path)
+
+
+def get_radio_lut() -> Optional[np.ndarray]:
+    """
+    每个朝向旋转后的雷达区域颜色 只读的内存映射 多个线程共用
+    第一次使用时计算并保存 之后每次启动直接映射文件 只有用到的角度会读入内存
+    :return: 读取失败时返回空
+    """
+    global _radio_lut
+    if _radio_lut is not None:
+        return _radio_lut
+    with _lock:
+        if _radio_lut is not None:
+            return _radio_lut
+
+        radio = get_radio_raw()
+        if radio is None:
+            return None
+        file_path = get_radio_lut_path(radio)
+        try:
+            if not os.path.exists(file_path):
+                build_radio_lut(radio, file_path)
+            lut = np.load(file_path, mmap_mode='r')
+            if lut.shape != (RADIO_ANGLE_CNT,) + radio.shape:
+                raise ValueError('雷达查找表大小不一致 %s' % str(lut.shape))
+            _radio_lut = lut
+        except Exception:
+            log.error('加载雷达查找表失败 %s', file_path, exc_info=True)
+            return None
+        return _radio_lut
+
+
+@lru_cache(maxsize=64)
+def _rotate_radio(angle: float) -> MatLike:
+    """
+    查找表之外的角度 实时计算
+    :param angle: 人物朝向
+    :return:
+    """
+    return cv2_utils.image_rotate(get_radio_raw(), 360 - angle)
+
+
+def get_radio_to_del(angle: Optional[float] = None) -> MatLike:
+    """
+    根据人物朝向 获取对应的雷达区域颜色
+    朝向是 1.875 的倍数时 直接使用查找表 否则实时计算
+    结果是共用的 不能修改
+    :param angle: 人物朝向
+    :return:
+    """
+    if angle is None:
+        return get_radio_raw()
+
+    idx = angle / RADIO_ANGLE_STEP
+    round_idx = round(idx)
+    if abs(idx - round_idx) < 1e-6:
+        lut = get_radio_lut()
+        if lut is not None:
+            return np.asarray(lut[round_idx % RADIO_ANGLE_CNT])
+
+    return _rotate_radio(angle)
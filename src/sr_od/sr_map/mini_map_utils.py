@@ -1,19 +1,17 @@
 import cv2
 import numpy as np
-import os
 from cv2.typing import MatLike
-from functools import lru_cache
 from typing import Set, Optional, List, Tuple
 
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.matcher.match_result import MatchResultList, MatchResult
 from one_dragon.base.screen.template_info import TemplateInfo
-from one_dragon.utils import cv2_utils, os_utils, cal_utils
+from one_dragon.utils import cv2_utils, cal_utils
 from one_dragon.utils.log_utils import log
 from sr_od.config import game_const
 from sr_od.config.game_config import MiniMapPos
 from sr_od.context.sr_context import SrContext
-from sr_od.sr_map import mini_map_angle_alas
+from sr_od.sr_map import mini_map_angle_alas, mini_map_lut
 from sr_od.sr_map.mini_map_info import MiniMapInfo
 
 
@@ -69,8 +67,7 @@ def preheat():
     for i in range(93, 100):  # 不同时期截图大小可能不一致
         mini_map_angle_alas.RotationRemapData(i * 2)
 
-    for i in range(int(360 // 1.875)):
-        get_radio_to_del(i * 1.875)
+    mini_map_lut.get_radio_lut()
 
 
 def extract_arrow(mini_map: MatLike):
@@ -129,6 +126,35 @@ def analyse_angle(mini_map: MatLike) -> float:
     return mini_map_angle_alas.calculate(mini_map)
 
 
+_mm_icon_template_id_list: Optional[List[str]] = None
+
+
+def get_mm_icon_template_id_list(ctx: SrContext) -> List[str]:
+    """
+    小地图上所有特殊点图标的模板id 按 传送点、特殊点、首领、副本 的顺序
+    :param ctx: 上下文
+    :return:
+    """
+    global _mm_icon_template_id_list
+    if _mm_icon_template_id_list is not None:
+        return _mm_icon_template_id_list
+
+    template_id_list = []
+    for prefix in ['mm_tp', 'mm_sp', 'mm_boss', 'mm_sub']:
+        for i in range(100):
+            if i == 0:
+                continue
+
+            template_id = '%s_%02d' % (prefix, i)
+            t: TemplateInfo = ctx.template_loader.get_template('mm_icon', template_id)
+            if t is None:
+                break
+            template_id_list.append(template_id)
+
+    _mm_icon_template_id_list = template_id_list
+    return _mm_icon_template_id_list
+
+
 def init_sp_mask_by_feature_match(ctx: SrContext, mm_info: MiniMapInfo,
                                   sp_types: Set = None,
                                   show: bool = False):
@@ -155,65 +181,63 @@ def init_sp_mask_by_feature_match(ctx: SrContext, mm_info: MiniMapInfo,
     source = mm_info.raw_del_radio
     source_mask = mm_info.circle_mask
     source_kps, source_desc = cv2_utils.feature_detect_and_compute(source, mask=source_mask)
-    for prefix in ['mm_tp', 'mm_sp', 'mm_boss', 'mm_sub']:
-        for i in range(100):
-            if i == 0:
-                continue
-
-            template_id = '%s_%02d' % (prefix, i)
-            t: TemplateInfo = ctx.template_loader.get_template('mm_icon', template_id)
-            if t is None:
-                break
-            if sp_types is not None and template_id not in sp_types:
-                continue
 
+    template_id_list = get_mm_icon_template_id_list(ctx)
+    feature_index = ctx.template_loader.get_feature_index('mm_icon', template_id_list)
+    result_map = feature_index.match(source_kps, source_desc, source_mask=source_mask,
+                                     knn_distance_percent=0.75, template_id_list=sp_types)
+    for template_id in template_id_list:
+        if sp_types is not None and template_id not in sp_types:
+            continue
+        t: TemplateInfo = ctx.template_loader.get_template('mm_icon', template_id)
+
+        template = t.raw
+        scaled_result = result_map.get(template_id)
+        if scaled_result is not None:
+            scale = scaled_result.template_scale
+            mr = MatchResult(1, scaled_result.x, scaled_result.y, template.shape[1], template.shape[0], template_scale=scale)  #
             match_result_list = MatchResultList()
-            template = t.raw
+            match_result_list.append(mr, auto_merge=False)
+            sp_match_result[template_id] = match_result_list
+
+            # 缩放后的宽度和高度
+            sw = scaled_result.w
+            sh = scaled_result.h
+            # one_sp_mask = cv2.resize(template_mask, (sh, sw))
+            one_sp_mask = np.zeros((sh, sw))
+
+            rect1, rect2 = cv2_utils.get_overlap_rect(sp_mask, one_sp_mask, mr.x, mr.y)
+            sx_start, sy_start, sx_end, sy_end = rect1
+            tx_start, ty_start, tx_end, ty_end = rect2
+            # sp_mask[sy_start:sy_end, sx_start:sx_end] = cv2.bitwise_or(
+            #     sp_mask[sy_start:sy_end, sx_start:sx_end],
+            #     one_sp_mask[ty_start:ty_end, tx_start:tx_end]
+            # )
+            sp_mask[sy_start:sy_end, sx_start:sx_end] = 255
+
+        if show:
             template_mask = t.mask
-
             template_kps, template_desc = t.features
-
             good_matches, offset_x, offset_y, scale = cv2_utils.feature_match(
                 source_kps, source_desc,
                 template_kps, template_desc,
                 source_mask=source_mask)
 
+            cv2_utils.show_image(source, win_name='source')
+            cv2_utils.show_image(source_mask, win_name='source_mask')
+            source_with_keypoints = cv2.drawKeypoints(source, source_kps, None)
+            cv2_utils.show_image(source_with_keypoints, win_name='source_with_keypoints_%s' % template_id)
+            template_with_keypoints = cv2.drawKeypoints(template, template_kps, None)
+            cv2_utils.show_image(
+                cv2.bitwise_and(template_with_keypoints, template_with_keypoints, mask=template_mask),
+                win_name='template_with_keypoints_%s' % template_id)
+            all_result = cv2.drawMatches(template, template_kps, source, source_kps, good_matches, None, flags=2)
+            cv2_utils.show_image(all_result, win_name='all_match_%s' % template_id)
+
             if offset_x is not None:
-                mr = MatchResult(1, offset_x, offset_y, template.shape[1], template.shape[0], template_scale=scale)  #
-                match_result_list.append(mr, auto_merge=False)
-                sp_match_result[template_id] = match_result_list
-
-                # 缩放后的宽度和高度
-                sw = int(template.shape[1] * scale)
-                sh = int(template.shape[0] * scale)
-                # one_sp_mask = cv2.resize(template_mask, (sh, sw))
-                one_sp_mask = np.zeros((sh, sw))
-
-                rect1, rect2 = cv2_utils.get_overlap_rect(sp_mask, one_sp_mask, mr.x, mr.y)
-                sx_start, sy_start, sx_end, sy_end = rect1
-                tx_start, ty_start, tx_end, ty_end = rect2
-                # sp_mask[sy_start:sy_end, sx_start:sx_end] = cv2.bitwise_or(
-                #     sp_mask[sy_start:sy_end, sx_start:sx_end],
-                #     one_sp_mask[ty_start:ty_end, tx_start:tx_end]
-                # )
-                sp_mask[sy_start:sy_end, sx_start:sx_end] = 255
-
-            if show:
-                cv2_utils.show_image(source, win_name='source')
-                cv2_utils.show_image(source_mask, win_name='source_mask')
-                source_with_keypoints = cv2.drawKeypoints(source, source_kps, None)
-                cv2_utils.show_image(source_with_keypoints, win_name='source_with_keypoints_%s' % template_id)
-                template_with_keypoints = cv2.drawKeypoints(template, template_kps, None)
-                cv2_utils.show_image(
-                    cv2.bitwise_and(template_with_keypoints, template_with_keypoints, mask=template_mask),
-                    win_name='template_with_keypoints_%s' % template_id)
-                all_result = cv2.drawMatches(template, template_kps, source, source_kps, good_matches, None, flags=2)
-                cv2_utils.show_image(all_result, win_name='all_match_%s' % template_id)
-
-                if offset_x is not None:
-                    cv2_utils.show_overlap(source, template, offset_x, offset_y, template_scale=scale, win_name='overlap_%s' % template_id)
-                cv2.waitKey(0)
-                cv2.destroyAllWindows()
+                cv2_utils.show_overlap(source, template, offset_x, offset_y, template_scale=scale, win_name='overlap_%s' % template_id)
+            cv2.waitKey(0)
+            cv2.destroyAllWindows()
 
     mm_info.sp_mask = sp_mask
     mm_info.sp_result = sp_match_result
@@ -277,24 +301,13 @@ def is_under_attack(mm: MatLike,
     return find
 
 
-mini_map_radio_to_del: Optional[MatLike] = None
-
-
-@lru_cache
 def get_radio_to_del(angle: Optional[float] = None):
     """
     根据人物朝向 获取对应的雷达区域颜色
     :param angle: 人物朝向
     :return:
     """
-    global mini_map_radio_to_del
-    if mini_map_radio_to_del is None:
-        path = os.path.join(os_utils.get_path_under_work_dir('assets', 'template', 'mini_map', 'mini_map_radio'), 'raw.png')
-        mini_map_radio_to_del = cv2_utils.read_image(path)
-    if angle is not None:
-        return cv2_utils.image_rotate(mini_map_radio_to_del, 360 - angle)
-    else:
-        return mini_map_radio_to_del
+    return mini_map_lut.get_radio_to_del(angle)
 
 
 def analyse_mini_map(raw: MatLike) -> MiniMapInfo:
@@ -305,7 +318,7 @@ def analyse_mini_map(raw: MatLike) -> MiniMapInfo:
     """
     info = MiniMapInfo()
     info.raw = raw
-    info.center_arrow_mask, info.arrow_mask, info.angle = analyse_arrow_and_angle(raw)
+    info.angle = analyse_angle(raw)  # 小箭头掩码等其它结果 在用到时才计算
     info.raw_del_radio = remove_radio(info.raw, get_radio_to_del(info.angle))
     init_circle_mask(info)
 
@@ -313,10 +326,10 @@ def analyse_mini_map(raw: MatLike) -> MiniMapInfo:
 
 
 def init_circle_mask(mm_info: MiniMapInfo):
-    h, w = mm_info.arrow_mask.shape[1], mm_info.arrow_mask.shape[0]
+    h, w = mm_info.raw.shape[1], mm_info.raw.shape[0]
     cx, cy = w // 2, h // 2
 
-    mm_info.circle_mask = np.zeros_like(mm_info.arrow_mask)
+    mm_info.circle_mask = np.zeros(mm_info.raw.shape[:2], dtype=np.uint8)
     cv2.circle(mm_info.circle_mask, (cx, cy), h // 2 - 5, 255, -1)  # 忽略一点圆的边缘
 
 
@@ -353,7 +366,6 @@ def init_road_mask_for_world_patrol(mm_info: MiniMapInfo, another_floor: bool =
         return
 
     mm_del_radio = mm_info.raw_del_radio
-    r, g, b = cv2.split(mm_del_radio)
 
     l = 45
     u = 70  # 背景色 正常是55~60附近 太亮的时候会到达这个值 或者其它楼层也会达到这个值
@@ -362,13 +374,10 @@ def init_road_mask_for_world_patrol(mm_info: MiniMapInfo, another_floor: bool =
     road_mask_1 = cv2.inRange(mm_del_radio, lower_color, upper_color)  # 这是粗略的道路掩码
     # cv2_utils.show_image(road_mask_1, win_name='road_mask_1')
 
-    max_rgb = np.max(mm_del_radio, axis=2)
-    min_rgb = np.min(mm_del_radio, axis=2)
-    road_mask_cf = np.zeros(road_mask_1.shape, dtype=np.uint8)
-    road_mask_cf[(max_rgb - min_rgb) <= 1] = 255  # rgb颜色差不超过1 当前层的道路就是这个颜色
+    road_mask_cf = mm_info.flat_color_mask  # rgb颜色差不超过1 当前层的道路就是这个颜色
     # cv2_utils.show_image(road_mask_cf, win_name='road_mask_cf')
-    b_g = None
     if another_floor:  # 多层地图时 另一层的颜色是递进的 R<=G<=B 且差值在2以内
+        r, g, b = mm_info.channels
         b_g = b - g
         g_r = g - r
         road_mask_af = np.zeros(road_mask_1.shape, dtype=np.uint8)
@@ -382,25 +391,10 @@ def init_road_mask_for_world_patrol(mm_info: MiniMapInfo, another_floor: bool =
     road_mask_2 = cv2.bitwise_and(road_mask_1, road_mask_floor)  # 不同楼层的地图
     # cv2_utils.show_image(road_mask_2, win_name='road_mask_2')
 
-    if b_g is None:
-        b_g = b - g
-    # 算敌人的掩码图
-    lower_color = np.array([80, 45, 45], dtype=np.uint8)
-    upper_color = np.array([255, 70, 70], dtype=np.uint8)
-    enemy_mask_1 = cv2.inRange(mm_del_radio, lower_color, upper_color)  # 这是粗略的敌人图
-    enemy_mask_2 = np.zeros(road_mask_1.shape, dtype=np.uint8)
-    enemy_mask_2[(b_g <= 2) | (b_g >= -2)] = 255  # 敌人的雷达图 g 约等于 b
-    enemy_mask = cv2.bitwise_and(enemy_mask_1, enemy_mask_2)
-    # cv2_utils.show_image(enemy_mask, win_name='enemy_mask')
-
-    mm_info.road_mask = cv2.bitwise_or(road_mask_2, enemy_mask)
-    mm_info.road_mask = cv2.bitwise_and(mm_info.road_mask, mm_info.circle_mask)  # 只考虑圆形内部分
+    mm_info.road_mask = cv2.bitwise_and(road_mask_2, mm_info.circle_mask)  # 只考虑圆形内部分
+    mm_info.road_mask = cv2.bitwise_or(mm_info.road_mask, mm_info.enemy_mask_with_radio)  # 敌人的雷达图也算道路
 
-    lower_color = np.array([160, 160, 160], dtype=np.uint8)
-    upper_color = np.array([210, 210, 210], dtype=np.uint8)
-    edge_mask_rough = cv2.inRange(mm_del_radio, lower_color, upper_color)  # 这是粗略的边缘掩码
-    edge_mask = cv2.bitwise_and(edge_mask_rough, road_mask_cf)  # 三色差不超过1
-    mm_info.road_mask_with_edge = cv2.bitwise_or(mm_info.road_mask, edge_mask)
+    mm_info.road_mask_with_edge = cv2.bitwise_or(mm_info.road_mask, mm_info.edge_mask)
 
 
 def init_road_mask_for_sim_uni(mm_info: MiniMapInfo):
@@ -633,20 +627,7 @@ def get_enemy_mask(mm_info: MiniMapInfo, with_radio: bool = False) -> MatLike:
     :param with_radio: 是否包含雷达部分
     :return: 敌人红点的掩码
     """
-    mm_del_radio = mm_info.raw_del_radio
-    # cv2_utils.show_image(mm_del_radio, win_name='get_enemy_mask')
-    r, g, b = cv2.split(mm_del_radio)
-    b_g = b - g
-    lower_color = np.array([80, 45, 45], dtype=np.uint8)
-    if not with_radio:  # 不包含雷达的话 只取最红色的部分
-        lower_color[0] = 170
-    upper_color = np.array([255, 70, 70], dtype=np.uint8)
-    enemy_mask_1 = cv2.inRange(mm_del_radio, lower_color, upper_color)  # 这是粗略的敌人图
-    enemy_mask_2 = np.zeros(mm_del_radio.shape[:2], dtype=np.uint8)
-    enemy_mask_2[(b_g <= 2) | (b_g >= -2)] = 255  # 敌人的雷达图 g 约等于 b
-    enemy_mask = cv2.bitwise_and(enemy_mask_1, enemy_mask_2)
-
-    return cv2.bitwise_and(enemy_mask, mm_info.circle_mask)
+    return mm_info.enemy_mask_with_radio if with_radio else mm_info.enemy_mask
 
 
 def with_enemy_nearby_new(mm_info: MiniMapInfo):
@@ -0,0 +1,138 @@
+import threading
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+ScaledTemplate = Tuple[MatLike, MatLike, int, int, int, int]  # 模板、掩码、截取的左上角偏移量x, y、放大后的宽、高
+
+
+class _ScaledImage:
+
+    def __init__(self, image: MatLike, sx: int, sy: int, scale_width: int, scale_height: int):
+        """
+        放大后截取中心部分的图片
+        """
+        self.image: MatLike = image
+        self.sx: int = sx
+        self.sy: int = sy
+        self.scale_width: int = scale_width
+        self.scale_height: int = scale_height
+
+
+class ScaledTemplateBank:
+
+    def __init__(self):
+        """
+        某一帧小地图中 各个模板在各个缩放比例下的结果
+        同一帧小地图会使用多种策略计算坐标 道路掩码、灰度图、原图之间有共用的模板和掩码
+        按名称保存 所有策略共用 避免每个策略每个缩放比例都重新放大和分配内存
+        """
+        self._data: dict[Tuple[str, float], _ScaledImage] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, key: str, image: MatLike, scale_list: List[float]) -> None:
+        """
+        预先计算所有缩放比例 结果放在同一块预先分配的内存中
+        在提交到线程池前调用 线程中就只需要读取
+        :param key: 图片名称 同一帧中同名的图片需要内容一致
+        :param image: 原图
+        :param scale_list: 缩放比例
+        :return:
+        """
+        with self._lock:
+            to_add = [i for i in dict.fromkeys(scale_list) if (key, i) not in self._data]
+            if len(to_add) == 0:
+                return
+            buffer = np.empty((len(to_add),) + image.shape, dtype=np.uint8)
+            for idx, scale in enumerate(to_add):
+                self._data[(key, scale)] = _scale_center(image, scale, buffer[idx])
+
+    def get(self, key: str, image: MatLike, scale: float) -> _ScaledImage:
+        """
+        获取某个缩放比例的结果 没有预先计算时现算
+        :param key: 图片名称
+        :param image: 原图
+        :param scale: 缩放比例
+        :return:
+        """
+        scaled = self._data.get((key, scale))
+        if scaled is not None:
+            return scaled
+        with self._lock:
+            scaled = self._data.get((key, scale))
+            if scaled is None:
+                scaled = _scale_center(image, scale, np.empty_like(image, dtype=np.uint8))
+                self._data[(key, scale)] = scaled
+            return scaled
+
+    def bind(self, template_key: str, template: MatLike,
+             mask_key: str, template_mask: MatLike) -> 'BoundTemplate':
+        """
+        绑定一组模板和掩码 供模板匹配使用
+        :param template_key: 模板名称
+        :param template: 模板
+        :param mask_key: 掩码名称
+        :param template_mask: 掩码
+        :return:
+        """
+        return BoundTemplate(self, template_key, template, mask_key, template_mask)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class BoundTemplate:
+
+    def __init__(self, bank: ScaledTemplateBank,
+                 template_key: str, template: MatLike,
+                 mask_key: str, template_mask: MatLike):
+        """
+        一组模板和掩码 缩放结果从共用的 ScaledTemplateBank 中获取
+        """
+        self.bank: ScaledTemplateBank = bank
+        self.template_key: str = template_key
+        self.template: MatLike = template
+        self.mask_key: str = mask_key
+        self.template_mask: MatLike = template_mask
+
+    def prepare(self, scale_list: List[float]) -> None:
+        self.bank.prepare(self.template_key, self.template, scale_list)
+        self.bank.prepare(self.mask_key, self.template_mask, scale_list)
+
+    def get(self, scale: float) -> ScaledTemplate:
+        """
+        :param scale: 缩放比例
+        :return: 与 cal_pos_utils.get_scaled_template 的返回值一致
+        """
+        t = self.bank.get(self.template_key, self.template, scale)
+        m = self.bank.get(self.mask_key, self.template_mask, scale)
+        return t.image, m.image, t.sx, t.sy, t.scale_width, t.scale_height
+
+
+def _scale_center(image: MatLike, scale: float, out: MatLike) -> _ScaledImage:
+    """
+    按比例放大图片后 截取中心部分 尺寸与原图一致
+    :param image: 原图
+    :param scale: 缩放比例
+    :param out: 结果写入的内存 尺寸与原图一致
+    :return:
+    """
+    height, width = image.shape[:2]
+    if scale == 1:
+        scaled = image
+    else:
+        scaled = cv2.resize(image, (int(height * scale), int(width * scale)))
+
+    scale_height, scale_width = scaled.shape[:2]
+    cx = scale_width // 2
+    cy = scale_height // 2
+    sx = cx - width // 2
+    ex = sx + width
+    sy = cy - width // 2
+    ey = sy + height
+
+    out[:, :] = scaled[sy:ey, sx:ex]
+    return _ScaledImage(out, sx, sy, scale_width, scale_height)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from one_dragon.base.geometry.rectangle import Rect
+from sr_od.sr_map.sr_map_def import SpecialPoint
+
+SpTypeMap = Mapping[str, Tuple[SpecialPoint, ...]]  # template_id -> 特殊点
+
+
+class SpSpatialIndex:
+
+    def __init__(self, sp_list: List[SpecialPoint], cell_size: int = 128, max_cache_size: int = 16):
+        """
+        一个区域内特殊点的网格索引 用于按大地图矩形查找特殊点
+        查询结果按 template_id 分组 分组内保持原来的顺序 结果不可修改 相同矩形的查询直接返回缓存
+        :param sp_list: 区域内的特殊点
+        :param cell_size: 网格边长
+        :param max_cache_size: 缓存多少个矩形的查询结果 人物静止或小范围移动时 圈定的大地图区域经常相同
+        """
+        self.sp_list: List[SpecialPoint] = sp_list
+        self.cell_size: int = cell_size
+        self.max_cache_size: int = max_cache_size
+
+        self._grid: Dict[Tuple[int, int], List[int]] = {}  # 格子 -> 特殊点下标
+        for idx, sp in enumerate(sp_list):
+            cell = (sp.lm_pos.x // cell_size, sp.lm_pos.y // cell_size)
+            self._grid.setdefault(cell, []).append(idx)
+
+        self._all: SpTypeMap = self._group(range(len(sp_list)))
+        self._cache: OrderedDict[Tuple[int, int, int, int], SpTypeMap] = OrderedDict()
+        self._cache_lock = threading.Lock()  # 坐标计算会在多个线程中查询
+
+    def _group(self, idx_list) -> SpTypeMap:
+        """
+        按 template_id 分组
+        :param idx_list: 特殊点下标 需要已排序
+        :return:
+        """
+        sp_map: Dict[str, List[SpecialPoint]] = {}
+        for idx in idx_list:
+            sp = self.sp_list[idx]
+            sp_map.setdefault(sp.template_id, []).append(sp)
+        return MappingProxyType({k: tuple(v) for k, v in sp_map.items()})
+
+    def query(self, rect: Optional[Rect]) -> SpTypeMap:
+        """
+        获取矩形内的特殊点 按种类分组 边界上的也算在内
+        :param rect: 矩形 为空时返回全部
+        :return:
+        """
+        if rect is None:
+            return self._all
+
+        key = (rect.x1, rect.y1, rect.x2, rect.y2)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        idx_list: List[int] = []
+        for gx in range(rect.x1 // self.cell_size, rect.x2 // self.cell_size + 1):
+            for gy in range(rect.y1 // self.cell_size, rect.y2 // self.cell_size + 1):
+                for idx in self._grid.get((gx, gy), []):
+                    pos = self.sp_list[idx].lm_pos
+                    if rect.x1 <= pos.x <= rect.x2 and rect.y1 <= pos.y <= rect.y2:
+                        idx_list.append(idx)
+        idx_list.sort()
+
+        result = self._group(idx_list)
+        with self._cache_lock:
+            self._cache[key] = result
+            if len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+        return result
@@ -3,17 +3,25 @@ import os
 from cv2.typing import MatLike
 from typing import List, Optional
 
+from one_dragon.base.cache.lru_cache import LruCache, LruCacheStats
 from one_dragon.base.config.yaml_operator import YamlOperator
+from one_dragon.base.operation.asset_bootstrap import ASSET_FILE_EXECUTOR
 from one_dragon.base.geometry.point import Point
 from one_dragon.base.geometry.rectangle import Rect
-from one_dragon.utils import os_utils, str_utils, cv2_utils, cal_utils
+from one_dragon.base.matcher.name_index import NameIndex
+from one_dragon.utils import os_utils, cv2_utils, i18_utils
 from one_dragon.utils.i18_utils import gt
+from one_dragon.utils.log_utils import log
+from sr_od.sr_map.large_map_cache import LargeMapCache
 from sr_od.sr_map.large_map_info import LargeMapInfo
+from sr_od.sr_map.sp_spatial_index import SpSpatialIndex, SpTypeMap
 from sr_od.sr_map.sr_map_def import Planet, Region, SpecialPoint
 
 
 class SrMapData:
 
+    large_map_max_bytes: int = 2 * 1024 * 1024 * 1024  # 大地图缓存最多占用的内存
+
     def __init__(self):
         self.planet_list: List[Planet] = []
         self.region_list: List[Region] = []
@@ -22,9 +30,19 @@ class SrMapData:
         self.sp_list: List[SpecialPoint] = []
         self.region_2_sp: dict[str, List[SpecialPoint]] = {}
 
+        # 名称索引 按需生成 名称为当前语言的翻译 key中包含语言
+        self._planet_name_index: dict[str, NameIndex] = {}  # key=语言
+        self._region_name_index: dict[tuple, tuple[List[Region], NameIndex]] = {}  # key=(语言, 星球, 楼层)
+        self._sp_name_index: dict[tuple, tuple[List[SpecialPoint], NameIndex]] = {}  # key=(语言, 区域)
+        self._sp_spatial_index: dict[str, SpSpatialIndex] = {}  # key=区域 特殊点的网格索引 按需生成
+
         self.load_map_data()
 
-        self.large_map_info_map: dict[str, LargeMapInfo] = {}
+        self.large_map_info_map: LruCache[str, LargeMapInfo] = LruCache(
+            max_bytes=SrMapData.large_map_max_bytes,
+            size_of=lambda info: info.nbytes,
+            on_evict=lambda prl_id, info: log.info('大地图缓存淘汰 %s 占用 %.2fMB', prl_id, info.nbytes / 1024 / 1024)
+        )
 
     def load_map_data(self) -> None:
         """
@@ -47,6 +65,7 @@ class SrMapData:
         file_path = os.path.join(self.get_map_data_dir(), 'planet.yml')
         yaml_op = YamlOperator(file_path)
         self.planet_list = [Planet(**item) for item in yaml_op.data]
+        self._planet_name_index.clear()
 
     def load_region_data(self) -> None:
         """
@@ -55,10 +74,13 @@ class SrMapData:
         """
         self.region_list = []
         self.planet_2_region: dict[str, List[Region]] = {}
+        self._region_name_index.clear()
+
+        # 并行读取文件 再按顺序处理 区域之间有依赖
+        file_path_list = [os.path.join(self.get_map_data_dir(), p.np_id, f'{p.np_id}.yml') for p in self.planet_list]
+        yaml_op_list = list(ASSET_FILE_EXECUTOR.map(YamlOperator, file_path_list))
 
-        for p in self.planet_list:
-            file_path = os.path.join(self.get_map_data_dir(), p.np_id, f'{p.np_id}.yml')
-            yaml_op = YamlOperator(file_path)
+        for p, yaml_op in zip(self.planet_list, yaml_op_list):
             self.planet_2_region[p.np_id] = []
 
             for r in yaml_op.data:
@@ -82,6 +104,7 @@ class SrMapData:
 
                     self.region_list.append(region)
                     self.planet_2_region[p.np_id].append(region)
+                    self._region_name_index.clear()  # 加载中途查找父区域 需要重新生成
 
     def load_special_point_data(self) -> None:
         """
@@ -90,16 +113,19 @@ class SrMapData:
         """
         self.sp_list = []
         self.region_2_sp = {}
+        self._sp_name_index.clear()
+        self._sp_spatial_index.clear()
 
+        file_path_list = []
         loaded_region_set = set()
         for region in self.region_list:
             if region.pr_id in loaded_region_set:
                 continue
             loaded_region_set.add(region.pr_id)
+            file_path_list.append(os.path.join(self.get_map_data_dir(), region.planet.np_id, f'{region.pr_id}.yml'))
 
-            file_path = os.path.join(self.get_map_data_dir(), region.planet.np_id, f'{region.pr_id}.yml')
-            yaml_op = YamlOperator(file_path)
-
+        # 并行读取文件 再按顺序处理
+        for yaml_op in ASSET_FILE_EXECUTOR.map(YamlOperator, file_path_list):
             for sp_data in yaml_op.data:
                 real_planet = self.best_match_planet_by_name(sp_data['planet_name'])
                 real_region = self.best_match_region_by_name(sp_data['region_name'], real_planet, sp_data.get('region_floor', 0))
@@ -130,8 +156,12 @@ class SrMapData:
         :param ocr_word: OCR结果
         :return:
         """
-        planet_names = [gt(p.cn, 'ocr') for p in self.planet_list]
-        idx = str_utils.find_best_match_by_difflib(ocr_word, target_word_list=planet_names)
+        lang = i18_utils.get_default_lang()
+        name_index = self._planet_name_index.get(lang)
+        if name_index is None:
+            name_index = NameIndex([gt(p.cn, 'ocr') for p in self.planet_list])
+            self._planet_name_index[lang] = name_index
+        idx = name_index.find_best_match(ocr_word)
         if idx is None:
             return None
         else:
@@ -167,20 +197,23 @@ class SrMapData:
         if ocr_word is None or len(ocr_word) == 0:
             return None
 
-        to_check_region_list: List[Region] = []
-        to_check_region_name_list: List[str] = []
-
-        for region in self.region_list:
-            if planet is not None and planet.np_id != region.planet.np_id:
-                continue
+        key = (i18_utils.get_default_lang(), None if planet is None else planet.np_id, target_floor)
+        index_item = self._region_name_index.get(key)
+        if index_item is None:
+            to_check_region_list: List[Region] = []
+            for region in self.region_list:
+                if planet is not None and planet.np_id != region.planet.np_id:
+                    continue
 
-            if target_floor is not None and target_floor != region.floor:
-                continue
+                if target_floor is not None and target_floor != region.floor:
+                    continue
 
-            to_check_region_list.append(region)
-            to_check_region_name_list.append(gt(region.cn, 'ocr'))
+                to_check_region_list.append(region)
+            index_item = (to_check_region_list, NameIndex([gt(i.cn, 'ocr') for i in to_check_region_list]))
+            self._region_name_index[key] = index_item
 
-        idx = str_utils.find_best_match_by_difflib(ocr_word, to_check_region_name_list)
+        to_check_region_list, name_index = index_item
+        idx = name_index.find_best_match(ocr_word)
         if idx is None:
             return None
         else:
@@ -236,10 +269,15 @@ class SrMapData:
         if ocr_word is None or len(ocr_word) == 0:
             return None
 
-        to_check_sp_list: List[SpecialPoint] = self.region_2_sp.get(region.pr_id, [])
-        to_check_sp_name_list: List[str] = [gt(i.cn, 'ocr') for i in to_check_sp_list]
+        key = (i18_utils.get_default_lang(), region.pr_id)
+        index_item = self._sp_name_index.get(key)
+        if index_item is None:
+            to_check_sp_list: List[SpecialPoint] = self.region_2_sp.get(region.pr_id, [])
+            index_item = (to_check_sp_list, NameIndex([gt(i.cn, 'ocr') for i in to_check_sp_list]))
+            self._sp_name_index[key] = index_item
 
-        idx = str_utils.find_best_match_by_difflib(ocr_word, to_check_sp_name_list)
+        to_check_sp_list, name_index = index_item
+        idx = name_index.find_best_match(ocr_word)
         if idx is None:
             return None
         else:
@@ -259,24 +297,18 @@ class SrMapData:
         region = self.best_match_region_by_name(region_name, planet, region_floor)
         return self.best_match_sp_by_name(region, sp_name)
 
-    def get_sp_type_in_rect(self, region: Region, rect: Rect) -> dict:
+    def get_sp_type_in_rect(self, region: Region, rect: Rect) -> SpTypeMap:
         """
         获取区域特定矩形内的特殊点 按种类分组
         :param region: 区域
         :param rect: 矩形 为空时返回全部
-        :return: 特殊点
+        :return: 特殊点 结果不可修改
         """
-        sp_list = self.region_2_sp.get(region.pr_id)
-        sp_map = {}
-        if sp_list is None or len(sp_list) == 0:
-            return sp_map
-        for sp in sp_list:
-            if rect is None or cal_utils.in_rect(sp.lm_pos, rect):
-                if sp.template_id not in sp_map:
-                    sp_map[sp.template_id] = []
-                sp_map[sp.template_id].append(sp)
-
-        return sp_map
+        sp_index = self._sp_spatial_index.get(region.pr_id)
+        if sp_index is None:
+            sp_index = SpSpatialIndex(self.region_2_sp.get(region.pr_id, []))
+            self._sp_spatial_index[region.pr_id] = sp_index
+        return sp_index.query(rect)
 
     def get_region_list_by_planet(self, planet: Planet) -> List[Region]:
         """
@@ -295,9 +327,12 @@ class SrMapData:
         dir_path = SrMapData.get_large_map_dir_path(region)
         info = LargeMapInfo()
         info.region = region
-        info.raw = cv2_utils.read_image(os.path.join(dir_path, 'raw.png'))
-        info.mask = cv2_utils.read_image(os.path.join(dir_path, 'mask.png'))
-        self.large_map_info_map[region.prl_id] = info
+        # 原图和衍生数据都经过磁盘缓存 已有缓存时使用内存映射读取
+        info.cache = LargeMapCache(region, dir_path)
+        info.cache.preload()
+        info.raw = info.cache.get('raw')
+        info.mask = info.cache.get('mask')
+        self.large_map_info_map.put(region.prl_id, info)
         return info
 
     def get_large_map_info(self, region: Region) -> LargeMapInfo:
@@ -306,11 +341,41 @@ class SrMapData:
         :param region: 区域
         :return: 地图图片
         """
-        if region.prl_id not in self.large_map_info_map:
+        info = self.large_map_info_map.get(region.prl_id)
+        if info is None:
             # 尝试加载一次
             return self.load_large_map_info(region)
         else:
-            return self.large_map_info_map[region.prl_id]
+            return info
+
+    def pin_large_map_info(self, *region_list: Optional[Region]) -> None:
+        """
+        固定需要使用的大地图 固定后不会被淘汰
+        会替换之前固定的大地图 通常传入当前区域和下一个区域
+        :param region_list: 区域 可以传入空
+        :return:
+        """
+        self.large_map_info_map.set_pinned([r.prl_id for r in region_list if r is not None])
+
+    def unpin_large_map_info(self) -> None:
+        """
+        取消所有固定的大地图 超出容量的部分会马上淘汰
+        :return:
+        """
+        self.large_map_info_map.set_pinned([])
+
+    @property
+    def large_map_cache_stats(self) -> LruCacheStats:
+        """
+        :return: 大地图缓存的统计信息 命中、未命中、淘汰次数等
+        """
+        return self.large_map_info_map.stats
+
+    def get_large_map_cache_nbytes(self) -> dict[str, int]:
+        """
+        :return: 每张已加载大地图占用的字节数
+        """
+        return self.large_map_info_map.entry_nbytes()
 
     @staticmethod
     def get_large_map_dir_path(region: Region):